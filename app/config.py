@@ -15,6 +15,59 @@ class Settings(BaseSettings):
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./data/crm.db"
+
+    # SQLite 连接参数（每个新连接建立时通过 PRAGMA 应用）
+    SQLITE_JOURNAL_MODE: str = "WAL"        # WAL 模式：读写互不阻塞
+    SQLITE_SYNCHRONOUS: str = "NORMAL"      # WAL 下 NORMAL 已可保证不损坏
+    SQLITE_BUSY_TIMEOUT: int = 5000         # 遇到写锁时等待的毫秒数
+    SQLITE_CACHE_SIZE: int = -20000         # 页缓存，负数表示 KiB（约 20MB）
+    SQLITE_MMAP_SIZE: int = 268435456       # 内存映射读取上限（256MB），0 为关闭
+    SQLITE_TEMP_STORE: str = "MEMORY"       # 临时表/排序使用内存
+
+    # 连接池参数（PostgreSQL 等服务端数据库，SQLite 不使用）
+    DB_POOL_SIZE: int = 10                  # 常驻连接数
+    DB_MAX_OVERFLOW: int = 20               # 高峰期可额外创建的连接数
+    DB_POOL_TIMEOUT: int = 30               # 等待空闲连接的秒数
+    DB_POOL_RECYCLE: int = 1800             # 连接最长复用秒数，避免被服务端/中间件断开
+
+    # 冷数据归档（仅 SQLite：归档库以 ATTACH 附加，见 archive_service）
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_DATABASE_PATH: str = ""         # 为空时与主库同目录，文件名加 _archive 后缀
+    ARCHIVE_CUSTOMER_DAYS: int = 90         # 回收站中删除超过该天数的客户移入归档库
+    ARCHIVE_ACTIVITY_DAYS: int = 365        # 超过该天数的活动日志移入归档库
+
+    # 活动日志原始明细保留天数：更早的日志由压缩任务删除，只保留日汇总计数，0 为不压缩
+    ACTIVITY_RAW_RETENTION_DAYS: int = 730
+
+    # 回收站保留期限：删除超过该天数的客户由定时清理任务永久删除，0 为不自动清理
+    RECYCLE_BIN_RETENTION_DAYS: int = 365
+
+    # 密码哈希（见 password_service；调整后已有用户在下次登录成功时自动重新计算）
+    PASSWORD_HASH_ALGORITHM: str = "scrypt" # scrypt 或 pbkdf2_sha256
+    PASSWORD_SCRYPT_N: int = 16384          # scrypt 代价参数 N（2 的幂，内存约 N KiB）
+    PASSWORD_PBKDF2_ITERATIONS: int = 600000
+    PASSWORD_HASH_WORKERS: int = 2          # 专用哈希线程数
+    PASSWORD_HASH_MAX_PENDING: int = 32     # 计算中 + 排队的上限，超出时登录返回 503
+
+    # 登录频率限制（滑动窗口，见 rate_limit_service）
+    LOGIN_RATE_LIMIT_ATTEMPTS: int = 5      # 窗口内允许的失败次数
+    LOGIN_RATE_LIMIT_WINDOW: int = 300      # 窗口秒数
+    LOGIN_RATE_LIMIT_BACKEND: str = "database"  # memory（仅单进程）/ database / redis
+    LOGIN_RATE_LIMIT_MAX_KEYS: int = 10000  # memory 存储最多保存的客户端数
+    REDIS_URL: str = "redis://127.0.0.1:6379/0"
+
+    # 登录用户缓存（每个请求按会话令牌取当前用户，见 auth_service.UserCache）
+    USER_CACHE_SIZE: int = 256              # 最多缓存的用户数，0 为关闭
+    USER_CACHE_TTL: float = 60.0            # 快照有效秒数（多进程部署时其他进程的最长延迟）
+
+    # 活动日志缓冲写入（非事务性日志先入队，由后台线程批量写入，见 activity_service）
+    ACTIVITY_LOG_BUFFERED: bool = True      # false 时 enqueue_activity 直接同步写入
+    ACTIVITY_LOG_BATCH_SIZE: int = 200      # 攒满该条数立即写入
+    ACTIVITY_LOG_FLUSH_SECONDS: float = 1.0 # 最早一条入队后最多等待的秒数
+    ACTIVITY_LOG_QUEUE_SIZE: int = 10000    # 队列上限，写满时入队方阻塞等待（事件循环中改由线程池写入）
+
+    # AI 报告历史
+    REPORT_HISTORY_KEEP: int = 20           # 每个客户保留的历史版本数，0 为不限
     
     # Coze OAuth 2.0 配置
     COZE_CLIENT_ID: str = ""
@@ -1,38 +1,83 @@
 """
 FastAPI 应用入口
 """
-from fastapi import FastAPI, Request, Query
+from fastapi import FastAPI, Request, Query, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, ORJSONResponse
 from contextlib import asynccontextmanager
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import math
 import markdown
 
 from app.config import settings
-from app.database import init_db, get_db, SessionLocal
-from app.models import Customer, FormTemplate, CustomerStatus, FormInvite, User
+from app.database import (
+    init_db, get_async_db, async_engine, begin_checkout_count, finish_checkout_count
+)
+from app.models import (
+    Customer, CustomerReport, FormTemplate, CustomerStatus, FormInvite, User,
+    DEFAULT_FORM_SCHEMA, KYC_INDEXED_FIELDS
+)
 from app.routers import customers, forms, analyze, dashboard, ai, invites, auth, coze_auth, activity, export
-from app.services.auth_service import get_current_user_from_request, check_customer_access
+from app.services.auth_service import (
+    get_current_user_from_request_async, check_customer_access, customer_access_filter
+)
+from app.services.form_service import get_field_label, get_field_options
+from app.services.activity_service import activity_log_writer
+from app.services.pagination_service import keyset_after, next_cursor_for
+from app.services.count_service import customer_total_query, status_counts, status_counts_query
+from app.services.archive_service import archived_customer_total_query, recycle_bin_query
+from app.services.search_service import (
+    highlight_snippet, like_search_filter, parse_search, search_hits
+)
 
 
-def require_login(request: Request):
+async def require_login(request: Request, db: AsyncSession):
     """页面路由登录检查，未登录则重定向到登录页"""
-    current_user = get_current_user_from_request(request)
+    current_user = await get_current_user_from_request_async(request, db)
     if not current_user:
         return None, RedirectResponse(url="/login", status_code=302)
     return current_user, None
 
 
+async def _get_active_form(db: AsyncSession) -> Optional[FormTemplate]:
+    """获取当前激活的表单配置"""
+    result = await db.execute(
+        select(FormTemplate).where(FormTemplate.is_active == 1).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _get_users_map(db: AsyncSession) -> dict:
+    """用户 ID → 显示名称映射"""
+    result = await db.execute(select(User.id, User.display_name, User.username))
+    return {uid: (display_name or username) for uid, display_name, username in result.all()}
+
+
+def _apply_page_cursor(query, sort_column, cursor: Optional[str], page: int, page_size: int):
+    """有效游标按 keyset 定位，否则（无游标或游标无效）退回页码 OFFSET"""
+    if cursor:
+        try:
+            return query.where(keyset_after(sort_column, Customer.id, cursor))
+        except ValueError:
+            pass
+    return query.offset((page - 1) * page_size)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     print(f"🚀 启动 {settings.APP_NAME} v{settings.APP_VERSION}")
     init_db()
+    if settings.ACTIVITY_LOG_BUFFERED:
+        activity_log_writer.start()
     yield
-    # 关闭时清理资源
+    # 关闭时写入缓冲中的活动日志，再清理资源
+    activity_log_writer.stop()
+    await async_engine.dispose()
     print("👋 应用关闭")
 
 
@@ -40,9 +85,19 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # API 路由默认用 orjson 序列化响应
 )
 
+@app.middleware("http")
+async def count_db_checkouts(request: Request, call_next):
+    """统计每个请求的数据库连接签出次数，通过 X-DB-Checkouts 响应头返回"""
+    counter = begin_checkout_count()
+    response = await call_next(request)
+    response.headers["X-DB-Checkouts"] = str(finish_checkout_count(counter))
+    return response
+
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -76,62 +131,45 @@ templates.env.filters['markdown'] = markdown_filter
 # ============ 页面路由 ============
 
 @app.get("/", response_class=HTMLResponse)
-async def index(request: Request):
+async def index(request: Request, db: AsyncSession = Depends(get_async_db)):
     """首页仪表盘"""
-    current_user, redirect = require_login(request)
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
-    try:
-        from sqlalchemy import or_, func
-
-        # 基础查询：排除已删除
-        base_query = db.query(Customer).filter(Customer.is_deleted == 0)
-        if not current_user.is_admin:
-            base_query = base_query.filter(
-                or_(
-                    Customer.owner_user_id == current_user.id,
-                    Customer.owner_user_id.is_(None)
-                )
-            )
-
-        # 使用 GROUP BY 优化统计查询
-        status_counts = (
-            base_query
-            .with_entities(Customer.status, func.count(Customer.id))
-            .group_by(Customer.status)
-            .all()
-        )
-        counts = dict(status_counts)
-        total = sum(counts.values())
-
-        stats = {
-            "total": total,
-            "pending": counts.get(CustomerStatus.PENDING.value, 0),
-            "analyzing": counts.get(CustomerStatus.ANALYZING.value, 0),
-            "reported": counts.get(CustomerStatus.REPORTED.value, 0),
-            "following": counts.get(CustomerStatus.FOLLOWING.value, 0),
-            "signed": counts.get(CustomerStatus.SIGNED.value, 0),
-        }
-
-        # 获取最近客户
-        recent_customers = (
-            base_query
-            .order_by(Customer.created_at.desc())
-            .limit(5)
-            .all()
-        )
-
-        return templates.TemplateResponse("dashboard.html", {
-            "request": request,
-            "current_user": current_user,
-            "stats": stats,
-            "recent_customers": recent_customers,
-            "page_title": "仪表盘"
-        })
-    finally:
-        db.close()
+    # 基础条件：排除已删除
+    conditions = [Customer.is_deleted == 0]
+    if not current_user.is_admin:
+        conditions.append(customer_access_filter(current_user))
+
+    # 各状态数量取自 customer_counts 计数表
+    counts = status_counts((await db.execute(status_counts_query(current_user))).all())
+    total = sum(counts.values())
+
+    stats = {
+        "total": total,
+        "pending": counts.get(CustomerStatus.PENDING.value, 0),
+        "analyzing": counts.get(CustomerStatus.ANALYZING.value, 0),
+        "reported": counts.get(CustomerStatus.REPORTED.value, 0),
+        "following": counts.get(CustomerStatus.FOLLOWING.value, 0),
+        "signed": counts.get(CustomerStatus.SIGNED.value, 0),
+    }
+
+    # 获取最近客户
+    recent_customers = (await db.execute(
+        select(Customer)
+        .where(*conditions)
+        .order_by(Customer.created_at.desc())
+        .limit(5)
+    )).scalars().all()
+
+    return templates.TemplateResponse("dashboard.html", {
+        "request": request,
+        "current_user": current_user,
+        "stats": stats,
+        "recent_customers": recent_customers,
+        "page_title": "仪表盘"
+    })
 
 
 @app.get("/customers", response_class=HTMLResponse)
@@ -142,294 +180,347 @@ async def customer_list_page(
     owner_id: Optional[int] = None,
     date_from: str = None,
     date_to: str = None,
+    asset_level: str = None,
+    city: str = None,
+    industry_category: str = None,
+    job_type: str = None,
+    timeline: str = None,
+    age_group: str = None,
     page: int = 1,
-    page_size: int = 20
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """客户列表页"""
-    current_user, redirect = require_login(request)
+    """客户列表页（"下一页"带游标，按 (created_at, id) 定位，无需 OFFSET）"""
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
-    try:
-        from sqlalchemy import or_
-        query = db.query(Customer).filter(Customer.is_deleted == 0)
-
-        # 权限过滤
-        if not current_user.is_admin:
-            query = query.filter(
-                or_(
-                    Customer.owner_user_id == current_user.id,
-                    Customer.owner_user_id.is_(None)
-                )
-            )
-
-        if status:
-            query = query.filter(Customer.status == status)
-
-        if search:
-            query = query.filter(Customer.name.ilike(f"%{search}%"))
-
-        if owner_id is not None:
-            if owner_id == 0:
-                query = query.filter(Customer.owner_user_id.is_(None))
-            else:
-                query = query.filter(Customer.owner_user_id == owner_id)
-
-        if date_from:
-            try:
-                from datetime import datetime
-                d = datetime.strptime(date_from, "%Y-%m-%d")
-                query = query.filter(Customer.created_at >= d)
-            except ValueError:
-                pass
-
-        if date_to:
-            try:
-                from datetime import datetime, timedelta
-                d = datetime.strptime(date_to, "%Y-%m-%d")
-                query = query.filter(Customer.created_at < d + timedelta(days=1))
-            except ValueError:
-                pass
-
-        total = query.count()
-        total_pages = max(1, math.ceil(total / page_size))
-        skip = (page - 1) * page_size
-        customers_list = query.order_by(Customer.created_at.desc()).offset(skip).limit(page_size).all()
-
-        # 用户映射（用于看板视图显示顾问名称）
-        all_users = db.query(User).all()
-        users_map = {u.id: (u.display_name or u.username) for u in all_users}
-
-        return templates.TemplateResponse("customer_list.html", {
-            "request": request,
-            "current_user": current_user,
-            "customers": customers_list,
-            "current_status": status,
-            "statuses": [s.value for s in CustomerStatus],
-            "users_map": users_map,
-            "page_title": "客户列表",
-            # 分页相关
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
-            # 筛选条件回传
-            "search": search or "",
-            "owner_id": owner_id,
-            "date_from": date_from or "",
-            "date_to": date_to or "",
-        })
-    finally:
-        db.close()
+    query = select(Customer).where(Customer.is_deleted == 0)
+
+    # 权限过滤
+    if not current_user.is_admin:
+        query = query.where(customer_access_filter(current_user))
+
+    if status:
+        query = query.where(Customer.status == status)
+
+    # 全文搜索：FTS5 索引按相关度排序，短关键词对索引覆盖的全部字段 LIKE 匹配
+    hits = None
+    if search and search.strip():
+        match, short_terms = parse_search(search)
+        if match:
+            hits = search_hits(match)
+            query = query.join(hits, hits.c.customer_id == Customer.id)
+        if short_terms:
+            query = query.where(like_search_filter(short_terms))
+
+    if owner_id is not None:
+        if owner_id == 0:
+            query = query.where(Customer.owner_user_id.is_(None))
+        else:
+            query = query.where(Customer.owner_user_id == owner_id)
+
+    if date_from:
+        try:
+            from datetime import datetime
+            d = datetime.strptime(date_from, "%Y-%m-%d")
+            query = query.where(Customer.created_at >= d)
+        except ValueError:
+            pass
+
+    if date_to:
+        try:
+            from datetime import datetime, timedelta
+            d = datetime.strptime(date_to, "%Y-%m-%d")
+            query = query.where(Customer.created_at < d + timedelta(days=1))
+        except ValueError:
+            pass
+
+    # KYC 热点字段筛选（走 kyc_* 生成列索引）
+    kyc_filters = {
+        field: value for field, value in {
+            "asset_level": asset_level, "city": city, "industry_category": industry_category,
+            "job_type": job_type, "timeline": timeline, "age_group": age_group,
+        }.items() if value
+    }
+    for field, value in kyc_filters.items():
+        query = query.where(getattr(Customer, f"kyc_{field}") == value)
+
+    # 仅按状态 / 归属顾问筛选时总数取自计数表，其余筛选执行真实 COUNT
+    if search or date_from or date_to or kyc_filters:
+        total_query = select(func.count()).select_from(query.subquery())
+    else:
+        total_query = customer_total_query(current_user, 0, [status] if status else None, owner_id)
+    total = (await db.execute(total_query)).scalar_one()
+    total_pages = max(1, math.ceil(total / page_size))
+    snippets = {}
+    if hits is not None:
+        # 全文搜索按相关度排序，只支持页码分页
+        rows = (await db.execute(
+            query.add_columns(hits.c.snippet)
+            .order_by(hits.c.rank, Customer.id.desc())
+            .offset((page - 1) * page_size).limit(page_size)
+        )).all()
+        customers_list = [customer for customer, _ in rows]
+        snippets = {customer.id: highlight_snippet(snippet) for customer, snippet in rows}
+        next_cursor = None
+    else:
+        query = query.order_by(Customer.created_at.desc(), Customer.id.desc())
+        query = _apply_page_cursor(query, Customer.created_at, cursor, page, page_size)
+        customers_list, next_cursor = next_cursor_for(
+            (await db.execute(query.limit(page_size + 1))).scalars().all(), page_size, "created_at"
+        )
+
+    # 用户映射（用于看板视图显示顾问名称）
+    users_map = await _get_users_map(db)
+
+    # KYC 筛选项（标签与选项取自当前表单配置）
+    form_template = await _get_active_form(db)
+    schema = form_template.schema if form_template else DEFAULT_FORM_SCHEMA
+    kyc_filter_fields = [
+        {
+            "name": field,
+            "label": get_field_label(schema, field),
+            "options": get_field_options(schema, field),
+        }
+        for field in KYC_INDEXED_FIELDS
+    ]
+
+    return templates.TemplateResponse("customer_list.html", {
+        "request": request,
+        "current_user": current_user,
+        "customers": customers_list,
+        "snippets": snippets,
+        "current_status": status,
+        "statuses": [s.value for s in CustomerStatus],
+        "users_map": users_map,
+        "page_title": "客户列表",
+        # 分页相关
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": total_pages,
+        "next_cursor": next_cursor,
+        # 筛选条件回传
+        "search": search or "",
+        "owner_id": owner_id,
+        "date_from": date_from or "",
+        "date_to": date_to or "",
+        "kyc_filters": kyc_filters,
+        "kyc_filter_fields": kyc_filter_fields,
+    })
 
 
 @app.get("/customers/new", response_class=HTMLResponse)
-async def customer_new_page(request: Request):
+async def customer_new_page(request: Request, db: AsyncSession = Depends(get_async_db)):
     """新建客户页"""
-    current_user, redirect = require_login(request)
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
-    try:
-        # 获取当前激活的表单配置
-        form_template = db.query(FormTemplate).filter(FormTemplate.is_active == 1).first()
+    # 获取当前激活的表单配置
+    form_template = await _get_active_form(db)
 
-        # 如果是管理员，获取所有用户列表（用于分配客户归属）
-        users_list = []
-        if current_user.is_admin:
-            users_list = db.query(User).filter(User.is_active == 1).all()
+    # 如果是管理员，获取所有用户列表（用于分配客户归属）
+    users_list = []
+    if current_user.is_admin:
+        users_list = (await db.execute(
+            select(User).where(User.is_active == 1)
+        )).scalars().all()
 
-        return templates.TemplateResponse("customer_form.html", {
-            "request": request,
-            "current_user": current_user,
-            "form_schema": form_template.schema if form_template else None,
-            "customer": None,
-            "users_list": users_list,
-            "page_title": "新建客户"
-        })
-    finally:
-        db.close()
+    return templates.TemplateResponse("customer_form.html", {
+        "request": request,
+        "current_user": current_user,
+        "form_schema": form_template.schema if form_template else None,
+        "customer": None,
+        "users_list": users_list,
+        "page_title": "新建客户"
+    })
 
 
 @app.get("/customers/{customer_id}", response_class=HTMLResponse)
-async def customer_detail_page(request: Request, customer_id: int):
+async def customer_detail_page(
+    request: Request,
+    customer_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
     """客户详情页"""
-    current_user, redirect = require_login(request)
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
-    try:
-        customer = db.query(Customer).filter(
+    customer = (await db.execute(
+        select(Customer).where(
             Customer.id == customer_id,
             Customer.is_deleted == 0
-        ).first()
-        if not customer:
-            return templates.TemplateResponse("error.html", {
-                "request": request,
-                "current_user": current_user,
-                "message": "客户不存在",
-                "page_title": "错误"
-            })
-
-        # 权限检查
-        if not check_customer_access(customer.owner_user_id, current_user):
-            return templates.TemplateResponse("error.html", {
-                "request": request,
-                "current_user": current_user,
-                "message": "无权访问此客户",
-                "page_title": "权限不足"
-            })
-
-        # 获取表单配置用于显示标签
-        form_template = db.query(FormTemplate).filter(FormTemplate.is_active == 1).first()
-
-        # 获取客户归属用户信息
-        owner_user = None
-        if customer.owner_user_id:
-            owner_user = db.query(User).filter(User.id == customer.owner_user_id).first()
-
-        return templates.TemplateResponse("customer_detail.html", {
+        )
+    )).scalar_one_or_none()
+    if not customer:
+        return templates.TemplateResponse("error.html", {
             "request": request,
             "current_user": current_user,
-            "customer": customer,
-            "owner_user": owner_user,
-            "form_schema": form_template.schema if form_template else None,
-            "statuses": [s.value for s in CustomerStatus],
-            "page_title": f"客户详情 - {customer.name}"
+            "message": "客户不存在",
+            "page_title": "错误"
         })
-    finally:
-        db.close()
+
+    # 权限检查
+    if not check_customer_access(customer.owner_user_id, current_user):
+        return templates.TemplateResponse("error.html", {
+            "request": request,
+            "current_user": current_user,
+            "message": "无权访问此客户",
+            "page_title": "权限不足"
+        })
+
+    # 获取表单配置用于显示标签
+    form_template = await _get_active_form(db)
+
+    # AI 分析结果（单独存放，仅详情页读取）
+    report = await db.get(CustomerReport, customer_id)
+
+    # 获取客户归属用户信息
+    owner_user = None
+    if customer.owner_user_id:
+        owner_user = await db.get(User, customer.owner_user_id)
+
+    return templates.TemplateResponse("customer_detail.html", {
+        "request": request,
+        "current_user": current_user,
+        "customer": customer,
+        "report": report,
+        "owner_user": owner_user,
+        "form_schema": form_template.schema if form_template else None,
+        "statuses": [s.value for s in CustomerStatus],
+        "page_title": f"客户详情 - {customer.name}"
+    })
 
 
 @app.get("/customers/{customer_id}/edit", response_class=HTMLResponse)
-async def customer_edit_page(request: Request, customer_id: int):
+async def customer_edit_page(
+    request: Request,
+    customer_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
     """编辑客户页"""
-    current_user, redirect = require_login(request)
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
-    try:
-        customer = db.query(Customer).filter(
+    customer = (await db.execute(
+        select(Customer).where(
             Customer.id == customer_id,
             Customer.is_deleted == 0
-        ).first()
-        if not customer:
-            return templates.TemplateResponse("error.html", {
-                "request": request,
-                "current_user": current_user,
-                "message": "客户不存在",
-                "page_title": "错误"
-            })
-
-        # 权限检查
-        if not check_customer_access(customer.owner_user_id, current_user):
-            return templates.TemplateResponse("error.html", {
-                "request": request,
-                "current_user": current_user,
-                "message": "无权编辑此客户",
-                "page_title": "权限不足"
-            })
-
-        form_template = db.query(FormTemplate).filter(FormTemplate.is_active == 1).first()
-
-        # 如果是管理员，获取所有用户列表（用于分配客户归属）
-        users_list = []
-        if current_user.is_admin:
-            users_list = db.query(User).filter(User.is_active == 1).all()
-
-        return templates.TemplateResponse("customer_form.html", {
+        )
+    )).scalar_one_or_none()
+    if not customer:
+        return templates.TemplateResponse("error.html", {
             "request": request,
             "current_user": current_user,
-            "form_schema": form_template.schema if form_template else None,
-            "customer": customer,
-            "users_list": users_list,
-            "page_title": f"编辑客户 - {customer.name}"
+            "message": "客户不存在",
+            "page_title": "错误"
+        })
+
+    # 权限检查
+    if not check_customer_access(customer.owner_user_id, current_user):
+        return templates.TemplateResponse("error.html", {
+            "request": request,
+            "current_user": current_user,
+            "message": "无权编辑此客户",
+            "page_title": "权限不足"
         })
-    finally:
-        db.close()
+
+    form_template = await _get_active_form(db)
+
+    # 如果是管理员，获取所有用户列表（用于分配客户归属）
+    users_list = []
+    if current_user.is_admin:
+        users_list = (await db.execute(
+            select(User).where(User.is_active == 1)
+        )).scalars().all()
+
+    return templates.TemplateResponse("customer_form.html", {
+        "request": request,
+        "current_user": current_user,
+        "form_schema": form_template.schema if form_template else None,
+        "customer": customer,
+        "users_list": users_list,
+        "page_title": f"编辑客户 - {customer.name}"
+    })
 
 
 @app.get("/recycle-bin", response_class=HTMLResponse)
 async def recycle_bin_page(
     request: Request,
     page: int = 1,
-    page_size: int = 20
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """回收站页面"""
-    current_user, redirect = require_login(request)
+    """回收站页面（含已归档的客户，"下一页"带游标，按 (deleted_at, id) 定位）"""
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
+    total = (await db.execute(customer_total_query(current_user, is_deleted=1))).scalar_one()
+    archived_total = archived_customer_total_query(current_user)
+    if archived_total is not None:
+        total += (await db.execute(archived_total)).scalar_one()
+    total_pages = max(1, math.ceil(total / page_size))
+
+    # 有效游标按 keyset 定位，否则（无游标或游标无效）退回页码 OFFSET
     try:
-        from sqlalchemy import or_
-        query = db.query(Customer).filter(Customer.is_deleted == 1)
-
-        # 权限过滤
-        if not current_user.is_admin:
-            query = query.filter(
-                or_(
-                    Customer.owner_user_id == current_user.id,
-                    Customer.owner_user_id.is_(None)
-                )
-            )
-
-        total = query.count()
-        total_pages = max(1, math.ceil(total / page_size))
-        skip = (page - 1) * page_size
-        customers_list = query.order_by(Customer.deleted_at.desc()).offset(skip).limit(page_size).all()
-
-        # 用户映射
-        all_users = db.query(User).all()
-        users_map = {u.id: (u.display_name or u.username) for u in all_users}
-
-        return templates.TemplateResponse("recycle_bin.html", {
-            "request": request,
-            "current_user": current_user,
-            "customers": customers_list,
-            "users_map": users_map,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
-            "page_title": "回收站"
-        })
-    finally:
-        db.close()
+        query = recycle_bin_query(current_user, cursor)
+    except ValueError:
+        cursor = None
+        query = recycle_bin_query(current_user)
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
+    customers_list, next_cursor = next_cursor_for(
+        (await db.execute(query.limit(page_size + 1))).all(), page_size, "deleted_at"
+    )
+
+    # 用户映射
+    users_map = await _get_users_map(db)
+
+    return templates.TemplateResponse("recycle_bin.html", {
+        "request": request,
+        "current_user": current_user,
+        "customers": customers_list,
+        "users_map": users_map,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": total_pages,
+        "next_cursor": next_cursor,
+        "page_title": "回收站"
+    })
 
 
 @app.get("/settings", response_class=HTMLResponse)
-async def settings_page(request: Request):
+async def settings_page(request: Request, db: AsyncSession = Depends(get_async_db)):
     """表单配置页"""
-    current_user, redirect = require_login(request)
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
-    db = SessionLocal()
-    try:
-        form_template = db.query(FormTemplate).filter(FormTemplate.is_active == 1).first()
+    form_template = await _get_active_form(db)
 
-        is_admin = current_user.is_admin
+    is_admin = current_user.is_admin
 
-        return templates.TemplateResponse("settings.html", {
-            "request": request,
-            "current_user": current_user,
-            "form_template": form_template,
-            "is_admin": is_admin,
-            "page_title": "表单设置"
-        })
-    finally:
-        db.close()
+    return templates.TemplateResponse("settings.html", {
+        "request": request,
+        "current_user": current_user,
+        "form_template": form_template,
+        "is_admin": is_admin,
+        "page_title": "表单设置"
+    })
 
 
 @app.get("/help", response_class=HTMLResponse)
-async def help_page(request: Request):
+async def help_page(request: Request, db: AsyncSession = Depends(get_async_db)):
     """使用说明页"""
-    current_user = get_current_user_from_request(request)
+    current_user = await get_current_user_from_request_async(request, db)
     return templates.TemplateResponse("help.html", {
         "request": request,
         "current_user": current_user,
@@ -440,12 +531,11 @@ async def help_page(request: Request):
 # ============ 用户认证页面路由 ============
 
 @app.get("/login", response_class=HTMLResponse)
-async def login_page(request: Request):
+async def login_page(request: Request, db: AsyncSession = Depends(get_async_db)):
     """登录页"""
     # 如果已登录，重定向到首页
-    current_user = get_current_user_from_request(request)
+    current_user = await get_current_user_from_request_async(request, db)
     if current_user:
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url="/", status_code=302)
 
     return templates.TemplateResponse("login.html", {
@@ -455,9 +545,9 @@ async def login_page(request: Request):
 
 
 @app.get("/admin/users", response_class=HTMLResponse)
-async def admin_users_page(request: Request):
+async def admin_users_page(request: Request, db: AsyncSession = Depends(get_async_db)):
     """用户管理页（管理员）"""
-    current_user, redirect = require_login(request)
+    current_user, redirect = await require_login(request, db)
     if redirect:
         return redirect
 
@@ -469,24 +559,26 @@ async def admin_users_page(request: Request):
             "page_title": "权限不足"
         })
 
-    db = SessionLocal()
-    try:
-        users = db.query(User).order_by(User.created_at.desc()).all()
+    users = (await db.execute(
+        select(User).order_by(User.created_at.desc())
+    )).scalars().all()
 
-        return templates.TemplateResponse("admin_users.html", {
-            "request": request,
-            "current_user": current_user,
-            "users": users,
-            "page_title": "用户管理"
-        })
-    finally:
-        db.close()
+    return templates.TemplateResponse("admin_users.html", {
+        "request": request,
+        "current_user": current_user,
+        "users": users,
+        "page_title": "用户管理"
+    })
 
 
 # ============ 外部填写页面路由 ============
 
 @app.get("/fill/{token}", response_class=HTMLResponse)
-async def external_fill_page(request: Request, token: str):
+async def external_fill_page(
+    request: Request,
+    token: str,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     外部客户填写页面
 
@@ -494,55 +586,53 @@ async def external_fill_page(request: Request, token: str):
     """
     from datetime import datetime
 
-    db = SessionLocal()
-    try:
-        # 查找邀请记录
-        invite = db.query(FormInvite).filter(FormInvite.token == token).first()
-
-        # 验证邀请有效性
-        error_message = None
-        customer_name = None
-        form_schema = None
-
-        if not invite:
-            error_message = "邀请链接无效，请联系您的顾问获取正确的链接。"
-        elif invite.used_at is not None:
-            error_message = "该链接已被使用。如需重新填写，请联系您的顾问。"
-        elif invite.expires_at and invite.expires_at < datetime.now():
-            error_message = "邀请链接已过期。请联系您的顾问获取新的链接。"
-        elif invite.is_active != 1:
-            error_message = "邀请链接已失效。请联系您的顾问。"
+    # 查找邀请记录
+    invite = (await db.execute(
+        select(FormInvite).where(FormInvite.token == token)
+    )).scalar_one_or_none()
+
+    # 验证邀请有效性
+    error_message = None
+    customer_name = None
+    form_schema = None
+
+    if not invite:
+        error_message = "邀请链接无效，请联系您的顾问获取正确的链接。"
+    elif invite.used_at is not None:
+        error_message = "该链接已被使用。如需重新填写，请联系您的顾问。"
+    elif invite.expires_at and invite.expires_at < datetime.now():
+        error_message = "邀请链接已过期。请联系您的顾问获取新的链接。"
+    elif invite.is_active != 1:
+        error_message = "邀请链接已失效。请联系您的顾问。"
+    else:
+        # 获取客户信息
+        customer = await db.get(Customer, invite.customer_id)
+        if not customer:
+            error_message = "关联的客户记录不存在。"
         else:
-            # 获取客户信息
-            customer = db.query(Customer).filter(Customer.id == invite.customer_id).first()
-            if not customer:
-                error_message = "关联的客户记录不存在。"
-            else:
-                customer_name = customer.name
-                # 获取当前激活的表单配置
-                form_template = db.query(FormTemplate).filter(FormTemplate.is_active == 1).first()
-                form_schema = form_template.schema if form_template else None
-
-        if error_message:
-            return templates.TemplateResponse("fill_form.html", {
-                "request": request,
-                "error_message": error_message,
-                "token": token,
-                "customer_name": None,
-                "form_schema": None,
-                "page_title": "表单填写"
-            })
+            customer_name = customer.name
+            # 获取当前激活的表单配置
+            form_template = await _get_active_form(db)
+            form_schema = form_template.schema if form_template else None
 
+    if error_message:
         return templates.TemplateResponse("fill_form.html", {
             "request": request,
-            "error_message": None,
+            "error_message": error_message,
             "token": token,
-            "customer_name": customer_name,
-            "form_schema": form_schema,
-            "page_title": f"填写 KYC 信息 - {customer_name}"
+            "customer_name": None,
+            "form_schema": None,
+            "page_title": "表单填写"
         })
-    finally:
-        db.close()
+
+    return templates.TemplateResponse("fill_form.html", {
+        "request": request,
+        "error_message": None,
+        "token": token,
+        "customer_name": customer_name,
+        "form_schema": form_schema,
+        "page_title": f"填写 KYC 信息 - {customer_name}"
+    })
 
 
 @app.get("/fill/{token}/success", response_class=HTMLResponse)
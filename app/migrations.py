@@ -0,0 +1,484 @@
+"""
+数据库版本化迁移模块
+
+schema_version 表记录已应用的迁移版本，MIGRATIONS 按版本号顺序登记迁移步骤。
+启动时只做一次版本检查，已是最新版本则直接返回；否则仅执行尚未应用的步骤，
+每个步骤与其版本记录在同一事务中提交。
+
+新增迁移：在文件末尾用 @migration(下一个版本号, "说明") 注册一个函数，
+函数接收一个处于事务中的 Connection。迁移步骤需兼容全新数据库
+（表已由基线步骤按当前模型创建）与历史数据库两种情况。
+
+命令行用法（部署前离线执行）:
+    python -m app.migrations status
+    python -m app.migrations upgrade
+"""
+import argparse
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+from app.database import engine as default_engine
+
+
+class Migration(NamedTuple):
+    """迁移步骤"""
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+_version_metadata = MetaData()
+
+schema_version_table = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def migration(version: int, description: str):
+    """注册迁移步骤的装饰器（版本号必须连续递增）"""
+    def decorator(func: Callable[[Connection], None]):
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"迁移版本号应为 {expected}，实际为 {version}")
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    """代码中登记的最新迁移版本"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_current_version(conn: Connection) -> int:
+    """读取数据库当前的结构版本，未初始化时返回 0"""
+    try:
+        version = conn.execute(select(schema_version_table.c.version).order_by(
+            schema_version_table.c.version.desc()
+        ).limit(1)).scalar()
+    except (OperationalError, ProgrammingError):
+        conn.rollback()
+        return 0
+    return version or 0
+
+
+# PostgreSQL 迁移互斥用的 advisory lock 键
+_PG_MIGRATION_LOCK_KEY = 727001
+
+
+def _begin(conn: Connection) -> None:
+    """
+    开启迁移事务
+
+    SQLite 驱动默认不会在 DDL 前自动 BEGIN，这里显式 BEGIN IMMEDIATE，
+    使 DDL 也处于事务中，并阻止多个进程同时执行迁移。
+    PostgreSQL 的 DDL 本身支持事务，用事务级 advisory lock 实现互斥。
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_MIGRATION_LOCK_KEY})
+
+
+def run_migrations(engine: Engine = default_engine, target: Optional[int] = None) -> list[int]:
+    """
+    执行所有待应用的迁移
+
+    Args:
+        engine: 数据库引擎
+        target: 目标版本（默认为最新版本）
+
+    Returns:
+        本次应用的版本号列表
+    """
+    target = latest_version() if target is None else target
+
+    # 快速路径：一次版本查询，已是最新则直接返回
+    with engine.connect() as conn:
+        if get_current_version(conn) >= target:
+            return []
+
+    applied = []
+    for step in MIGRATIONS:
+        if step.version > target:
+            break
+        with engine.connect() as conn:
+            _begin(conn)
+            # 持锁后重新检查，避免并发启动的其他进程已完成该步骤
+            _version_metadata.create_all(conn, checkfirst=True)
+            if get_current_version(conn) >= step.version:
+                conn.rollback()
+                continue
+
+            print(f"📦 迁移 v{step.version}: {step.description}...")
+            step.upgrade(conn)
+            conn.execute(schema_version_table.insert().values(
+                version=step.version,
+                description=step.description,
+                applied_at=datetime.now(),
+            ))
+            conn.commit()
+            applied.append(step.version)
+
+    if applied:
+        print(f"✅ 数据库结构已升级到 v{applied[-1]}")
+    return applied
+
+
+# ============ 迁移辅助函数 ============
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    """检查表中是否已存在指定列"""
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """为表添加列（已存在则跳过，兼容按当前模型新建的表）"""
+    if not _has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _add_model_column(conn: Connection, table: Table, column_name: str) -> None:
+    """按模型中的列定义添加列（含生成列表达式，已存在则跳过）"""
+    if not _has_column(conn, table.name, column_name):
+        ddl = CreateColumn(table.c[column_name]).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def _sqlite_uses_autoincrement(conn: Connection, table: str) -> bool:
+    """SQLite 表是否已声明 AUTOINCREMENT"""
+    ddl = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+    ).scalar()
+    return "AUTOINCREMENT" in (ddl or "").upper()
+
+
+def _rebuild_sqlite_table(conn: Connection, table: Table) -> None:
+    """
+    按当前模型重建 SQLite 表：新建临时表 → 复制 → 删除旧表 → 改名 → 重建模型中的索引
+
+    行的 id 保持不变；旧表上的触发器随表删除，由调用方重新安装。
+    """
+    # 在独立的 MetaData 中复制全部模型表，使临时表的外键仍能解析到被引用表
+    metadata = MetaData()
+    for source in table.metadata.sorted_tables:
+        source.to_metadata(metadata)
+    staging = metadata.tables[table.name].to_metadata(metadata, name=f"{table.name}_rebuild")
+
+    names = ", ".join(column.name for column in table.columns if column.computed is None)
+    conn.execute(CreateTable(staging))
+    conn.execute(text(f"INSERT INTO {staging.name} ({names}) SELECT {names} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {staging.name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(conn)
+
+
+def _create_indexes(conn: Connection, table: Table, names: list[str]) -> None:
+    """按名称创建模型中声明的索引（已存在则跳过）"""
+    indexes = {index.name: index for index in table.indexes}
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+def upgrade_form_template(conn: Connection) -> None:
+    """
+    将 DEFAULT_FORM_SCHEMA 写入表单配置并设为激活版本
+
+    DEFAULT_FORM_SCHEMA 版本号变更时，应新增一个迁移步骤调用此函数。
+    """
+    from app.models import FormTemplate, DEFAULT_FORM_SCHEMA
+
+    db = Session(bind=conn)
+    current_version = DEFAULT_FORM_SCHEMA.get("version", "1.0")
+    existing = db.query(FormTemplate).filter(FormTemplate.version == current_version).first()
+
+    if not existing:
+        # 将所有旧版本设为非激活，并创建新版本
+        db.query(FormTemplate).update({FormTemplate.is_active: 0})
+        db.add(FormTemplate(
+            version=current_version,
+            name="KYC 标准表单",
+            schema=DEFAULT_FORM_SCHEMA,
+            is_active=1
+        ))
+        print(f"✅ 表单配置已升级到 v{current_version}")
+    elif existing.is_active != 1:
+        # 确保最新版本是激活状态
+        db.query(FormTemplate).update({FormTemplate.is_active: 0})
+        existing.is_active = 1
+    db.flush()
+
+
+# ============ 迁移步骤 ============
+
+@migration(1, "基线表结构与历史列补齐")
+def _baseline_schema(conn: Connection) -> None:
+    from app.models import (
+        Base, User, FormTemplate, Customer, FormInvite, ActivityLog, CozeOAuthToken
+    )
+
+    Base.metadata.create_all(conn, tables=[
+        User.__table__,
+        FormTemplate.__table__,
+        Customer.__table__,
+        FormInvite.__table__,
+        ActivityLog.__table__,
+        CozeOAuthToken.__table__,
+    ])
+
+    # 早期版本的 customers 表缺少以下列
+    _add_column(conn, "customers", "owner_user_id", "INTEGER")
+    _add_column(conn, "customers", "is_deleted", "INTEGER DEFAULT 0")
+    _add_column(conn, "customers", "deleted_at", "DATETIME")
+
+    for stmt in [
+        "CREATE INDEX IF NOT EXISTS ix_customers_status ON customers(status)",
+        "CREATE INDEX IF NOT EXISTS ix_customers_name ON customers(name)",
+        "CREATE INDEX IF NOT EXISTS ix_customers_birthday ON customers(birthday)",
+        "CREATE INDEX IF NOT EXISTS ix_customers_next_follow_up ON customers(next_follow_up)",
+        "CREATE INDEX IF NOT EXISTS ix_customers_is_deleted ON customers(is_deleted)",
+        "CREATE INDEX IF NOT EXISTS ix_customers_owner_user_id ON customers(owner_user_id)",
+    ]:
+        conn.execute(text(stmt))
+
+
+@migration(2, "初始化 KYC 表单配置 v1.1")
+def _seed_form_template(conn: Connection) -> None:
+    upgrade_form_template(conn)
+
+
+@migration(3, "初始化默认管理员与体验账户")
+def _seed_default_users(conn: Connection) -> None:
+    from app.models import User, UserRole
+
+    db = Session(bind=conn)
+    defaults = [
+        ("admin", "admin123", "系统管理员", UserRole.ADMIN.value),
+        ("demo", "demo123", "体验用户", UserRole.USER.value),
+    ]
+    for username, password, display_name, role in defaults:
+        if db.query(User).filter(User.username == username).first():
+            continue
+        db.add(User(
+            username=username,
+            password_hash=User.hash_password(password),
+            display_name=display_name,
+            role=role,
+            is_active=1
+        ))
+        print(f"✅ 默认账户已创建 (用户名: {username}, 密码: {password})")
+    db.flush()
+
+
+@migration(4, "按查询形态补充复合索引与部分索引")
+def _query_shape_indexes(conn: Connection) -> None:
+    from app.models import Customer, ActivityLog
+
+    _create_indexes(conn, Customer.__table__, [
+        "ix_customers_live_created",
+        "ix_customers_live_status_created",
+        "ix_customers_live_owner_created",
+        "ix_customers_trash_deleted_at",
+    ])
+    _create_indexes(conn, ActivityLog.__table__, ["ix_activity_logs_customer_created"])
+
+    # 低选择性的单列索引会诱导优化器放弃上述索引并额外排序，由部分索引取代
+    conn.execute(text("DROP INDEX IF EXISTS ix_customers_is_deleted"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_customers_status"))
+    # 已被 (customer_id, created_at) 复合索引的前缀覆盖
+    conn.execute(text("DROP INDEX IF EXISTS ix_activity_logs_customer_id"))
+
+
+@migration(5, "KYC 热点字段生成列及索引")
+def _kyc_generated_columns(conn: Connection) -> None:
+    from app.models import Customer, KYC_INDEXED_FIELDS
+
+    table = Customer.__table__
+    for field in KYC_INDEXED_FIELDS:
+        _add_model_column(conn, table, f"kyc_{field}")
+    _create_indexes(conn, table, [f"ix_customers_live_kyc_{field}" for field in KYC_INDEXED_FIELDS])
+
+
+@migration(6, "KYC 多选字段展开表")
+def _kyc_facets_table(conn: Connection) -> None:
+    from app.models import Customer, CustomerKycFacet
+    from app.services.facet_service import extract_facets
+
+    CustomerKycFacet.__table__.create(conn, checkfirst=True)
+
+    # 回填历史客户的展开行
+    customers = Customer.__table__
+    rows = [
+        {"customer_id": customer_id, "field": field, "value": value}
+        for customer_id, kyc_data in conn.execute(select(customers.c.id, customers.c.kyc_data))
+        for field, value in extract_facets(kyc_data)
+    ]
+    if rows:
+        conn.execute(CustomerKycFacet.__table__.insert(), rows)
+
+
+@migration(7, "AI 分析结果迁出 customers 表")
+def _split_customer_reports(conn: Connection) -> None:
+    from app.models import CustomerReport
+
+    CustomerReport.__table__.create(conn, checkfirst=True)
+    if not _has_column(conn, "customers", "ai_report"):
+        return
+
+    # JSON 列写入 None 时保存为 JSON 'null'，不是 SQL NULL，这类行没有分析结果，不迁移
+    conn.execute(text("""
+        INSERT INTO customer_reports (customer_id, ai_report, ai_opportunities, updated_at)
+        SELECT id, ai_report, ai_opportunities, COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)
+        FROM customers
+        WHERE ai_report IS NOT NULL
+           OR (ai_opportunities IS NOT NULL AND CAST(ai_opportunities AS TEXT) != 'null')
+    """))
+    # 删除列会重写 customers 表，此后每行只保留列表类查询所需的窄字段
+    conn.execute(text("ALTER TABLE customers DROP COLUMN ai_report"))
+    conn.execute(text("ALTER TABLE customers DROP COLUMN ai_opportunities"))
+
+
+@migration(8, "AI 报告历史版本表")
+def _report_versions_table(conn: Connection) -> None:
+    from app.models import CustomerReport, CustomerReportVersion
+    from app.services.report_service import new_report_version
+
+    CustomerReportVersion.__table__.create(conn, checkfirst=True)
+
+    # 已有的最新报告作为各客户的第 1 个版本
+    db = Session(bind=conn)
+    for record in db.query(CustomerReport).filter(CustomerReport.ai_report.isnot(None)):
+        version = new_report_version(record.customer_id, 1, record.ai_report, record.ai_opportunities)
+        version.created_at = record.updated_at
+        db.add(version)
+    db.flush()
+
+
+@migration(9, "客户计数表及维护触发器")
+def _customer_counts_table(conn: Connection) -> None:
+    from app.models import CustomerCount
+    from app.services.count_service import install_count_triggers, rebuild_customer_counts
+
+    CustomerCount.__table__.create(conn, checkfirst=True)
+    install_count_triggers(conn)
+    rebuild_customer_counts(conn)
+
+
+@migration(10, "客户全文搜索索引（SQLite FTS5）")
+def _customer_search_index(conn: Connection) -> None:
+    from app.services.search_service import install_search_index, rebuild_search_index
+
+    install_search_index(conn)
+    rebuild_search_index(conn)
+
+
+@migration(11, "客户姓名分块键表（疑似重复检测）")
+def _customer_name_keys(conn: Connection) -> None:
+    from app.models import CustomerNameKey
+    from app.services.duplicate_service import rebuild_name_keys
+
+    CustomerNameKey.__table__.create(conn, checkfirst=True)
+    rebuild_name_keys(conn)
+
+
+@migration(12, "活动日志日汇总表及维护触发器")
+def _activity_rollups_table(conn: Connection) -> None:
+    from app.models import ActivityRollup
+    from app.services.rollup_service import install_rollup_triggers, rebuild_activity_rollups
+
+    ActivityRollup.__table__.create(conn, checkfirst=True)
+    install_rollup_triggers(conn)
+    rebuild_activity_rollups(conn)
+
+
+@migration(13, "跨客户活动动态索引")
+def _activity_feed_indexes(conn: Connection) -> None:
+    from app.models import ActivityLog
+
+    _create_indexes(conn, ActivityLog.__table__, [
+        "ix_activity_logs_created",
+        "ix_activity_logs_user_created",
+        "ix_activity_logs_action_created",
+    ])
+    # 已被 (action_type, created_at, id) 复合索引的前缀覆盖
+    conn.execute(text("DROP INDEX IF EXISTS ix_activity_logs_action_type"))
+
+
+@migration(14, "登录频率限制计数表")
+def _login_rate_limits_table(conn: Connection) -> None:
+    from app.models import LoginRateLimit
+
+    LoginRateLimit.__table__.create(conn, checkfirst=True)
+
+
+@migration(15, "归档相关表改用 AUTOINCREMENT（SQLite 不再复用 id）")
+def _autoincrement_archived_tables(conn: Connection) -> None:
+    from app.models import ActivityLog, Customer, CustomerReportVersion, FormInvite
+    from app.services.archive_service import archived_max_ids
+    from app.services.count_service import install_count_triggers
+    from app.services.rollup_service import install_rollup_triggers
+    from app.services.search_service import install_search_index
+
+    if conn.dialect.name != "sqlite":
+        return
+
+    tables = [Customer.__table__, FormInvite.__table__, CustomerReportVersion.__table__, ActivityLog.__table__]
+    rebuilt = False
+    for table in tables:
+        if not _sqlite_uses_autoincrement(conn, table.name):
+            _rebuild_sqlite_table(conn, table)
+            rebuilt = True
+    if rebuilt:
+        install_count_triggers(conn)
+        install_search_index(conn)
+        install_rollup_triggers(conn)
+
+    # 已移入归档库的 id 也不能再分配：序列起点不低于归档库中的最大 id
+    for name, max_id in archived_max_ids(conn).items():
+        params = {"name": name, "seq": max_id}
+        if not conn.execute(
+            text("UPDATE sqlite_sequence SET seq = MAX(seq, :seq) WHERE name = :name"), params
+        ).rowcount:
+            conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), params)
+
+
+# ============ 命令行入口 ============
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库结构迁移")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="查看当前版本与待执行的迁移")
+    upgrade_parser = sub.add_parser("upgrade", help="执行待应用的迁移")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="目标版本（默认最新）")
+    args = parser.parse_args()
+
+    with default_engine.connect() as conn:
+        current = get_current_version(conn)
+
+    if args.command == "status":
+        print(f"当前版本: v{current}，最新版本: v{latest_version()}")
+        for step in MIGRATIONS:
+            mark = "✅" if step.version <= current else "⏳"
+            print(f"  {mark} v{step.version} {step.description}")
+        return
+
+    applied = run_migrations(target=args.to)
+    if not applied:
+        print(f"ℹ️ 数据库已是 v{current}，无需迁移")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 """
 数据库模型定义
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, JSON, ForeignKey
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Date, JSON, LargeBinary, ForeignKey, Index, Computed,
+    literal_column, text
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
-from app.database import Base
+from app.database import Base, json_text
+from app.services.password_service import password_hasher
 import enum
 import secrets
-import hashlib
 
 
 class UserRole(str, enum.Enum):
@@ -24,6 +29,23 @@ class CustomerStatus(str, enum.Enum):
     SIGNED = "已签约"
 
 
+# KYC 热点单值字段：以虚拟生成列 kyc_<字段名> 从 kyc_data 中提取并建立索引，
+# 用于客户列表的分群筛选（如资产规模、城市）
+KYC_INDEXED_FIELDS = ["asset_level", "city", "industry_category", "job_type", "timeline", "age_group"]
+
+# KYC 多选字段：每个选中值展开为 customer_kyc_facets 中的一行，用于按选项组合筛选
+KYC_FACET_FIELDS = ["target_countries", "core_needs", "children_education", "education_certifications"]
+
+
+def _kyc_generated_column(field: str):
+    """由 kyc_data 派生的虚拟生成列（延迟加载，仅在筛选时参与查询）"""
+    return deferred(Column(
+        String(100),
+        # persisted 留空：SQLite 默认为 VIRTUAL，PostgreSQL 只支持 STORED
+        Computed(json_text(literal_column("kyc_data"), field))
+    ))
+
+
 class User(Base):
     """
     用户表 - 存储系统用户（管理员和顾问）
@@ -41,14 +63,12 @@ class User(Base):
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """对密码进行哈希处理"""
-        # 使用 SHA-256 + 固定盐值（生产环境建议使用 bcrypt）
-        salt = "kyc_crm_salt_2024"
-        return hashlib.sha256(f"{salt}{password}".encode()).hexdigest()
+        """对密码进行哈希处理（按配置使用 scrypt / PBKDF2，见 password_service）"""
+        return password_hasher.hash(password)
     
     def verify_password(self, password: str) -> bool:
-        """验证密码"""
-        return self.password_hash == self.hash_password(password)
+        """验证密码（兼容旧的 SHA-256 哈希）"""
+        return password_hasher.verify(password, self.password_hash)
     
     @property
     def is_admin(self) -> bool:
@@ -73,16 +93,14 @@ class FormTemplate(Base):
 
 class Customer(Base):
     """
-    客户表 - 存储客户信息和AI分析结果
+    客户表 - 存储客户信息（AI 分析结果见 CustomerReport）
     """
     __tablename__ = "customers"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, index=True)       # 客户姓名
-    kyc_data = Column(JSON, nullable=True)                      # KYC表单原始数据
-    status = Column(String(20), default=CustomerStatus.PENDING.value, index=True)  # 状态
-    ai_report = Column(Text, nullable=True)                     # AI分析报告(Markdown)
-    ai_opportunities = Column(JSON, nullable=True)              # AI商机挖掘结果
+    kyc_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # KYC表单原始数据
+    status = Column(String(20), default=CustomerStatus.PENDING.value)  # 状态
     
     # [预留字段] 用于存储客户生日，MVP阶段默认为空
     # 后续可通过接口更新，用于生日提醒功能
@@ -95,12 +113,52 @@ class Customer(Base):
     owner_user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     # 软删除
-    is_deleted = Column(Integer, default=0, index=True)
+    is_deleted = Column(Integer, default=0)  # 由下方按 is_deleted 划分的部分索引覆盖
     deleted_at = Column(DateTime, nullable=True)
 
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
 
+    # KYC 热点字段（见 KYC_INDEXED_FIELDS）
+    kyc_asset_level = _kyc_generated_column("asset_level")
+    kyc_city = _kyc_generated_column("city")
+    kyc_industry_category = _kyc_generated_column("industry_category")
+    kyc_job_type = _kyc_generated_column("job_type")
+    kyc_timeline = _kyc_generated_column("timeline")
+    kyc_age_group = _kyc_generated_column("age_group")
+
+    # 与列表/看板/导出查询形态对齐的索引：
+    # WHERE is_deleted = 0 [AND status/owner_user_id = ?] ORDER BY created_at DESC
+    __table_args__ = (
+        Index(
+            "ix_customers_live_created", "created_at",
+            sqlite_where=text("is_deleted = 0"), postgresql_where=text("is_deleted = 0")
+        ),
+        Index(
+            "ix_customers_live_status_created", "status", "created_at",
+            sqlite_where=text("is_deleted = 0"), postgresql_where=text("is_deleted = 0")
+        ),
+        Index(
+            "ix_customers_live_owner_created", "owner_user_id", "created_at",
+            sqlite_where=text("is_deleted = 0"), postgresql_where=text("is_deleted = 0")
+        ),
+        # 回收站：WHERE is_deleted = 1 ORDER BY deleted_at DESC
+        Index(
+            "ix_customers_trash_deleted_at", "deleted_at",
+            sqlite_where=text("is_deleted = 1"), postgresql_where=text("is_deleted = 1")
+        ),
+        # KYC 分群筛选：WHERE is_deleted = 0 AND kyc_<字段> = ? ORDER BY created_at DESC
+        *[
+            Index(
+                f"ix_customers_live_kyc_{field}", f"kyc_{field}", "created_at",
+                sqlite_where=text("is_deleted = 0"), postgresql_where=text("is_deleted = 0")
+            )
+            for field in KYC_INDEXED_FIELDS
+        ],
+        # 行会被移入归档库，id 不得复用（SQLite 默认复用已删除的最大 rowid）
+        {"sqlite_autoincrement": True},
+    )
+
 
 class FormInvite(Base):
     """
@@ -116,6 +174,9 @@ class FormInvite(Base):
     used_at = Column(DateTime, nullable=True)                                   # 使用时间
     created_by_user_id = Column(Integer, nullable=True)                         # 创建者用户ID（后续关联）
     created_at = Column(DateTime, server_default=func.now())
+
+    # 随客户移入归档库，id 不得复用
+    __table_args__ = {"sqlite_autoincrement": True}
     
     @staticmethod
     def generate_token() -> str:
@@ -130,12 +191,154 @@ class ActivityLog(Base):
     __tablename__ = "activity_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="SET NULL"), nullable=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="SET NULL"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    action_type = Column(String(50), nullable=False, index=True)
+    action_type = Column(String(50), nullable=False)
     action_detail = Column(JSON, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
+    # 客户时间线：WHERE customer_id = ? ORDER BY created_at DESC
+    # 跨客户动态：ORDER BY created_at DESC, id DESC，可按操作人 / 操作类型筛选
+    __table_args__ = (
+        Index("ix_activity_logs_customer_created", "customer_id", "created_at"),
+        Index("ix_activity_logs_created", "created_at", "id"),
+        Index("ix_activity_logs_user_created", "user_id", "created_at", "id"),
+        Index("ix_activity_logs_action_created", "action_type", "created_at", "id"),
+        # 行会被移入归档库，id 不得复用
+        {"sqlite_autoincrement": True},
+    )
+
+
+class CustomerReport(Base):
+    """
+    客户 AI 分析结果表 - 每个客户一行，保存最新一次分析结果
+    报告正文体积较大，与 customers 分开存放，列表类查询无需读取
+    """
+    __tablename__ = "customer_reports"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    ai_report = Column(Text, nullable=True)                     # AI分析报告(Markdown)
+    ai_opportunities = Column(JSON, nullable=True)              # AI商机挖掘结果
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class CustomerReportVersion(Base):
+    """
+    客户 AI 报告历史表 - 每次分析追加一个版本，报告正文压缩存储
+    最新版本同时保存在 CustomerReport 中，读取最新报告无需解压
+    """
+    __tablename__ = "customer_report_versions"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)                   # 客户内递增的版本号
+    codec = Column(String(20), nullable=False)                  # 压缩方式（见 report_service）
+    report_data = Column(LargeBinary, nullable=False)           # 压缩后的报告正文
+    report_size = Column(Integer, nullable=False, default=0)    # 原文字节数
+    ai_opportunities = Column(JSON, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    # 版本列表 / 取指定版本：WHERE customer_id = ? [AND version = ?] ORDER BY version DESC
+    __table_args__ = (
+        Index("ix_customer_report_versions_customer_version", "customer_id", "version", unique=True),
+        # 随客户移入归档库，id 不得复用
+        {"sqlite_autoincrement": True},
+    )
+
+
+class CustomerKycFacet(Base):
+    """
+    客户 KYC 多选字段展开表 - 每个选中值一行（见 KYC_FACET_FIELDS）
+    随 customers.kyc_data 的写入同步维护
+    """
+    __tablename__ = "customer_kyc_facets"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    field = Column(String(50), primary_key=True)
+    value = Column(String(100), primary_key=True)
+
+    # 按选项取客户：WHERE field = ? AND value = ?（覆盖索引，直接得到 customer_id）
+    __table_args__ = (
+        Index("ix_customer_kyc_facets_field_value", "field", "value", "customer_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class CustomerCount(Base):
+    """
+    客户计数表 - 按 (归属顾问, 状态, 是否删除) 汇总的客户数量
+    由 customers 表上的触发器在同一事务内维护（见 count_service），
+    列表总数与仪表盘统计直接汇总此表，无需扫描 customers
+    """
+    __tablename__ = "customer_counts"
+
+    owner_key = Column(Integer, primary_key=True)       # owner_user_id，未分配为 0
+    status = Column(String(20), primary_key=True)
+    is_deleted = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        {"sqlite_with_rowid": False},
+    )
+
+
+class CustomerNameKey(Base):
+    """
+    客户姓名分块键 - 疑似重复客户检测的倒排索引（见 duplicate_service）
+    每个客户若干行：归一化姓名、完整拼音、拼音双音节，随 customers.name 的写入同步维护
+    """
+    __tablename__ = "customer_name_keys"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(100), primary_key=True)
+
+    # 按分块键取候选客户：WHERE key IN (...)（覆盖索引，直接得到 customer_id）
+    __table_args__ = (
+        Index("ix_customer_name_keys_key", "key", "customer_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class ActivityRollup(Base):
+    """
+    活动日志日汇总表 - 按 (日期, 客户, 操作人, 操作类型) 计数
+    由 activity_logs 上的插入触发器在同一事务内累加（见 rollup_service），
+    原始日志归档、压缩删除后计数仍保留，历史统计与客户活动概览直接汇总此表
+    """
+    __tablename__ = "activity_rollups"
+
+    day = Column(Date, primary_key=True)                    # created_at 的日期（UTC）
+    customer_key = Column(Integer, primary_key=True)        # customer_id，无关联客户为 0
+    user_key = Column(Integer, primary_key=True)            # user_id，无操作人为 0
+    action_type = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    # 客户活动概览：WHERE customer_key = ?（按日期范围的统计走主键）
+    __table_args__ = (
+        Index("ix_activity_rollups_customer_day", "customer_key", "day"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class LoginRateLimit(Base):
+    """
+    登录频率限制计数表 - 每个客户端一行，保存当前与上一固定窗口的失败次数
+    由 rate_limit_service.DatabaseBackend 原子 upsert，多个 worker 共享同一限流状态
+    """
+    __tablename__ = "login_rate_limits"
+
+    client_key = Column(String(64), primary_key=True)       # 客户端标识（IP）
+    window_start = Column(Integer, nullable=False)          # 当前窗口起点（Unix 时间戳）
+    count = Column(Integer, nullable=False, default=0)      # 当前窗口计数
+    previous = Column(Integer, nullable=False, default=0)   # 上一窗口计数
+
+    # 定期清理：WHERE window_start < ?
+    __table_args__ = (
+        Index("ix_login_rate_limits_window", "window_start"),
+        {"sqlite_with_rowid": False},
+    )
+
 
 class CozeOAuthToken(Base):
     """
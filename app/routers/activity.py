@@ -2,30 +2,100 @@
 活动日志 API 路由
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import date, datetime, time, timedelta
 
-from app.database import get_db
+from app.database import get_db, likely
 from app.models import ActivityLog, User, Customer
-from app.schemas import ActivityLogResponse, ActivityLogListResponse
-from app.services.auth_service import get_current_user, check_customer_access
+from app.schemas import (
+    ActivityLogResponse, ActivityLogListResponse, ActivitySummaryResponse, ActivityFeedItem, ActivityFeedResponse
+)
+from app.services.auth_service import get_current_user, check_customer_access, customer_access_filter
+from app.services.pagination_service import keyset_after, next_cursor_for
+from app.services.archive_service import activity_log_query, activity_log_total_query, get_archived_customer
+from app.services.rollup_service import customer_activity_summary
 
 router = APIRouter()
 
 
+@router.get("", response_model=ActivityFeedResponse)
+def get_activity_feed(
+    user_id: Optional[int] = Query(None, description="按操作人筛选"),
+    action_type: Optional[str] = Query(None, description="按操作类型筛选"),
+    owner_id: Optional[int] = Query(None, description="按客户归属顾问筛选（0=未分配）"),
+    date_from: Optional[date] = Query(None, description="起始日期 YYYY-MM-DD"),
+    date_to: Optional[date] = Query(None, description="截止日期 YYYY-MM-DD（含当天）"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    跨客户活动动态（按 created_at, id 降序游标分页）
+
+    普通用户只能看到可访问客户（本人名下 + 未分配）的动态；管理员可看全部，
+    包括不关联客户的日志（如永久删除记录）。操作人名称与客户姓名在同一查询中关联取出。
+    只包含热库中的日志，已移入归档库的历史见客户时间线与活动统计。
+    """
+    query = (
+        select(
+            ActivityLog.id, ActivityLog.customer_id, ActivityLog.user_id, ActivityLog.action_type,
+            ActivityLog.action_detail, ActivityLog.created_at,
+            func.coalesce(User.display_name, User.username).label("user_display_name"),
+            Customer.name.label("customer_name"),
+        )
+        .outerjoin(User, User.id == ActivityLog.user_id)
+        .outerjoin(Customer, Customer.id == ActivityLog.customer_id)
+    )
+    if not current_user.is_admin:
+        query = query.where(Customer.id.isnot(None), customer_access_filter(current_user))
+    if user_id is not None:
+        query = query.where(ActivityLog.user_id == user_id)
+    if action_type:
+        query = query.where(ActivityLog.action_type == action_type)
+    if owner_id is not None:
+        owner_condition = Customer.owner_user_id.is_(None) if owner_id == 0 else Customer.owner_user_id == owner_id
+        # 用 likely() 提示优化器沿 (created_at, id) 索引有序扫描日志再逐条回查客户，
+        # 而不是先取该顾问的全部客户、再对其全部日志临时排序
+        query = query.where(Customer.id.isnot(None), likely(owner_condition))
+    if date_from:
+        query = query.where(ActivityLog.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        # 包含当天，截止到次日 00:00
+        query = query.where(ActivityLog.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    if cursor:
+        try:
+            query = query.where(keyset_after(ActivityLog.created_at, ActivityLog.id, cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    ordered = query.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc()).limit(limit + 1)
+    rows, next_cursor = next_cursor_for(db.execute(ordered).all(), limit, "created_at")
+    return ActivityFeedResponse(
+        items=[ActivityFeedItem.model_validate(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+
 @router.get("/{customer_id}", response_model=ActivityLogListResponse)
 def get_activity_logs(
     customer_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    获取客户的活动日志（分页）
+    获取客户的活动日志（分页，含已移入归档库的日志）
+
+    传 cursor 时按 (created_at, id) 游标分页且不统计总数，否则按 skip/limit 分页。
     """
-    # 检查客户是否存在
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    # 检查客户是否存在（含已归档的客户）
+    customer = db.query(Customer).filter(Customer.id == customer_id).first() \
+        or get_archived_customer(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="客户不存在")
 
@@ -33,9 +103,16 @@ def get_activity_logs(
     if not check_customer_access(customer.owner_user_id, current_user):
         raise HTTPException(status_code=403, detail="无权查看此客户的操作记录")
 
-    query = db.query(ActivityLog).filter(ActivityLog.customer_id == customer_id)
-    total = query.count()
-    logs = query.order_by(ActivityLog.created_at.desc()).offset(skip).limit(limit).all()
+    try:
+        ordered = activity_log_query(customer_id, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor:
+        total = None
+    else:
+        total = db.execute(activity_log_total_query(customer_id)).scalar()
+        ordered = ordered.offset(skip)
+    logs, next_cursor = next_cursor_for(db.execute(ordered.limit(limit + 1)).all(), limit, "created_at")
 
     # 批量查询操作人信息
     user_ids = {log.user_id for log in logs if log.user_id}
@@ -50,4 +127,26 @@ def get_activity_logs(
         item.user_display_name = users_map.get(log.user_id)
         items.append(item)
 
-    return ActivityLogListResponse(total=total, items=items)
+    return ActivityLogListResponse(total=total, items=items, next_cursor=next_cursor)
+
+
+@router.get("/{customer_id}/summary", response_model=ActivitySummaryResponse)
+def get_activity_summary(
+    customer_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    客户的全部历史活动概览：各操作类型次数与按月分布
+
+    读取日汇总表，包含已移入归档库、已压缩删除明细的日志。
+    """
+    customer = db.query(Customer).filter(Customer.id == customer_id).first() \
+        or get_archived_customer(db, customer_id)
+    if not customer:
+        raise HTTPException(status_code=404, detail="客户不存在")
+
+    if not check_customer_access(customer.owner_user_id, current_user):
+        raise HTTPException(status_code=403, detail="无权查看此客户的操作记录")
+
+    return ActivitySummaryResponse(customer_id=customer_id, **customer_activity_summary(db, customer_id))
@@ -3,16 +3,16 @@ AI 相关 API 路由
 """
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import Literal, Optional
 import json
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Customer, User
 from app.services.coze_service import generate_birthday_greeting_via_coze, generate_birthday_greeting_stream
-from app.services.auth_service import get_current_user
-from app.services.activity_service import log_activity
+from app.services.auth_service import get_current_user_async
+from app.services.activity_service import enqueue_activity
 
 router = APIRouter()
 
@@ -74,8 +74,8 @@ def _safe_get_from_kyc(kyc_data: dict, key: str, default: str = "") -> str:
 @router.post("/generate-birthday-greeting", response_model=BirthdayGreetingResponse)
 async def generate_birthday_greeting(
     request: BirthdayGreetingRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     生成 AI 生日祝福
@@ -84,7 +84,7 @@ async def generate_birthday_greeting(
     然后调用 Coze 生日工作流生成个性化祝福语。
     """
     # 查询客户
-    customer = db.query(Customer).filter(Customer.id == request.customer_id).first()
+    customer = await db.get(Customer, request.customer_id)
     
     if not customer:
         raise HTTPException(status_code=404, detail="客户不存在")
@@ -116,11 +116,10 @@ async def generate_birthday_greeting(
             style=style
         )
 
-        log_activity(
-            db, request.customer_id, "birthday_greeting_generated",
+        enqueue_activity(
+            request.customer_id, "birthday_greeting_generated",
             {"style": style},
-            user_id=current_user.id,
-            auto_commit=True
+            user_id=current_user.id
         )
 
         return BirthdayGreetingResponse(
@@ -141,8 +140,8 @@ async def generate_birthday_greeting(
 @router.post("/generate-birthday-greeting/stream")
 async def generate_birthday_greeting_streaming(
     request: BirthdayGreetingRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     生成 AI 生日祝福 - 流式输出版本
@@ -150,7 +149,7 @@ async def generate_birthday_greeting_streaming(
     使用 Server-Sent Events (SSE) 实时返回生成结果
     """
     # 查询客户
-    customer = db.query(Customer).filter(Customer.id == request.customer_id).first()
+    customer = await db.get(Customer, request.customer_id)
     
     if not customer:
         async def error_stream():
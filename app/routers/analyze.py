@@ -1,18 +1,24 @@
 """
 AI 分析 API 路由
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import json
 
-from app.database import get_db
+from app.database import get_async_db, AsyncSessionLocal
 from app.models import Customer, CustomerStatus, User
-from app.schemas import AnalyzeResponse
+from app.schemas import (
+    AnalyzeResponse, ReportVersionListResponse, ReportVersionDetail, ReportDiffResponse
+)
 from app.services.coze_service import analyze_customer_kyc, analyze_customer_kyc_stream
-from app.services.auth_service import get_current_user
+from app.services.auth_service import get_current_user_async, check_customer_access
 from app.services.activity_service import log_activity
+from app.services.report_service import (
+    save_customer_report, list_report_versions, get_report_version, get_previous_report_version,
+    decompress_report, diff_reports
+)
 
 router = APIRouter()
 
@@ -20,8 +26,8 @@ router = APIRouter()
 @router.post("/{customer_id}", response_model=AnalyzeResponse)
 async def analyze_customer(
     customer_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     触发 AI 分析
@@ -32,7 +38,7 @@ async def analyze_customer(
     4. 更新状态为"已出方案"
     """
     # 获取客户
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    customer = await db.get(Customer, customer_id)
     
     if not customer:
         raise HTTPException(status_code=404, detail="客户不存在")
@@ -46,7 +52,7 @@ async def analyze_customer(
         db, customer_id, "ai_analysis_triggered",
         user_id=current_user.id
     )
-    db.commit()
+    await db.commit()
 
     try:
         # 调用 Coze 服务进行分析
@@ -55,23 +61,26 @@ async def analyze_customer(
             related_contacts=customer.related_contacts
         )
 
-        # 更新客户记录
-        customer.ai_report = result.get("report", "")
-        customer.ai_opportunities = result.get("opportunities", [])
+        # 保存分析结果并更新客户状态
+        report = await save_customer_report(
+            db, customer_id,
+            result.get("report", ""),
+            result.get("opportunities", []),
+            user_id=current_user.id
+        )
         customer.status = CustomerStatus.REPORTED.value
         log_activity(
             db, customer_id, "ai_analysis_completed",
             user_id=current_user.id
         )
-        db.commit()
-        db.refresh(customer)
+        await db.commit()
         
         return AnalyzeResponse(
             success=True,
             message="分析完成",
             customer_id=customer_id,
-            report=customer.ai_report,
-            opportunities=customer.ai_opportunities
+            report=report.ai_report,
+            opportunities=report.ai_opportunities
         )
         
     except Exception as e:
@@ -82,7 +91,7 @@ async def analyze_customer(
             {"error": str(e)},
             user_id=current_user.id
         )
-        db.commit()
+        await db.commit()
 
         raise HTTPException(
             status_code=500,
@@ -93,8 +102,8 @@ async def analyze_customer(
 @router.post("/{customer_id}/stream")
 async def analyze_customer_stream(
     customer_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     触发 AI 分析 - 流式输出版本
@@ -102,7 +111,7 @@ async def analyze_customer_stream(
     使用 Server-Sent Events (SSE) 实时返回分析结果
     """
     # 获取客户
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    customer = await db.get(Customer, customer_id)
     
     if not customer:
         raise HTTPException(status_code=404, detail="客户不存在")
@@ -117,7 +126,7 @@ async def analyze_customer_stream(
         db, customer_id, "ai_analysis_triggered",
         user_id=user_id
     )
-    db.commit()
+    await db.commit()
 
     # 保存客户数据用于流式处理
     kyc_data = customer.kyc_data
@@ -149,26 +158,25 @@ async def analyze_customer_stream(
             
             # 流结束后，更新数据库
             # 重新获取数据库会话中的客户对象
-            from app.database import SessionLocal
-            with SessionLocal() as new_db:
-                db_customer = new_db.query(Customer).filter(Customer.id == customer_id).first()
+            async with AsyncSessionLocal() as new_db:
+                db_customer = await new_db.get(Customer, customer_id)
                 if db_customer:
-                    db_customer.ai_report = accumulated_content
-                    db_customer.ai_opportunities = []
+                    await save_customer_report(
+                        new_db, customer_id, accumulated_content, [], user_id=user_id
+                    )
                     db_customer.status = CustomerStatus.REPORTED.value
                     log_activity(
                         new_db, customer_id, "ai_analysis_completed",
                         user_id=user_id
                     )
-                    new_db.commit()
+                    await new_db.commit()
                     print(f"✅ 客户 {customer_id} 报告已保存，长度: {len(accumulated_content)}")
         
         except Exception as e:
             print(f"❌ 流式处理异常: {str(e)}")
             # 恢复客户状态
-            from app.database import SessionLocal
-            with SessionLocal() as new_db:
-                db_customer = new_db.query(Customer).filter(Customer.id == customer_id).first()
+            async with AsyncSessionLocal() as new_db:
+                db_customer = await new_db.get(Customer, customer_id)
                 if db_customer:
                     db_customer.status = CustomerStatus.PENDING.value
                     log_activity(
@@ -176,7 +184,7 @@ async def analyze_customer_stream(
                         {"error": str(e)},
                         user_id=user_id
                     )
-                    new_db.commit()
+                    await new_db.commit()
             
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)}, ensure_ascii=False)}\n\n"
     
@@ -190,3 +198,85 @@ async def analyze_customer_stream(
         }
     )
 
+
+
+# ============ 历史报告 ============
+
+async def _get_accessible_customer(db: AsyncSession, customer_id: int, current_user: User) -> Customer:
+    """获取当前用户可访问的客户，否则抛出 404/403"""
+    customer = await db.get(Customer, customer_id)
+    if not customer or customer.is_deleted:
+        raise HTTPException(status_code=404, detail="客户不存在")
+    if not check_customer_access(customer.owner_user_id, current_user):
+        raise HTTPException(status_code=403, detail="无权访问此客户")
+    return customer
+
+
+@router.get("/{customer_id}/reports", response_model=ReportVersionListResponse)
+async def list_customer_reports(
+    customer_id: int,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取客户的历史报告版本列表（按版本号倒序）"""
+    await _get_accessible_customer(db, customer_id, current_user)
+    items = await list_report_versions(db, customer_id)
+    return ReportVersionListResponse(customer_id=customer_id, items=items)
+
+
+@router.get("/{customer_id}/reports/diff", response_model=ReportDiffResponse)
+async def diff_customer_reports(
+    customer_id: int,
+    from_version: Optional[int] = Query(None, description="起始版本（默认为目标版本之前最近的版本，没有时返回 400）"),
+    to_version: Optional[int] = Query(None, description="目标版本（默认最新版本）"),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """对比两个历史报告版本"""
+    await _get_accessible_customer(db, customer_id, current_user)
+
+    new = await get_report_version(db, customer_id, to_version)
+    if not new:
+        raise HTTPException(status_code=404, detail="报告版本不存在")
+    if from_version is None:
+        old = await get_previous_report_version(db, customer_id, new.version)
+        if not old:
+            raise HTTPException(status_code=400, detail=f"v{new.version} 之前没有可供对比的报告版本")
+    else:
+        old = await get_report_version(db, customer_id, from_version)
+        if not old:
+            raise HTTPException(status_code=404, detail="报告版本不存在")
+
+    return ReportDiffResponse(
+        customer_id=customer_id,
+        from_version=old.version,
+        to_version=new.version,
+        diff=diff_reports(
+            decompress_report(old.codec, old.report_data),
+            decompress_report(new.codec, new.report_data),
+            old.version, new.version
+        )
+    )
+
+
+@router.get("/{customer_id}/reports/{version}", response_model=ReportVersionDetail)
+async def get_customer_report(
+    customer_id: int,
+    version: int,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取指定版本的历史报告"""
+    await _get_accessible_customer(db, customer_id, current_user)
+    record = await get_report_version(db, customer_id, version)
+    if not record:
+        raise HTTPException(status_code=404, detail="报告版本不存在")
+
+    return ReportVersionDetail(
+        customer_id=customer_id,
+        version=record.version,
+        report=decompress_report(record.codec, record.report_data),
+        opportunities=record.ai_opportunities,
+        created_by=record.created_by,
+        created_at=record.created_at
+    )
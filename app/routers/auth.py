@@ -1,95 +1,68 @@
 """
 认证 API 路由
 """
-import time
-from collections import defaultdict
-from fastapi import APIRouter, Depends, HTTPException, Response, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models import User, UserRole
+from app.config import settings
+from app.database import engine, get_db, get_async_db, db_checkout_stats
+from app.models import User, UserRole, Customer, ActivityLog, CustomerReportVersion
 from app.schemas import (
     LoginRequest, LoginResponse, UserResponse,
     UserCreate, UserUpdate, UserPasswordUpdate
 )
 from app.services.auth_service import (
     create_session_token, SESSION_COOKIE_NAME, SESSION_MAX_AGE,
-    get_current_user, require_admin
+    get_current_user, get_current_user_async, require_admin, user_cache
 )
+from app.services.password_service import password_hasher, PasswordHasherBusy
+from app.services.rate_limit_service import SlidingWindowRateLimiter, create_backend
+from app.services.activity_service import activity_log_writer
+from app.services.rollup_service import anonymize_user_rollups
+from app.services.archive_service import count_archived_customers, reassign_archived_customers
 
 router = APIRouter()
 
 
 # ============ 登录频率限制 ============
 
-class LoginRateLimiter:
-    """
-    基于内存的登录频率限制器
-
-    规则：同一 IP 在 window 秒内最多尝试 max_attempts 次。
-    超出后返回冷却剩余秒数，需等待后才能继续登录。
-    """
-
-    def __init__(self, max_attempts: int = 5, window: int = 300):
-        self.max_attempts = max_attempts  # 允许的最大尝试次数
-        self.window = window              # 时间窗口（秒）
-        # {ip: [timestamp, timestamp, ...]}
-        self._attempts: dict[str, list[float]] = defaultdict(list)
-
-    def _cleanup(self, ip: str) -> None:
-        """清除过期的尝试记录"""
-        now = time.time()
-        self._attempts[ip] = [
-            t for t in self._attempts[ip] if now - t < self.window
-        ]
-        if not self._attempts[ip]:
-            self._attempts.pop(ip, None)
-
-    def check(self, ip: str) -> int:
-        """
-        检查是否允许登录
-
-        Returns:
-            0 — 允许登录
-            >0 — 需等待的秒数
-        """
-        self._cleanup(ip)
-        if len(self._attempts.get(ip, [])) >= self.max_attempts:
-            oldest = self._attempts[ip][0]
-            wait = int(self.window - (time.time() - oldest)) + 1
-            return max(wait, 1)
-        return 0
-
-    def record_failure(self, ip: str) -> None:
-        """记录一次失败尝试"""
-        self._attempts[ip].append(time.time())
-
-    def reset(self, ip: str) -> None:
-        """登录成功后清除该 IP 的失败记录"""
-        self._attempts.pop(ip, None)
-
-
-# 5 分钟窗口内最多 5 次失败尝试
-_login_limiter = LoginRateLimiter(max_attempts=5, window=300)
+# 默认 5 分钟窗口内最多 5 次失败尝试；database / redis 存储在多个 worker 间共享计数
+_login_limiter = SlidingWindowRateLimiter(
+    create_backend(
+        settings.LOGIN_RATE_LIMIT_BACKEND,
+        settings.LOGIN_RATE_LIMIT_WINDOW,
+        engine=engine,
+        max_keys=settings.LOGIN_RATE_LIMIT_MAX_KEYS,
+        redis_url=settings.REDIS_URL,
+    ),
+    max_attempts=settings.LOGIN_RATE_LIMIT_ATTEMPTS,
+    window=settings.LOGIN_RATE_LIMIT_WINDOW,
+)
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(
+async def login(
     login_data: LoginRequest,
     request: Request,
     response: Response,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     用户登录
     
     成功后设置 session cookie
-    - 同一 IP 在 5 分钟内最多允许 5 次失败尝试
+    - 同一 IP 在 LOGIN_RATE_LIMIT_WINDOW 秒内最多允许 LOGIN_RATE_LIMIT_ATTEMPTS 次失败尝试
+    - 密码在专用线程池中校验；旧格式或参数过期的哈希在登录成功后按当前配置重新计算
     """
     client_ip = request.client.host if request.client else "unknown"
 
     # 频率限制检查
-    wait_seconds = _login_limiter.check(client_ip)
+    wait_seconds = await run_in_threadpool(_login_limiter.check, client_ip)
     if wait_seconds > 0:
         return LoginResponse(
             success=False,
@@ -97,22 +70,35 @@ def login(
         )
 
     # 查找用户
-    user = db.query(User).filter(User.username == login_data.username).first()
-    
+    result = await db.execute(select(User).where(User.username == login_data.username))
+    user = result.scalar_one_or_none()
+
+    try:
+        # 用户不存在时同样计算一次哈希，不通过响应时间暴露用户名是否存在
+        password_ok = await password_hasher.verify_async(
+            login_data.password, user.password_hash if user else None
+        )
+        if password_ok and user.is_active and password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = await password_hasher.hash_async(login_data.password)
+            await db.commit()
+            user_cache.invalidate(user.id)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
     if not user:
-        _login_limiter.record_failure(client_ip)
+        await run_in_threadpool(_login_limiter.record_failure, client_ip)
         return LoginResponse(success=False, message="用户名或密码错误")
     
     if not user.is_active:
-        _login_limiter.record_failure(client_ip)
+        await run_in_threadpool(_login_limiter.record_failure, client_ip)
         return LoginResponse(success=False, message="账户已被禁用")
     
-    if not user.verify_password(login_data.password):
-        _login_limiter.record_failure(client_ip)
+    if not password_ok:
+        await run_in_threadpool(_login_limiter.record_failure, client_ip)
         return LoginResponse(success=False, message="用户名或密码错误")
     
     # 登录成功，清除失败记录
-    _login_limiter.reset(client_ip)
+    await run_in_threadpool(_login_limiter.reset, client_ip)
 
     # 创建会话令牌并设置 cookie
     session_token = create_session_token(user.id)
@@ -151,19 +137,22 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 
 @router.put("/me/password")
-def change_password(
+async def change_password(
     password_data: UserPasswordUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     修改当前用户密码
     """
-    if not current_user.verify_password(password_data.old_password):
-        raise HTTPException(status_code=400, detail="旧密码错误")
-    
-    current_user.password_hash = User.hash_password(password_data.new_password)
-    db.commit()
+    try:
+        if not await password_hasher.verify_async(password_data.old_password, current_user.password_hash):
+            raise HTTPException(status_code=400, detail="旧密码错误")
+        current_user.password_hash = await password_hasher.hash_async(password_data.new_password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    await db.commit()
+    user_cache.invalidate(current_user.id)
     
     return {"success": True, "message": "密码修改成功"}
 
@@ -182,6 +171,21 @@ def list_users(
     return [UserResponse.model_validate(u) for u in users]
 
 
+@router.get("/db-stats")
+def get_db_stats(admin: User = Depends(require_admin)):
+    """
+    数据库连接签出统计（管理员）
+
+    正常情况下每个请求只签出一条连接（max_per_request 为 1）；
+    activity_log_writer 为活动日志缓冲写入的统计，user_cache 为登录用户缓存的命中统计
+    """
+    stats = dict(db_checkout_stats)
+    stats["avg_per_request"] = round(stats["checkouts"] / stats["requests"], 2) if stats["requests"] else 0
+    stats["activity_log_writer"] = activity_log_writer.stats()
+    stats["user_cache"] = user_cache.stats()
+    return stats
+
+
 @router.post("/users", response_model=UserResponse)
 def create_user(
     user_data: UserCreate,
@@ -196,9 +200,14 @@ def create_user(
     if existing:
         raise HTTPException(status_code=400, detail="用户名已存在")
     
+    try:
+        password_hash = User.hash_password(user_data.password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
     new_user = User(
         username=user_data.username,
-        password_hash=User.hash_password(user_data.password),
+        password_hash=password_hash,
         display_name=user_data.display_name or user_data.username,
         role=user_data.role.value,
         is_active=1
@@ -234,6 +243,7 @@ def update_user(
         user.is_active = user_data.is_active
     
     db.commit()
+    user_cache.invalidate(user_id)
     db.refresh(user)
     
     return UserResponse.model_validate(user)
@@ -255,8 +265,12 @@ def reset_user_password(
         raise HTTPException(status_code=404, detail="用户不存在")
     
     default_password = "123456"
-    user.password_hash = User.hash_password(default_password)
+    try:
+        user.password_hash = User.hash_password(default_password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     db.commit()
+    user_cache.invalidate(user_id)
     
     return {
         "success": True,
@@ -267,13 +281,17 @@ def reset_user_password(
 @router.delete("/users/{user_id}")
 def delete_user(
     user_id: int,
+    transfer_to: Optional[int] = Query(
+        None, description="接收其名下客户（含已归档）的用户ID；该用户名下有客户时必填"
+    ),
     admin: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """
     永久删除用户（管理员）
     
-    警告：此操作不可逆，将从数据库中永久删除用户
+    警告：此操作不可逆，将从数据库中永久删除用户。
+    其名下有客户时需通过 transfer_to 指定接收客户的在职用户，否则返回 400。
     """
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -283,7 +301,42 @@ def delete_user(
         raise HTTPException(status_code=400, detail="不能删除自己")
     
     username = user.username
+
+    receiver = None
+    if transfer_to is not None:
+        receiver = db.query(User).filter(User.id == transfer_to).first()
+        if not receiver or not receiver.is_active or receiver.id == user_id:
+            raise HTTPException(status_code=400, detail="接收客户的用户不存在、已禁用或为被删除的用户")
+
+    owned = db.query(Customer).filter(Customer.owner_user_id == user_id).count()
+    owned += count_archived_customers(db, user_id)
+    if owned and receiver is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"用户 '{username}' 名下有 {owned} 个客户，请指定接收这些客户的用户（transfer_to）"
+        )
+
+    # 解除外键引用（PostgreSQL 会强制外键约束）：其名下客户（含已归档的）转给指定用户，
+    # 不能置空——owner_user_id 为空的客户所有顾问都可访问
+    transferred = 0
+    if owned:
+        transferred = db.query(Customer).filter(Customer.owner_user_id == user_id).update(
+            {Customer.owner_user_id: receiver.id}, synchronize_session=False
+        )
+        transferred += reassign_archived_customers(db, user_id, receiver.id)
+    db.query(ActivityLog).filter(ActivityLog.user_id == user_id).update(
+        {ActivityLog.user_id: None}, synchronize_session=False
+    )
+    anonymize_user_rollups(db, user_id)
+    db.query(CustomerReportVersion).filter(CustomerReportVersion.created_by == user_id).update(
+        {CustomerReportVersion.created_by: None}, synchronize_session=False
+    )
+
     db.delete(user)
     db.commit()
+    user_cache.invalidate(user_id)
     
-    return {"success": True, "message": f"用户 '{username}' 已永久删除"}
+    message = f"用户 '{username}' 已永久删除"
+    if transferred:
+        message += f"，其名下 {transferred} 个客户已转给 {receiver.username}"
+    return {"success": True, "message": message}
@@ -7,6 +7,7 @@ Coze OAuth 2.0 授权路由
 """
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.services.coze_oauth_service import (
     build_authorize_url,
@@ -83,7 +84,8 @@ async def coze_auth_callback(request: Request, code: str = None, error: str = No
         token_data = await exchange_code_for_token(code)
         
         # 存入数据库
-        save_token_to_db(
+        await run_in_threadpool(
+            save_token_to_db,
             access_token=token_data["access_token"],
             refresh_token=token_data["refresh_token"],
             expires_in=token_data["expires_in"],
@@ -2,18 +2,21 @@
 客户管理 API 路由
 """
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import func, select, update
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta
 import math
 
-from app.database import get_db
-from app.models import Customer, CustomerStatus, User, FormInvite
+from app.config import settings
+from app.database import get_db, likely
+from app.models import Customer, CustomerStatus, User, CustomerReport
 from app.schemas import (
     CustomerCreate,
     CustomerUpdate,
     CustomerResponse,
+    CustomerDetailResponse,
     CustomerListResponse,
     CustomerStatusUpdate,
     CustomerBirthdayUpdate,
@@ -22,111 +25,268 @@ from app.schemas import (
     BatchRestoreRequest,
     BatchOperationResponse,
     DuplicateCheckResponse,
+    DuplicateClusterListResponse,
+    PurgeReportResponse,
 )
 from app.services.auth_service import (
-    get_current_user, check_customer_access
+    get_current_user, check_customer_access, customer_access_filter
+)
+from app.services.activity_service import enqueue_activity, log_activity, log_activities
+from app.services.facet_service import facet_filter, parse_facets, sync_customer_facets
+from app.services.duplicate_service import (
+    DUPLICATE_THRESHOLD, find_candidates, find_duplicate_clusters, sync_customer_name_keys
+)
+from app.services.pagination_service import keyset_after, next_cursor_for
+from app.services.purge_service import delete_customers, last_purge, purge_report
+from app.services.archive_service import (
+    archived_customer_total_query, get_archived_customer, recycle_bin_query, unarchive_customers
+)
+from app.services.count_service import customer_total_query
+from app.services.search_service import (
+    highlight_snippet, like_search_filter, parse_search, search_hits
 )
-from app.services.activity_service import log_activity
 
 router = APIRouter()
 
+# 客户列表字段投影：fields= 指定返回字段，或 view= 选择预设字段组（full 为完整 CustomerResponse）
+CUSTOMER_LIST_FIELDS = list(CustomerResponse.model_fields)
+CUSTOMER_LIST_VIEWS = {
+    "list": ["id", "name", "status", "owner_user_id", "next_follow_up", "created_at", "search_snippet"],
+    "kanban": ["id", "name", "status", "owner_user_id", "next_follow_up"],
+    "full": None,
+}
+
 
 def base_customer_query(db: Session):
     """基础查询：排除已软删除的客户"""
     return db.query(Customer).filter(Customer.is_deleted == 0)
 
 
+def _parse_list_fields(fields: Optional[str], view: str) -> Optional[List[str]]:
+    """
+    解析客户列表的返回字段
+
+    Returns:
+        字段列表（id 总在首位）；返回完整对象时为 None
+    """
+    if not fields:
+        return CUSTOMER_LIST_VIEWS[view]
+    field_list = ["id"] + [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+    unknown = [f for f in field_list if f not in CUSTOMER_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知字段: {', '.join(unknown)}")
+    return list(dict.fromkeys(field_list))
+
+
+def _projected_columns(field_list: List[str]) -> list:
+    """投影查询的列：所需字段 + 游标分页需要的 id / created_at"""
+    names = dict.fromkeys([f for f in field_list if f != "search_snippet"] + ["id", "created_at"])
+    return [getattr(Customer, name) for name in names]
+
+
+def _project(row, field_list: List[str], snippet: Optional[str] = None) -> dict:
+    return {f: snippet if f == "search_snippet" else getattr(row, f) for f in field_list}
+
+
+def _customer_list_response(items: list, field_list: Optional[List[str]], **page_info):
+    if field_list is None:
+        return CustomerListResponse(items=items, **page_info)
+    # 投影结果是只含所需字段的字典，不经响应模型补齐其余字段，直接以 orjson 序列化
+    return ORJSONResponse({**CustomerListResponse(items=[], **page_info).model_dump(), "items": items})
+
+
 # ============ 静态路由（必须在 /{customer_id} 之前声明） ============
 
 @router.get("/check-duplicate", response_model=DuplicateCheckResponse)
 def check_duplicate(
     name: str = Query(..., min_length=1, description="客户姓名"),
     exclude_id: Optional[int] = Query(None, description="排除的客户ID（编辑时用）"),
+    city: Optional[str] = Query(None, description="KYC 城市（一致时提高相似度）"),
+    age_group: Optional[str] = Query(None, description="KYC 年龄段（一致时提高相似度）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """检测客户姓名是否重复"""
-    query = base_customer_query(db).filter(Customer.name == name)
-    if exclude_id:
-        query = query.filter(Customer.id != exclude_id)
+    """
+    检测疑似重复客户
 
-    duplicates = query.all()
+    除同名外，繁简体、拼音录入、多余空格等写法不同的姓名也会命中，
+    结果按相似度降序，附带 score 与判定原因 reasons
+    """
+    duplicates = find_candidates(db, name, exclude_id=exclude_id, city=city, age_group=age_group)
     return DuplicateCheckResponse(
         has_duplicate=len(duplicates) > 0,
-        duplicates=[
-            {"id": c.id, "name": c.name, "status": c.status}
-            for c in duplicates
-        ]
+        duplicates=duplicates
     )
 
 
+@router.get("/duplicates", response_model=DuplicateClusterListResponse)
+def list_duplicate_clusters(
+    threshold: float = Query(DUPLICATE_THRESHOLD, ge=0.5, le=1.0, description="最低相似度"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """扫描全库疑似重复的客户簇（仅管理员）"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="需要管理员权限")
+
+    clusters = find_duplicate_clusters(db, threshold=threshold)
+    return DuplicateClusterListResponse(total=len(clusters), clusters=clusters)
+
+
 @router.get("/recycle-bin", response_model=CustomerListResponse)
 def get_recycle_bin(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取回收站列表（已软删除的客户）"""
-    query = db.query(Customer).filter(Customer.is_deleted == 1)
-
-    # 权限过滤
-    if not current_user.is_admin:
-        query = query.filter(
-            or_(
-                Customer.owner_user_id == current_user.id,
-                Customer.owner_user_id.is_(None)
-            )
-        )
+    """
+    获取回收站列表（已软删除的客户，含已移入归档库的客户）
 
-    total = query.count()
-    total_pages = max(1, math.ceil(total / page_size))
-    skip = (page - 1) * page_size
-    customers = query.order_by(Customer.deleted_at.desc()).offset(skip).limit(page_size).all()
+    传 cursor 时按 (deleted_at, id) 游标分页，不统计总数；否则按页码分页。
+    """
+    try:
+        query = recycle_bin_query(current_user, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor:
+        total = None
+        total_pages = None
+    else:
+        total = db.execute(customer_total_query(current_user, is_deleted=1)).scalar()
+        archived_total = archived_customer_total_query(current_user)
+        if archived_total is not None:
+            total += db.execute(archived_total).scalar()
+        total_pages = max(1, math.ceil(total / page_size))
+        query = query.offset((page - 1) * page_size)
+    customers, next_cursor = next_cursor_for(
+        db.execute(query.limit(page_size + 1)).all(), page_size, "deleted_at"
+    )
 
     return CustomerListResponse(
         total=total,
         items=[CustomerResponse.model_validate(c) for c in customers],
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 
+@router.get("/recycle-bin/purge-report", response_model=PurgeReportResponse)
+def get_purge_report(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """回收站定时清理预览：按保留期限到期的客户与级联删除的数据量，以及最近一次清理的指标（仅管理员）"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="需要管理员权限")
+
+    retention_days = settings.RECYCLE_BIN_RETENTION_DAYS
+    last_run = last_purge(db)
+    if retention_days <= 0:
+        return PurgeReportResponse(retention_days=retention_days, last_run=last_run)
+    report = purge_report(db.connection(), datetime.now() - timedelta(days=retention_days))
+    return PurgeReportResponse(retention_days=retention_days, last_run=last_run, **report)
+
+
+def _unarchive_customer(db: Session, current_user: User, customer_id: int, detail: str) -> None:
+    """客户已移入归档库时，先移回热库回收站"""
+    archived = get_archived_customer(db, customer_id)
+    if archived is None:
+        return
+    if not check_customer_access(archived.owner_user_id, current_user):
+        raise HTTPException(status_code=403, detail=detail)
+    unarchive_customers(db, current_user, [customer_id])
+
+
+# 批量操作每条 UPDATE 的 IN 列表长度；同批的活动日志每行 4 个参数，
+# 合计仍低于 SQLite 默认的绑定参数上限（SQLITE_MAX_VARIABLE_NUMBER = 32766）
+BATCH_CHUNK_SIZE = 500
+
+
+def _chunked_ids(customer_ids: List[int]):
+    """去重后按 BATCH_CHUNK_SIZE 分批"""
+    ids = list(dict.fromkeys(customer_ids))
+    for start in range(0, len(ids), BATCH_CHUNK_SIZE):
+        yield ids[start:start + BATCH_CHUNK_SIZE]
+
+
+def _access_conditions(current_user: User) -> list:
+    """批量操作的权限条件（管理员不限）"""
+    return [] if current_user.is_admin else [customer_access_filter(current_user)]
+
+
 @router.put("/batch/status", response_model=BatchOperationResponse)
 def batch_update_status(
     data: BatchStatusUpdate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """批量修改客户状态"""
-    customers = base_customer_query(db).filter(
-        Customer.id.in_(data.customer_ids)
-    ).all()
+    """
+    批量修改客户状态
 
-    # 权限过滤
-    accessible = []
-    for c in customers:
-        if check_customer_access(c.owner_user_id, current_user):
-            accessible.append(c)
-
-    for c in accessible:
-        old_status = c.status
-        c.status = data.status.value
-        log_activity(
-            db, c.id, "status_changed",
-            {"from_status": old_status, "to_status": data.status.value},
-            user_id=current_user.id
-        )
+    每批一条 UPDATE ... WHERE id IN (...) AND 权限条件，
+    日志所需的原状态在同一事务内先按列读取。
+    """
+    affected = 0
+    for chunk in _chunked_ids(data.customer_ids):
+        conditions = [Customer.id.in_(chunk), Customer.is_deleted == 0, *_access_conditions(current_user)]
+        old_status = dict(db.execute(select(Customer.id, Customer.status).where(*conditions)).all())
+        updated = db.execute(
+            update(Customer).where(*conditions).values(status=data.status.value).returning(Customer.id),
+            execution_options={"synchronize_session": False}
+        ).scalars().all()
+        affected += len(updated)
+        log_activities(db, [
+            {
+                "customer_id": customer_id,
+                "user_id": current_user.id,
+                "action_type": "status_changed",
+                "action_detail": {"from_status": old_status.get(customer_id), "to_status": data.status.value},
+            }
+            for customer_id in updated
+        ])
 
     db.commit()
     return BatchOperationResponse(
         success=True,
-        message=f"已更新 {len(accessible)} 个客户状态",
-        affected_count=len(accessible)
+        message=f"已更新 {affected} 个客户状态",
+        affected_count=affected
     )
 
 
+def _batch_set_deleted(db: Session, current_user: User, customer_ids: List[int], deleted: bool) -> int:
+    """批量软删除 / 恢复，返回 UPDATE 实际更新的行数"""
+    action_type = "customer_deleted" if deleted else "customer_restored"
+    values = {"is_deleted": 1, "deleted_at": datetime.now()} if deleted else {"is_deleted": 0, "deleted_at": None}
+    affected = 0
+    for chunk in _chunked_ids(customer_ids):
+        updated = db.execute(
+            update(Customer)
+            .where(
+                Customer.id.in_(chunk),
+                Customer.is_deleted == (0 if deleted else 1),
+                *_access_conditions(current_user)
+            )
+            .values(**values)
+            .returning(Customer.id, Customer.name),
+            execution_options={"synchronize_session": False}
+        ).all()
+        affected += len(updated)
+        log_activities(db, [
+            {
+                "customer_id": customer_id,
+                "user_id": current_user.id,
+                "action_type": action_type,
+                "action_detail": {"name": name},
+            }
+            for customer_id, name in updated
+        ])
+    return affected
+
+
 @router.post("/batch/delete", response_model=BatchOperationResponse)
 def batch_delete(
     data: BatchDeleteRequest,
@@ -134,30 +294,12 @@ def batch_delete(
     db: Session = Depends(get_db)
 ):
     """批量软删除客户"""
-    customers = base_customer_query(db).filter(
-        Customer.id.in_(data.customer_ids)
-    ).all()
-
-    accessible = []
-    for c in customers:
-        if check_customer_access(c.owner_user_id, current_user):
-            accessible.append(c)
-
-    now = datetime.now()
-    for c in accessible:
-        c.is_deleted = 1
-        c.deleted_at = now
-        log_activity(
-            db, c.id, "customer_deleted",
-            {"name": c.name},
-            user_id=current_user.id
-        )
-
+    affected = _batch_set_deleted(db, current_user, data.customer_ids, deleted=True)
     db.commit()
     return BatchOperationResponse(
         success=True,
-        message=f"已将 {len(accessible)} 个客户移入回收站",
-        affected_count=len(accessible)
+        message=f"已将 {affected} 个客户移入回收站",
+        affected_count=affected
     )
 
 
@@ -167,31 +309,15 @@ def batch_restore(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """批量恢复已删除客户"""
-    customers = db.query(Customer).filter(
-        Customer.id.in_(data.customer_ids),
-        Customer.is_deleted == 1
-    ).all()
-
-    accessible = []
-    for c in customers:
-        if check_customer_access(c.owner_user_id, current_user):
-            accessible.append(c)
-
-    for c in accessible:
-        c.is_deleted = 0
-        c.deleted_at = None
-        log_activity(
-            db, c.id, "customer_restored",
-            {"name": c.name},
-            user_id=current_user.id
-        )
-
+    """批量恢复已删除客户（已归档的客户先移回热库）"""
+    for chunk in _chunked_ids(data.customer_ids):
+        unarchive_customers(db, current_user, chunk)
+    affected = _batch_set_deleted(db, current_user, data.customer_ids, deleted=False)
     db.commit()
     return BatchOperationResponse(
         success=True,
-        message=f"已恢复 {len(accessible)} 个客户",
-        affected_count=len(accessible)
+        message=f"已恢复 {affected} 个客户",
+        affected_count=affected
     )
 
 
@@ -201,46 +327,70 @@ def batch_restore(
 def get_customers(
     status: Optional[str] = Query(None, description="按状态筛选"),
     statuses: Optional[str] = Query(None, description="逗号分隔多状态筛选"),
-    search: Optional[str] = Query(None, description="按姓名搜索"),
+    search: Optional[str] = Query(None, description="全文搜索（姓名、城市、职位、备注、关联人、AI 报告）"),
     owner_id: Optional[int] = Query(None, description="按归属顾问筛选（0=未分配）"),
     date_from: Optional[str] = Query(None, description="创建日期起始 YYYY-MM-DD"),
     date_to: Optional[str] = Query(None, description="创建日期截止 YYYY-MM-DD"),
+    asset_level: Optional[str] = Query(None, description="按资产规模筛选"),
+    city: Optional[str] = Query(None, description="按所在城市筛选"),
+    industry_category: Optional[str] = Query(None, description="按行业类别筛选"),
+    job_type: Optional[str] = Query(None, description="按职业类型筛选"),
+    timeline: Optional[str] = Query(None, description="按计划时间筛选"),
+    age_group: Optional[str] = Query(None, description="按年龄段筛选"),
+    facets: Optional[str] = Query(None, description="KYC 多选字段筛选，格式 字段:值，逗号分隔"),
+    facet_mode: str = Query("and", pattern="^(and|or)$", description="多选筛选组合方式：and / or"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=999, description="每页条数"),
     skip: int = Query(None, ge=0, description="跳过条数（兼容旧参数）"),
     limit: int = Query(None, ge=1, le=999, description="返回条数（兼容旧参数）"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    view: str = Query("full", pattern="^(list|kanban|full)$", description="预设字段组：list / kanban / full"),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段（优先于 view，id 总是返回）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    获取客户列表（支持状态筛选、搜索、分页）
+    获取客户列表（支持状态筛选、KYC 字段筛选、搜索、分页）
+
+    分页方式：
+    - 游标：传 cursor（取自上一页的 next_cursor），按 (created_at, id) 定位，不统计总数
+    - 页码：page/page_size 或兼容旧的 skip/limit，每次统计总数
+
+    字段投影：view=list / kanban 或 fields=name,status,... 时只查询、只返回所需字段，
+    不读取 kyc_data / related_contacts 等大字段；默认 full 返回完整客户对象
 
     权限规则：
     - 管理员：可查看所有客户
     - 普通用户：只能查看自己的客户 + owner_user_id 为空的客户
     """
+    field_list = _parse_list_fields(fields, view)
     query = base_customer_query(db)
 
     # 权限过滤
     if not current_user.is_admin:
-        query = query.filter(
-            or_(
-                Customer.owner_user_id == current_user.id,
-                Customer.owner_user_id.is_(None)
-            )
-        )
+        query = query.filter(customer_access_filter(current_user))
 
     # 状态筛选（支持单个或多个）
+    status_list = []
     if statuses:
         status_list = [s.strip() for s in statuses.split(",") if s.strip()]
         if status_list:
-            query = query.filter(Customer.status.in_(status_list))
+            # 多状态筛选（看板）通常覆盖大部分客户，用 likely() 提示优化器
+            # 沿 created_at 部分索引有序扫描，避免按状态索引取数后再临时排序
+            query = query.filter(likely(Customer.status.in_(status_list)))
     elif status:
+        status_list = [status]
         query = query.filter(Customer.status == status)
 
-    # 姓名搜索
-    if search:
-        query = query.filter(Customer.name.ilike(f"%{search}%"))
+    # 全文搜索：FTS5 索引按相关度排序，短关键词对索引覆盖的全部字段 LIKE 匹配
+    hits = None
+    if search and search.strip():
+        match, short_terms = parse_search(search)
+        if match:
+            hits = search_hits(match)
+            query = query.join(hits, hits.c.customer_id == Customer.id)
+        if short_terms:
+            query = query.filter(like_search_filter(short_terms))
 
     # 按归属顾问筛选
     if owner_id is not None:
@@ -267,7 +417,23 @@ def get_customers(
         except ValueError:
             pass
 
-    total = query.count()
+    # KYC 热点字段筛选（走 kyc_* 生成列索引）
+    kyc_filters = {
+        "asset_level": asset_level, "city": city, "industry_category": industry_category,
+        "job_type": job_type, "timeline": timeline, "age_group": age_group,
+    }
+    for field, value in kyc_filters.items():
+        if value:
+            query = query.filter(getattr(Customer, f"kyc_{field}") == value)
+
+    # KYC 多选字段筛选（走 customer_kyc_facets 索引求交集/并集）
+    if facets:
+        try:
+            facet_list = parse_facets(facets)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if facet_list:
+            query = query.filter(facet_filter(facet_list, facet_mode))
 
     # 兼容旧 skip/limit 参数
     if skip is not None and limit is not None:
@@ -281,15 +447,70 @@ def get_customers(
         actual_skip = (page - 1) * page_size
         actual_limit = page_size
 
-    total_pages = max(1, math.ceil(total / actual_page_size)) if actual_page_size > 0 else 1
-    customers = query.order_by(Customer.created_at.desc()).offset(actual_skip).limit(actual_limit).all()
+    if hits is not None:
+        # 全文搜索按相关度排序，只支持页码分页
+        total = query.count()
+        if field_list is not None:
+            query = query.with_entities(*_projected_columns(field_list))
+        rows = (
+            query.add_columns(hits.c.snippet)
+            .order_by(hits.c.rank, Customer.id.desc())
+            .offset(actual_skip).limit(actual_limit).all()
+        )
+        items = []
+        for row in rows:
+            snippet = highlight_snippet(row.snippet)
+            if field_list is not None:
+                items.append(_project(row, field_list, snippet))
+                continue
+            item = CustomerResponse.model_validate(row[0])
+            item.search_snippet = snippet
+            items.append(item)
+        return _customer_list_response(
+            items,
+            field_list,
+            total=total,
+            page=actual_page,
+            page_size=actual_page_size,
+            total_pages=max(1, math.ceil(total / actual_page_size)) if actual_page_size > 0 else 1
+        )
 
-    return CustomerListResponse(
+    if cursor:
+        try:
+            query = query.filter(keyset_after(Customer.created_at, Customer.id, cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        total = None
+        total_pages = None
+        actual_skip = 0
+    else:
+        # 仅按状态 / 归属顾问筛选时总数取自计数表，其余筛选执行真实 COUNT
+        if search or date_from or date_to or facets or any(kyc_filters.values()):
+            total = query.count()
+        else:
+            total = db.execute(customer_total_query(current_user, 0, status_list, owner_id)).scalar()
+        total_pages = max(1, math.ceil(total / actual_page_size)) if actual_page_size > 0 else 1
+
+    if field_list is not None:
+        query = query.with_entities(*_projected_columns(field_list))
+    customers, next_cursor = next_cursor_for(
+        query.order_by(Customer.created_at.desc(), Customer.id.desc())
+        .offset(actual_skip).limit(actual_limit + 1).all(),
+        actual_limit, "created_at"
+    )
+
+    if field_list is not None:
+        items = [_project(row, field_list) for row in customers]
+    else:
+        items = [CustomerResponse.model_validate(c) for c in customers]
+    return _customer_list_response(
+        items,
+        field_list,
         total=total,
-        items=[CustomerResponse.model_validate(c) for c in customers],
         page=actual_page,
         page_size=actual_page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 
@@ -324,20 +545,22 @@ def create_customer(
     )
 
     db.add(customer)
+    db.flush()
+    sync_customer_facets(db, customer)
+    sync_customer_name_keys(db, customer)
     db.commit()
     db.refresh(customer)
 
-    log_activity(
-        db, customer.id, "customer_created",
+    enqueue_activity(
+        customer.id, "customer_created",
         {"name": customer.name},
-        user_id=current_user.id,
-        auto_commit=True
+        user_id=current_user.id
     )
 
     return CustomerResponse.model_validate(customer)
 
 
-@router.get("/{customer_id}", response_model=CustomerResponse)
+@router.get("/{customer_id}", response_model=CustomerDetailResponse)
 def get_customer(
     customer_id: int,
     current_user: User = Depends(get_current_user),
@@ -353,7 +576,13 @@ def get_customer(
     if not check_customer_access(customer.owner_user_id, current_user):
         raise HTTPException(status_code=403, detail="无权访问此客户")
 
-    return CustomerResponse.model_validate(customer)
+    # AI 分析结果单独存放，仅详情接口读取
+    response = CustomerDetailResponse.model_validate(customer)
+    report = db.get(CustomerReport, customer_id)
+    if report:
+        response.ai_report = report.ai_report
+        response.ai_opportunities = report.ai_opportunities
+    return response
 
 
 @router.put("/{customer_id}", response_model=CustomerResponse)
@@ -389,6 +618,11 @@ def update_customer(
     for field, value in update_data.items():
         setattr(customer, field, value)
 
+    if 'kyc_data' in update_data:
+        sync_customer_facets(db, customer)
+    if 'name' in update_data:
+        sync_customer_name_keys(db, customer)
+
     db.commit()
     db.refresh(customer)
 
@@ -513,7 +747,8 @@ def restore_customer(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """恢复已删除的客户"""
+    """恢复已删除的客户（含已归档的客户）"""
+    _unarchive_customer(db, current_user, customer_id, "无权操作此客户")
     customer = db.query(Customer).filter(
         Customer.id == customer_id,
         Customer.is_deleted == 1
@@ -576,10 +811,11 @@ def permanent_delete_customer(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """永久删除客户（仅管理员，需先软删除）"""
+    """永久删除客户（仅管理员，需先软删除；已归档的客户同样适用）"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="需要管理员权限")
 
+    _unarchive_customer(db, current_user, customer_id, "无权操作此客户")
     customer = db.query(Customer).filter(
         Customer.id == customer_id,
         Customer.is_deleted == 1
@@ -588,17 +824,16 @@ def permanent_delete_customer(
     if not customer:
         raise HTTPException(status_code=404, detail="客户不存在或未在回收站中")
 
-    # 记录日志
+    # 级联删除邀请记录、活动日志、KYC 展开行、姓名分块键与 AI 分析结果
+    name = customer.name
+    delete_customers(db, [customer_id])
+
+    # 客户的时间线已删除，删除动作以不关联客户的日志留痕
     log_activity(
-        db, customer_id, "customer_permanent_deleted",
-        {"name": customer.name},
+        db, None, "customer_permanent_deleted",
+        {"id": customer_id, "name": name},
         user_id=current_user.id
     )
-
-    # 先删除关联的邀请记录
-    db.query(FormInvite).filter(FormInvite.customer_id == customer_id).delete()
-
-    db.delete(customer)
     db.commit()
 
     return {"message": "客户已永久删除", "id": customer_id}
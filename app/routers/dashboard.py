@@ -1,15 +1,20 @@
 """
 仪表盘 API 路由
 """
-from fastapi import APIRouter, Depends
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
 
 from app.database import get_db
-from app.models import Customer, CustomerStatus, User
-from app.schemas import DashboardStats, DashboardReminders
+from app.models import CustomerStatus, User
+from app.schemas import DashboardStats, DashboardReminders, ActivityStatsResponse
 from app.services.reminder_service import get_all_reminders
 from app.services.auth_service import get_current_user
+from app.services.count_service import status_counts, status_counts_query
+from app.services.rollup_service import activity_stats_query
 
 router = APIRouter()
 
@@ -19,26 +24,8 @@ def get_dashboard_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取仪表盘统计数据（使用 GROUP BY 优化查询）"""
-    query = db.query(Customer).filter(Customer.is_deleted == 0)
-
-    # 权限过滤
-    if not current_user.is_admin:
-        query = query.filter(
-            or_(
-                Customer.owner_user_id == current_user.id,
-                Customer.owner_user_id.is_(None)
-            )
-        )
-
-    status_counts = (
-        query
-        .with_entities(Customer.status, func.count(Customer.id))
-        .group_by(Customer.status)
-        .all()
-    )
-
-    counts = dict(status_counts)
+    """获取仪表盘统计数据（汇总 customer_counts 计数表）"""
+    counts = status_counts(db.execute(status_counts_query(current_user)).all())
     total = sum(counts.values())
 
     return DashboardStats(
@@ -51,6 +38,36 @@ def get_dashboard_stats(
     )
 
 
+@router.get("/activity-stats", response_model=ActivityStatsResponse)
+def get_activity_stats(
+    days: int = Query(30, ge=1, le=3650, description="统计最近的天数"),
+    action_type: Optional[str] = Query(None, description="只统计该操作类型"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    活动统计：最近 days 天按日、按操作类型的次数（汇总 activity_rollups 日汇总表）
+
+    管理员统计全部操作，普通用户只统计本人的操作。
+    """
+    since = date.today() - timedelta(days=days - 1)
+    by_day = defaultdict(dict)
+    by_action = defaultdict(int)
+    for day, action, count in db.execute(activity_stats_query(since, current_user, action_type)):
+        by_day[day][action] = int(count)
+        by_action[action] += int(count)
+
+    return ActivityStatsResponse(
+        since=since,
+        total=sum(by_action.values()),
+        by_action=dict(sorted(by_action.items(), key=lambda item: -item[1])),
+        by_day=[
+            {"day": day, "total": sum(actions.values()), "by_action": actions}
+            for day, actions in sorted(by_day.items())
+        ]
+    )
+
+
 @router.get("/reminders", response_model=DashboardReminders)
 def get_reminders(
     current_user: User = Depends(get_current_user),
@@ -7,12 +7,11 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from typing import Optional
 
 from app.database import get_db
-from app.models import Customer, FormTemplate, User
-from app.services.auth_service import get_current_user
+from app.models import Customer, CustomerReport, FormTemplate, User
+from app.services.auth_service import get_current_user, customer_access_filter
 
 router = APIRouter()
 
@@ -39,17 +38,20 @@ def export_customers_csv(
 
     # 权限过滤
     if not current_user.is_admin:
-        query = query.filter(
-            or_(
-                Customer.owner_user_id == current_user.id,
-                Customer.owner_user_id.is_(None)
-            )
-        )
+        query = query.filter(customer_access_filter(current_user))
 
     if status:
         query = query.filter(Customer.status == status)
 
-    customers = query.order_by(Customer.created_at.desc()).all()
+    query = query.order_by(Customer.created_at.desc())
+
+    # AI 报告单独存放，仅在导出报告时关联读取
+    if "ai_report" in field_set:
+        rows = query.outerjoin(
+            CustomerReport, CustomerReport.customer_id == Customer.id
+        ).add_columns(CustomerReport.ai_report).all()
+    else:
+        rows = [(customer, None) for customer in query.all()]
 
     # 获取用户映射（用于顾问名称）
     users_map = {}
@@ -92,7 +94,7 @@ def export_customers_csv(
         output.seek(0)
         output.truncate(0)
 
-        for customer in customers:
+        for customer, ai_report in rows:
             row = []
 
             if "basic" in field_set:
@@ -116,7 +118,7 @@ def export_customers_csv(
                     row.append(value if value is not None else "")
 
             if "ai_report" in field_set:
-                report = customer.ai_report or ""
+                report = ai_report or ""
                 # 确保报告文本在 CSV 中不会出问题
                 report = report.replace("\r\n", "\n").replace("\r", "\n")
                 row.append(report)
@@ -10,7 +10,9 @@ from app.database import get_db
 from app.models import FormInvite, Customer, FormTemplate, User
 from app.schemas import InviteCreate, InviteResponse, InviteFormData, InviteValidateResponse
 from app.services.auth_service import get_current_user, check_customer_access
-from app.services.activity_service import log_activity
+from app.services.activity_service import enqueue_activity
+from app.services.facet_service import sync_customer_facets
+from app.services.duplicate_service import sync_customer_name_keys
 
 router = APIRouter()
 
@@ -56,11 +58,10 @@ def create_invite(
     db.commit()
     db.refresh(invite)
 
-    log_activity(
-        db, invite_data.customer_id, "invite_created",
+    enqueue_activity(
+        invite_data.customer_id, "invite_created",
         {"expires_days": invite_data.expires_days},
-        user_id=current_user.id,
-        auto_commit=True
+        user_id=current_user.id
     )
 
     # 构建完整的邀请链接
@@ -181,10 +182,12 @@ def submit_invite_form(
         customer.kyc_data = merged_data
     else:
         customer.kyc_data = form_data.kyc_data
+    sync_customer_facets(db, customer)
     
     # 如果表单数据中有姓名，更新客户姓名
     if form_data.kyc_data.get("name"):
         customer.name = form_data.kyc_data["name"]
+        sync_customer_name_keys(db, customer)
     
     # 标记邀请链接为已使用
     invite.used_at = datetime.now()
@@ -192,10 +195,9 @@ def submit_invite_form(
     db.commit()
 
     # 记录活动日志（客户通过邀请链接提交了表单）
-    log_activity(
-        db, customer.id, "invite_used",
-        {"invite_id": invite.id},
-        auto_commit=True
+    enqueue_activity(
+        customer.id, "invite_used",
+        {"invite_id": invite.id}
     )
 
     return {
@@ -2,7 +2,7 @@
 Pydantic 数据验证模型
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from datetime import date as dt_date, datetime
 from enum import Enum
 
@@ -54,8 +54,6 @@ class CustomerResponse(BaseModel):
     name: str
     kyc_data: Optional[dict] = None
     status: str
-    ai_report: Optional[str] = None
-    ai_opportunities: Optional[List[dict]] = None
     birthday: Optional[dt_date] = None
     related_contacts: Optional[List[dict]] = None
     next_follow_up: Optional[dt_date] = None
@@ -64,18 +62,26 @@ class CustomerResponse(BaseModel):
     deleted_at: Optional[datetime] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    search_snippet: Optional[str] = None  # 全文搜索命中摘要（HTML，命中处以 <mark> 标记）
 
     class Config:
         from_attributes = True
 
 
+class CustomerDetailResponse(CustomerResponse):
+    """客户详情响应（含 AI 分析结果）"""
+    ai_report: Optional[str] = None
+    ai_opportunities: Optional[List[dict]] = None
+
+
 class CustomerListResponse(BaseModel):
-    """客户列表响应"""
-    total: int
+    """客户列表响应（游标分页时不统计 total / total_pages，返回 None）"""
+    total: Optional[int] = None
     items: List[CustomerResponse]
     page: int = 1
     page_size: int = 20
-    total_pages: int = 1
+    total_pages: Optional[int] = 1
+    next_cursor: Optional[str] = None
 
 
 # ============ 表单配置相关 Schema ============
@@ -146,6 +152,39 @@ class AnalyzeResponse(BaseModel):
     opportunities: Optional[List[AIOpportunity]] = None
 
 
+class ReportVersionItem(BaseModel):
+    """历史报告版本（列表项）"""
+    version: int
+    report_size: int
+    stored_size: int
+    created_by: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+
+class ReportVersionListResponse(BaseModel):
+    """历史报告版本列表"""
+    customer_id: int
+    items: List[ReportVersionItem]
+
+
+class ReportVersionDetail(BaseModel):
+    """历史报告版本详情"""
+    customer_id: int
+    version: int
+    report: str
+    opportunities: Optional[List[dict]] = None
+    created_by: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+
+class ReportDiffResponse(BaseModel):
+    """两个报告版本的差异（unified diff）"""
+    customer_id: int
+    from_version: int
+    to_version: int
+    diff: str
+
+
 # ============ 仪表盘相关 Schema ============
 
 class ReminderItem(BaseModel):
@@ -282,9 +321,52 @@ class ActivityLogResponse(BaseModel):
 
 
 class ActivityLogListResponse(BaseModel):
-    """活动日志列表响应"""
-    total: int
+    """活动日志列表响应（游标分页时不统计 total，返回 None）"""
+    total: Optional[int] = None
     items: List[ActivityLogResponse]
+    next_cursor: Optional[str] = None
+
+
+class ActivityFeedItem(ActivityLogResponse):
+    """跨客户活动动态条目"""
+    customer_name: Optional[str] = None
+
+
+class ActivityFeedResponse(BaseModel):
+    """跨客户活动动态响应（游标分页，不统计总数）"""
+    items: List[ActivityFeedItem]
+    next_cursor: Optional[str] = None
+
+
+class ActivityMonthCount(BaseModel):
+    """按月的活动次数"""
+    month: str = Field(..., description="YYYY-MM")
+    count: int
+
+
+class ActivitySummaryResponse(BaseModel):
+    """客户活动概览（读取日汇总表，含已归档、已压缩的日志）"""
+    customer_id: int
+    total: int = 0
+    first_day: Optional[dt_date] = None
+    last_day: Optional[dt_date] = None
+    by_action: Dict[str, int] = Field(default_factory=dict, description="操作类型 → 次数")
+    by_month: List[ActivityMonthCount] = []
+
+
+class ActivityDayCount(BaseModel):
+    """单日的活动次数"""
+    day: dt_date
+    total: int
+    by_action: Dict[str, int] = Field(default_factory=dict)
+
+
+class ActivityStatsResponse(BaseModel):
+    """活动统计（读取日汇总表）"""
+    since: dt_date
+    total: int = 0
+    by_action: Dict[str, int] = Field(default_factory=dict, description="操作类型 → 次数")
+    by_day: List[ActivityDayCount] = []
 
 
 # ============ 批量操作相关 Schema ============
@@ -305,6 +387,19 @@ class BatchRestoreRequest(BaseModel):
     customer_ids: List[int] = Field(..., description="客户ID列表")
 
 
+class PurgeReportResponse(BaseModel):
+    """回收站定时清理预览（dry-run）响应"""
+    retention_days: int = Field(..., description="保留天数，0 为不自动清理")
+    cutoff: Optional[datetime] = Field(None, description="deleted_at 早于该时间的客户到期")
+    customers: int = 0
+    archived_customers: int = 0
+    form_invites: int = 0
+    activity_logs: int = 0
+    orphan_activity_logs: int = 0
+    oldest_deleted_at: Optional[datetime] = None
+    last_run: Optional[dict] = Field(None, description="最近一次清理的完成时间与指标")
+
+
 class BatchOperationResponse(BaseModel):
     """批量操作响应"""
     success: bool
@@ -317,5 +412,17 @@ class BatchOperationResponse(BaseModel):
 class DuplicateCheckResponse(BaseModel):
     """客户去重检测响应"""
     has_duplicate: bool
-    duplicates: List[dict] = Field(default_factory=list, description="相似客户列表")
+    duplicates: List[dict] = Field(default_factory=list, description="相似客户列表（按相似度降序，含 score / reasons）")
+
+
+class DuplicateCluster(BaseModel):
+    """疑似重复客户簇"""
+    score: float = Field(..., description="簇内最高相似度")
+    customers: List[dict]
+
+
+class DuplicateClusterListResponse(BaseModel):
+    """全库疑似重复客户扫描响应"""
+    total: int
+    clusters: List[DuplicateCluster]
 
@@ -1,9 +1,39 @@
 """
 活动日志服务 - 记录客户操作
+
+两种写入方式：
+
+- log_activity：加入调用方的会话，与业务数据在同一事务中提交（事务性日志）
+- enqueue_activity：业务提交后才记的日志先进入内存队列，由后台线程
+  攒满 ACTIVITY_LOG_BATCH_SIZE 条或等待 ACTIVITY_LOG_FLUSH_SECONDS 秒后
+  以一次批量 INSERT 写入，请求本身不再多一次事务提交。应用关闭时写入队列中
+  剩余的日志；进程异常退出时最多丢失一个刷新周期内的日志。
+  在事件循环中调用（async 路由）时不阻塞：队列已满或写入线程未运行时改由线程池写入。
 """
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import String, bindparam, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import engine
 from app.models import ActivityLog
 
+logger = logging.getLogger(__name__)
+
+# created_at 以文本绑定：与 CURRENT_TIMESTAMP 的存储格式（UTC，'YYYY-MM-DD HH:MM:SS'）一致，
+# SQLite 按文本比较的排序与游标分页不受 Python datetime 的 6 位微秒影响
+_BUFFERED_INSERT = insert(ActivityLog).values(created_at=bindparam("created_at", type_=String))
+
 
 def log_activity(
     db: Session,
@@ -33,3 +63,188 @@ def log_activity(
     db.add(log)
     if auto_commit:
         db.commit()
+
+
+def log_activities(db: Session, entries: List[dict]):
+    """
+    批量记录活动日志（单条 INSERT ... VALUES (...), (...)，不提交）
+
+    Args:
+        db: 数据库会话
+        entries: 日志列表，每项包含 customer_id / user_id / action_type / action_detail
+    """
+    if entries:
+        db.execute(insert(ActivityLog).values(entries))
+
+
+# ============ 缓冲写入 ============
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    """活动日志缓冲写入器（内存队列 + 后台写入线程）"""
+
+    def __init__(self, engine: Engine, batch_size: int, flush_seconds: float, queue_size: int):
+        self._engine = engine
+        self._batch_size = max(batch_size, 1)
+        self._flush_seconds = flush_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        # 写入统计（overflow 为事件循环中入队时队列已满、改由线程池写入的条数）。
+        # 写入线程、线程池、事件循环与 atexit 都会更新，用单独的锁（_lock 在 stop 等待线程退出时持有）
+        self._stats = {"written": 0, "batches": 0, "failed": 0, "max_batch": 0, "overflow": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """启动后台写入线程（应用启动时调用，重复调用无副作用）"""
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                # 未经 lifespan 正常关闭（如脚本直接退出）时兜底写入
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """写入队列中剩余的日志并停止后台线程（应用关闭时调用）"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.error("活动日志写入线程未在 %.0f 秒内退出，剩余约 %d 条未写入", timeout, self._queue.qsize())
+                return
+            # 停止过程中仍在入队的日志
+            remaining = []
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not _STOP:
+                    remaining.append(entry)
+            if remaining:
+                self._write(remaining)
+
+    def put(self, entry: dict) -> None:
+        """
+        入队一条日志；写入线程未运行时直接同步写入
+
+        在事件循环线程中调用时不阻塞：队列已满（计入 overflow）或写入线程未运行时，
+        将这条日志交给线程池写入。未给出 created_at 时记为入队时间（见 enqueue_activity）。
+        """
+        entry.setdefault("created_at", datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None:
+            if not self.running:
+                self._write([entry])
+                return
+            # 队列写满时阻塞等待（写入跟不上时对请求施加背压，不丢日志）
+            self._queue.put(entry)
+            return
+
+        if self.running:
+            try:
+                self._queue.put_nowait(entry)
+                return
+            except queue.Full:
+                with self._stats_lock:
+                    self._stats["overflow"] += 1
+        loop.run_in_executor(None, self._write, [entry])
+
+    def stats(self) -> dict:
+        """写入统计：已写入条数、批次数、失败条数、最大批次、溢出条数与当前排队数"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {**stats, "pending": self._queue.qsize(), "running": self.running}
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self._flush_seconds
+            while len(batch) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._write(batch)
+
+    def _write(self, batch: List[dict]) -> None:
+        written = failed = 0
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(_BUFFERED_INSERT, batch)
+        except SQLAlchemyError:
+            # 整批失败时逐条重试，个别无效日志（如客户已被永久删除触发外键约束）不影响同批其他日志
+            for entry in batch:
+                try:
+                    with self._engine.begin() as conn:
+                        conn.execute(_BUFFERED_INSERT, [entry])
+                except SQLAlchemyError as e:
+                    failed += 1
+                    logger.warning("活动日志写入失败（%s）: %s", entry.get("action_type"), e.orig or e)
+                else:
+                    written += 1
+        else:
+            written = len(batch)
+        with self._stats_lock:
+            self._stats["written"] += written
+            self._stats["failed"] += failed
+            self._stats["batches"] += 1
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+
+
+activity_log_writer = ActivityLogWriter(
+    engine,
+    batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+    flush_seconds=settings.ACTIVITY_LOG_FLUSH_SECONDS,
+    queue_size=settings.ACTIVITY_LOG_QUEUE_SIZE,
+)
+
+
+def enqueue_activity(
+    customer_id: int | None,
+    action_type: str,
+    action_detail: dict | None = None,
+    user_id: int | None = None
+):
+    """
+    缓冲记录一条活动日志（不参与调用方事务，稍后由后台线程批量写入）
+
+    适用于业务数据已提交后才记录的日志；需要与业务数据同生共死的日志请用 log_activity。
+    created_at 取入队时间（而非批量写入时间），格式与 created_at 的数据库默认值
+    CURRENT_TIMESTAMP 一致：UTC、精确到秒，因此时间线不会把它排在之后发生的事务性日志后面。
+    id 仍在批量写入时分配：与事务性日志落在同一秒内时，同一秒内按写入顺序（id）排列。
+    """
+    activity_log_writer.put({
+        "customer_id": customer_id,
+        "user_id": user_id,
+        "action_type": action_type,
+        "action_detail": action_detail,
+    })
@@ -0,0 +1,328 @@
+"""
+冷数据归档服务 - 附加的 SQLite 归档库（ATTACH ... AS archive）
+
+回收站中删除超过 ARCHIVE_CUSTOMER_DAYS 天的客户（连同 AI 报告、历史版本、邀请记录）
+与超过 ARCHIVE_ACTIVITY_DAYS 天的活动日志，由归档任务（scripts/archive_cold_data.py）
+分批移入归档库，热库的表与索引只保留近期数据。KYC 展开行、姓名分块键、全文索引
+属于派生数据，归档时直接删除，移回热库时重新生成。
+
+归档库在每个连接建立时附加，同一连接内即可跨库查询：回收站与活动日志接口
+以 UNION ALL 合并两库的结果；恢复 / 永久删除归档客户时先将其移回热库回收站，
+再走原有流程。
+
+按 id 移动的表在热库以 AUTOINCREMENT 分配 id（迁移 v15），已删除或已归档的 id
+不会再分配给新行，两库之间不会撞号；万一撞号，写入归档库时主键冲突报错，整批回滚，
+不会覆盖已归档的行。WAL 模式下跨库事务在各库内原子、跨库之间不保证原子：
+归档时先写归档库再删热库，中断后若同一行同时留在两库，重新运行会因主键冲突中止，
+需核对后删除其中一份。
+仅 SQLite 支持，其他数据库（ARCHIVE_PATH 为 None）时各入口退化为只查热库。
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, Index, MetaData, Table, func, select, union_all
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.database import ARCHIVE_PATH, ARCHIVE_SCHEMA, Base
+from app.models import Customer, CustomerKycFacet, CustomerNameKey, User
+from app.services.duplicate_service import sync_customer_name_keys
+from app.services.facet_service import sync_customer_facets
+from app.services.pagination_service import keyset_after
+
+# 是否启用归档库
+ARCHIVE_ENABLED = ARCHIVE_PATH is not None
+
+_archive_metadata = MetaData()
+
+
+def _archive_table(name: str, *indexes) -> Table:
+    """按热库表结构定义归档表（不含生成列、外键与热库索引）"""
+    source = Base.metadata.tables[name]
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+        for column in source.columns if column.computed is None
+    ]
+    return Table(name, _archive_metadata, *columns, *indexes, schema=ARCHIVE_SCHEMA)
+
+
+archived_customers = _archive_table(
+    "customers",
+    Index("ix_archive_customers_deleted", "deleted_at", "id"),
+)
+archived_reports = _archive_table("customer_reports")
+archived_report_versions = _archive_table(
+    "customer_report_versions",
+    Index("ix_archive_report_versions_customer", "customer_id"),
+)
+archived_invites = _archive_table(
+    "form_invites",
+    Index("ix_archive_form_invites_customer", "customer_id"),
+)
+archived_activity_logs = _archive_table(
+    "activity_logs",
+    Index("ix_archive_activity_logs_customer_created", "customer_id", "created_at", "id"),
+)
+
+# 随客户一起归档的关联表（按 customer_id 关联）
+_CUSTOMER_CHILDREN = (archived_reports, archived_report_versions, archived_invites)
+
+# 热库以 AUTOINCREMENT 分配 id 的表（customer_reports 以 customer_id 为主键）
+ARCHIVED_ID_TABLES = (archived_customers, archived_report_versions, archived_invites, archived_activity_logs)
+
+# 回收站列表的列（两库共有）
+_RECYCLE_BIN_COLUMNS = [column.name for column in archived_customers.columns]
+
+
+def _hot(table: Table) -> Table:
+    return Base.metadata.tables[table.name]
+
+
+def create_archive_tables(conn: Connection) -> None:
+    """在归档库中创建归档表（已存在则跳过）"""
+    if ARCHIVE_ENABLED and conn.dialect.name == "sqlite":
+        _archive_metadata.create_all(conn, checkfirst=True)
+
+
+def archived_max_ids(conn: Connection) -> Dict[str, int]:
+    """归档库中各表已用到的最大 id（表名 → id，未启用归档时为空）"""
+    if not (ARCHIVE_ENABLED and conn.dialect.name == "sqlite"):
+        return {}
+    create_archive_tables(conn)
+    return {
+        table.name: conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+        for table in ARCHIVED_ID_TABLES
+    }
+
+
+# ============ 归档任务 ============
+
+def _move(conn: Connection, archived: Table, key: str, ids: List[int]) -> None:
+    """将热库表中 key IN ids 的行移入归档表"""
+    hot = _hot(archived)
+    names = [column.name for column in archived.columns]
+    conn.execute(
+        archived.insert().from_select(
+            names, select(*[hot.c[name] for name in names]).where(hot.c[key].in_(ids))
+        )
+    )
+    conn.execute(hot.delete().where(hot.c[key].in_(ids)))
+
+
+def _customer_candidates(cutoff: datetime):
+    return select(Customer.id).where(Customer.is_deleted == 1, Customer.deleted_at < cutoff)
+
+
+def _activity_candidates(cutoff: datetime):
+    hot = _hot(archived_activity_logs)
+    return select(hot.c.id).where(hot.c.created_at < cutoff)
+
+
+def count_archivable(conn: Connection, customer_cutoff: datetime, activity_cutoff: datetime) -> Dict[str, int]:
+    """统计待归档的客户与活动日志数量（dry-run 用）"""
+    return {
+        "customers": conn.execute(
+            select(func.count()).select_from(_customer_candidates(customer_cutoff).subquery())
+        ).scalar(),
+        "activity_logs": conn.execute(
+            select(func.count()).select_from(_activity_candidates(activity_cutoff).subquery())
+        ).scalar(),
+    }
+
+
+def archive_customers(engine: Engine, cutoff: datetime, batch_size: int = 200) -> int:
+    """
+    将回收站中 deleted_at 早于 cutoff 的客户及其关联数据移入归档库
+
+    每批一个短事务，避免长时间持有写锁。
+
+    Returns:
+        归档的客户数
+    """
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(_customer_candidates(cutoff).limit(batch_size)).scalars().all()
+            if not ids:
+                return archived
+            for child in _CUSTOMER_CHILDREN:
+                _move(conn, child, "customer_id", ids)
+            conn.execute(CustomerKycFacet.__table__.delete().where(CustomerKycFacet.customer_id.in_(ids)))
+            conn.execute(CustomerNameKey.__table__.delete().where(CustomerNameKey.customer_id.in_(ids)))
+            _move(conn, archived_customers, "id", ids)
+        archived += len(ids)
+
+
+def archive_activity_logs(engine: Engine, cutoff: datetime, batch_size: int = 1000) -> int:
+    """
+    将 created_at 早于 cutoff 的活动日志移入归档库（每批一个短事务）
+
+    Returns:
+        归档的日志条数
+    """
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(_activity_candidates(cutoff).limit(batch_size)).scalars().all()
+            if not ids:
+                return archived
+            _move(conn, archived_activity_logs, "id", ids)
+        archived += len(ids)
+
+
+def delete_archived_customers(conn: Connection, customer_ids: List[int]) -> Dict[str, int]:
+    """
+    永久删除归档库中的客户及其归档的关联数据与活动日志（在调用方的事务中执行）
+
+    Returns:
+        各表删除的行数（archived_customers 为客户数）
+    """
+    counts = {}
+    for table in (*_CUSTOMER_CHILDREN, archived_activity_logs):
+        counts[table.name] = conn.execute(table.delete().where(table.c.customer_id.in_(customer_ids))).rowcount
+    counts["archived_customers"] = conn.execute(
+        archived_customers.delete().where(archived_customers.c.id.in_(customer_ids))
+    ).rowcount
+    return counts
+
+
+def count_archived_customers(db: Session, owner_user_id: int) -> int:
+    """归档库中归属 owner_user_id 的客户数"""
+    if not ARCHIVE_ENABLED:
+        return 0
+    table = archived_customers
+    return db.execute(
+        select(func.count()).select_from(table).where(table.c.owner_user_id == owner_user_id)
+    ).scalar_one()
+
+
+def reassign_archived_customers(db: Session, from_user_id: int, to_user_id: int) -> int:
+    """将归档库中归属 from_user_id 的客户转给 to_user_id（在调用方的事务中执行），返回转移的客户数"""
+    if not ARCHIVE_ENABLED:
+        return 0
+    table = archived_customers
+    return db.execute(
+        table.update().where(table.c.owner_user_id == from_user_id).values(owner_user_id=to_user_id)
+    ).rowcount
+
+
+# ============ 移回热库 ============
+
+def _access_condition(table: Table, current_user: User):
+    """普通用户可访问客户的条件（与 customer_access_filter 一致，适用于热库与归档表）"""
+    return func.coalesce(table.c.owner_user_id, current_user.id) == current_user.id
+
+
+def get_archived_customer(db: Session, customer_id: int):
+    """按 id 查询归档客户（id / name / owner_user_id），不存在或未启用归档时返回 None"""
+    if not ARCHIVE_ENABLED:
+        return None
+    table = archived_customers
+    return db.execute(
+        select(table.c.id, table.c.name, table.c.owner_user_id).where(table.c.id == customer_id)
+    ).first()
+
+
+def unarchive_customers(db: Session, current_user: User, customer_ids: List[int]) -> List[int]:
+    """
+    将归档客户（连同报告、历史版本、邀请记录）移回热库回收站（不提交）
+
+    移回后仍为已删除状态，由调用方继续执行恢复或永久删除；
+    KYC 展开行与姓名分块键在此重新生成，全文索引由触发器维护。
+
+    Returns:
+        实际移回的客户 ID（非管理员只处理可访问的客户）
+    """
+    if not ARCHIVE_ENABLED or not customer_ids:
+        return []
+    table = archived_customers
+    query = select(table.c.id).where(table.c.id.in_(customer_ids))
+    if not current_user.is_admin:
+        query = query.where(_access_condition(table, current_user))
+    ids = db.execute(query).scalars().all()
+    if not ids:
+        return []
+
+    conn = db.connection()
+    for archived in (archived_customers, *_CUSTOMER_CHILDREN):
+        hot = _hot(archived)
+        key = "id" if archived is archived_customers else "customer_id"
+        names = [column.name for column in archived.columns]
+        conn.execute(hot.insert().from_select(names, select(archived).where(archived.c[key].in_(ids))))
+        conn.execute(archived.delete().where(archived.c[key].in_(ids)))
+
+    for customer in db.query(Customer).filter(Customer.id.in_(ids)):
+        sync_customer_facets(db, customer)
+        sync_customer_name_keys(db, customer)
+    return ids
+
+
+# ============ 跨库查询 ============
+
+def recycle_bin_query(current_user: User, cursor: Optional[str] = None):
+    """
+    回收站查询：热库已删除客户 UNION ALL 归档客户，按 (deleted_at, id) 降序
+
+    Raises:
+        ValueError: 游标无效
+    """
+    hot = Customer.__table__
+    sources = [(hot, [hot.c.is_deleted == 1])]
+    if ARCHIVE_ENABLED:
+        sources.append((archived_customers, []))
+
+    arms = []
+    for table, conditions in sources:
+        if not current_user.is_admin:
+            conditions.append(_access_condition(table, current_user))
+        if cursor:
+            conditions.append(keyset_after(table.c.deleted_at, table.c.id, cursor))
+        arms.append(select(*[table.c[name] for name in _RECYCLE_BIN_COLUMNS]).where(*conditions))
+
+    if len(arms) == 1:
+        return arms[0].order_by(hot.c.deleted_at.desc(), hot.c.id.desc())
+    compound = union_all(*arms)
+    return compound.order_by(compound.selected_columns.deleted_at.desc(), compound.selected_columns.id.desc())
+
+
+def archived_customer_total_query(current_user: User):
+    """归档客户数量的查询（未启用归档时为 None）"""
+    if not ARCHIVE_ENABLED:
+        return None
+    query = select(func.count()).select_from(archived_customers)
+    if not current_user.is_admin:
+        query = query.where(_access_condition(archived_customers, current_user))
+    return query
+
+
+def activity_log_query(customer_id: int, cursor: Optional[str] = None):
+    """
+    客户活动日志查询：热库 UNION ALL 归档库，按 (created_at, id) 降序
+
+    Raises:
+        ValueError: 游标无效
+    """
+    arms = []
+    tables = [_hot(archived_activity_logs)] + ([archived_activity_logs] if ARCHIVE_ENABLED else [])
+    for table in tables:
+        conditions = [table.c.customer_id == customer_id]
+        if cursor:
+            conditions.append(keyset_after(table.c.created_at, table.c.id, cursor))
+        arms.append(select(*[table.c[column.name] for column in archived_activity_logs.columns]).where(*conditions))
+
+    if len(arms) == 1:
+        return arms[0].order_by(tables[0].c.created_at.desc(), tables[0].c.id.desc())
+    compound = union_all(*arms)
+    return compound.order_by(compound.selected_columns.created_at.desc(), compound.selected_columns.id.desc())
+
+
+def activity_log_total_query(customer_id: int):
+    """客户活动日志总数（两库合计）的查询"""
+    counts = [
+        select(func.count()).select_from(table).where(table.c.customer_id == customer_id).scalar_subquery()
+        for table in [_hot(archived_activity_logs)] + ([archived_activity_logs] if ARCHIVE_ENABLED else [])
+    ]
+    total = counts[0]
+    for count in counts[1:]:
+        total = total + count
+    return select(total)
@@ -2,14 +2,19 @@
 认证服务模块
 """
 from fastapi import Request, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, inspect
+from collections import OrderedDict
 from typing import Optional
 import json
 import hashlib
+import threading
 import time
 
-from app.database import get_db, SessionLocal
-from app.models import User, UserRole
+from app.config import settings
+from app.database import get_db, get_async_db
+from app.models import User, UserRole, Customer
 
 
 # Session 配置
@@ -62,11 +67,117 @@ def verify_session_token(token: str) -> Optional[int]:
         return None
 
 
-def get_current_user_from_request(request: Request) -> Optional[User]:
+# ============ 登录用户缓存 ============
+
+class UserCache:
+    """
+    已登录用户的进程内缓存（LRU + TTL），按用户 ID 保存 User 各列的快照
+
+    每个 API / 页面请求都要按会话令牌查询一次当前用户，命中缓存时省去这次查询。
+    修改用户信息、密码、删除用户的接口在提交后调用 invalidate；
+    多进程部署时其他进程的缓存最长在 ttl 秒后过期。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id: int) -> Optional[dict]:
+        """取未过期的快照，未命中返回 None"""
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[user_id]
+                self._stats["misses"] += 1
+                return None
+            self._items.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return item[1]
+
+    def put(self, user: User) -> None:
+        """缓存用户快照（只应缓存已启用的用户）"""
+        if not self.enabled:
+            return
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        with self._lock:
+            self._items[user.id] = (time.monotonic() + self.ttl, snapshot)
+            self._items.move_to_end(user.id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, user_id: int) -> None:
+        """移除用户的快照（修改用户后、提交之后调用）"""
+        with self._lock:
+            self._items.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        """命中 / 未命中次数、命中率与当前缓存数"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0,
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+            }
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+
+def _from_snapshot(snapshot: dict) -> User:
+    """由快照还原为游离（detached）的 User，merge(load=False) 后无需查询即成为会话中的持久对象"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+def _active_user_query(user_id: int):
+    return select(User).where(User.id == user_id, User.is_active == 1)
+
+
+def _load_active_user(db: Session, user_id: int) -> Optional[User]:
+    """按 ID 取已启用的用户（优先读缓存），返回的对象属于 db，可照常修改并提交"""
+    snapshot = user_cache.get(user_id) if user_cache.enabled else None
+    if snapshot is not None:
+        return db.merge(_from_snapshot(snapshot), load=False)
+    user = db.execute(_active_user_query(user_id)).scalar_one_or_none()
+    if user is not None:
+        user_cache.put(user)
+    return user
+
+
+async def _load_active_user_async(db: AsyncSession, user_id: int) -> Optional[User]:
+    """按 ID 取已启用的用户（优先读缓存，异步版本）"""
+    snapshot = user_cache.get(user_id) if user_cache.enabled else None
+    if snapshot is not None:
+        return await db.merge(_from_snapshot(snapshot), load=False)
+    user = (await db.execute(_active_user_query(user_id))).scalar_one_or_none()
+    if user is not None:
+        user_cache.put(user)
+    return user
+
+
+def get_current_user_from_request(request: Request, db: Session) -> Optional[User]:
     """
     从请求中获取当前登录用户
-    
-    用于页面路由（不抛出异常）
+
+    用于同步路由，复用路由自身的会话（不抛出异常）
     """
     session_token = request.cookies.get(SESSION_COOKIE_NAME)
     if not session_token:
@@ -76,12 +187,24 @@ def get_current_user_from_request(request: Request) -> Optional[User]:
     if not user_id:
         return None
     
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.id == user_id, User.is_active == 1).first()
-        return user
-    finally:
-        db.close()
+    return _load_active_user(db, user_id)
+
+
+async def get_current_user_from_request_async(request: Request, db: AsyncSession) -> Optional[User]:
+    """
+    从请求中获取当前登录用户（异步版本）
+
+    用于 async 页面路由，复用路由自身的异步会话（不抛出异常）
+    """
+    session_token = request.cookies.get(SESSION_COOKIE_NAME)
+    if not session_token:
+        return None
+
+    user_id = verify_session_token(session_token)
+    if not user_id:
+        return None
+
+    return await _load_active_user_async(db, user_id)
 
 
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
@@ -98,13 +221,37 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     if not user_id:
         raise HTTPException(status_code=401, detail="会话已过期，请重新登录")
     
-    user = db.query(User).filter(User.id == user_id, User.is_active == 1).first()
+    user = _load_active_user(db, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="用户不存在或已被禁用")
     
     return user
 
 
+async def get_current_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    获取当前登录用户（异步 API 依赖项）
+
+    与 get_async_db 共享同一请求内的异步会话，未登录时抛出 401 异常
+    """
+    session_token = request.cookies.get(SESSION_COOKIE_NAME)
+    if not session_token:
+        raise HTTPException(status_code=401, detail="请先登录")
+
+    user_id = verify_session_token(session_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="会话已过期，请重新登录")
+
+    user = await _load_active_user_async(db, user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="用户不存在或已被禁用")
+
+    return user
+
+
 def get_current_user_optional(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
     """
     获取当前登录用户（可选，不抛出异常）
@@ -119,8 +266,7 @@ def get_current_user_optional(request: Request, db: Session = Depends(get_db)) -
     if not user_id:
         return None
     
-    user = db.query(User).filter(User.id == user_id, User.is_active == 1).first()
-    return user
+    return _load_active_user(db, user_id)
 
 
 def require_admin(current_user: User = Depends(get_current_user)) -> User:
@@ -149,3 +295,14 @@ def check_customer_access(customer_owner_id: Optional[int], current_user: User)
         return True
     
     return customer_owner_id == current_user.id
+
+
+def customer_access_filter(current_user: User):
+    """
+    普通用户可访问客户的 SQL 条件（与 check_customer_access 规则一致）
+
+    等价于 owner_user_id = 当前用户 OR owner_user_id IS NULL。
+    写成 coalesce 形式，使优化器沿 is_deleted 部分索引按 created_at 有序扫描，
+    而不是对 owner_user_id 做 OR 合并后再临时排序。
+    """
+    return func.coalesce(Customer.owner_user_id, current_user.id) == current_user.id
@@ -0,0 +1,164 @@
+"""
+客户计数服务 - 维护 customer_counts 并提供总数查询
+
+customers 上的触发器在每次插入、删除以及修改 owner_user_id / status / is_deleted 时
+增减对应计数行，与业务写入处于同一事务，批量 UPDATE、邀请填写等所有写入路径
+都会自动维护。未带额外筛选（仅按状态、归属顾问）的总数直接汇总计数表，
+其余筛选仍然执行真实的 COUNT。
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+
+from app.models import CustomerCount, User
+
+# 计数维度（NULL 归一化，计数表主键不允许 NULL）
+_OWNER_KEY = "COALESCE({row}.owner_user_id, 0)"
+_STATUS = "COALESCE({row}.status, '')"
+_IS_DELETED = "COALESCE({row}.is_deleted, 0)"
+
+
+def _key(row: str) -> str:
+    return ", ".join(expr.format(row=row) for expr in (_OWNER_KEY, _STATUS, _IS_DELETED))
+
+
+def _match(row: str) -> str:
+    return (
+        f"owner_key = {_OWNER_KEY.format(row=row)} AND status = {_STATUS.format(row=row)} "
+        f"AND is_deleted = {_IS_DELETED.format(row=row)}"
+    )
+
+
+_INCREMENT = (
+    f"INSERT INTO customer_counts (owner_key, status, is_deleted, count) VALUES ({_key('NEW')}, 1) "
+    f"ON CONFLICT (owner_key, status, is_deleted) DO UPDATE SET count = customer_counts.count + 1"
+)
+_DECREMENT = f"UPDATE customer_counts SET count = count - 1 WHERE {_match('OLD')}"
+_KEY_CHANGED = (
+    f"({_OWNER_KEY.format(row='OLD')} <> {_OWNER_KEY.format(row='NEW')} "
+    f"OR {_STATUS.format(row='OLD')} <> {_STATUS.format(row='NEW')} "
+    f"OR {_IS_DELETED.format(row='OLD')} <> {_IS_DELETED.format(row='NEW')})"
+)
+
+_SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS trg_customers_count_insert",
+    "DROP TRIGGER IF EXISTS trg_customers_count_delete",
+    "DROP TRIGGER IF EXISTS trg_customers_count_update",
+    f"""CREATE TRIGGER trg_customers_count_insert AFTER INSERT ON customers
+    BEGIN {_INCREMENT}; END""",
+    f"""CREATE TRIGGER trg_customers_count_delete AFTER DELETE ON customers
+    BEGIN {_DECREMENT}; END""",
+    f"""CREATE TRIGGER trg_customers_count_update AFTER UPDATE OF owner_user_id, status, is_deleted ON customers
+    WHEN {_KEY_CHANGED}
+    BEGIN {_DECREMENT}; {_INCREMENT}; END""",
+]
+
+_POSTGRESQL_TRIGGERS = [
+    f"""CREATE OR REPLACE FUNCTION customer_counts_maintain() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NOT {_KEY_CHANGED} THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {_DECREMENT};
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            {_INCREMENT};
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS trg_customers_count ON customers",
+    """CREATE TRIGGER trg_customers_count
+    AFTER INSERT OR DELETE OR UPDATE OF owner_user_id, status, is_deleted ON customers
+    FOR EACH ROW EXECUTE FUNCTION customer_counts_maintain()""",
+]
+
+
+# 按计数维度对 customers 做真实统计
+_ACTUAL_COUNTS = f"SELECT {_key('customers')}, COUNT(*) FROM customers GROUP BY {_key('customers')}"
+
+
+def install_count_triggers(conn: Connection) -> None:
+    """创建（或重建）customers 上维护计数表的触发器"""
+    statements = _POSTGRESQL_TRIGGERS if conn.dialect.name == "postgresql" else _SQLITE_TRIGGERS
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def rebuild_customer_counts(conn: Connection) -> None:
+    """按 customers 当前数据重建计数表（在调用方的事务中执行）"""
+    conn.execute(CustomerCount.__table__.delete())
+    conn.execute(text(f"INSERT INTO customer_counts (owner_key, status, is_deleted, count) {_ACTUAL_COUNTS}"))
+
+
+def find_count_drift(conn: Connection) -> List[dict]:
+    """
+    对比计数表与真实统计
+
+    Returns:
+        不一致的计数维度列表（cached 为计数表的值，actual 为真实数量）
+    """
+    actual = {tuple(row[:3]): row[3] for row in conn.execute(text(_ACTUAL_COUNTS))}
+    table = CustomerCount.__table__
+    cached = {
+        (row.owner_key, row.status, row.is_deleted): row.count
+        for row in conn.execute(select(table))
+    }
+    drift = []
+    for key in sorted(set(actual) | set(cached)):
+        if actual.get(key, 0) != cached.get(key, 0):
+            owner_key, status, is_deleted = key
+            drift.append({
+                "owner_key": owner_key, "status": status, "is_deleted": is_deleted,
+                "cached": cached.get(key, 0), "actual": actual.get(key, 0),
+            })
+    return drift
+
+
+# ============ 总数查询（同步 / 异步会话均可执行） ============
+
+def _count_conditions(current_user: User, is_deleted: int, owner_id: Optional[int]) -> list:
+    conditions = [CustomerCount.is_deleted == is_deleted]
+    # 与 customer_access_filter 一致：自己的客户 + 未分配的客户
+    if not current_user.is_admin:
+        conditions.append(CustomerCount.owner_key.in_([current_user.id, 0]))
+    if owner_id is not None:
+        conditions.append(CustomerCount.owner_key == owner_id)
+    return conditions
+
+
+def customer_total_query(
+    current_user: User,
+    is_deleted: int = 0,
+    statuses: Optional[List[str]] = None,
+    owner_id: Optional[int] = None
+):
+    """
+    从计数表汇总客户总数的查询
+
+    Args:
+        current_user: 当前用户（非管理员只统计可访问的客户）
+        is_deleted: 0 为正常客户，1 为回收站
+        statuses: 状态筛选
+        owner_id: 归属顾问筛选（0 为未分配）
+    """
+    conditions = _count_conditions(current_user, is_deleted, owner_id)
+    if statuses:
+        conditions.append(CustomerCount.status.in_(statuses))
+    return select(func.coalesce(func.sum(CustomerCount.count), 0)).where(*conditions)
+
+
+def status_counts_query(current_user: User):
+    """从计数表汇总各状态客户数的查询（不含已删除）"""
+    return (
+        select(CustomerCount.status, func.sum(CustomerCount.count))
+        .where(*_count_conditions(current_user, 0, None))
+        .group_by(CustomerCount.status)
+    )
+
+
+def status_counts(rows) -> Dict[str, int]:
+    """将 status_counts_query 的结果转为 {状态: 数量}"""
+    return {status: int(count) for status, count in rows if count}
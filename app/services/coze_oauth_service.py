@@ -13,9 +13,11 @@ import secrets
 from urllib.parse import urlencode
 
 import httpx
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
-from app.database import SessionLocal
+from app.database import SessionLocal, AsyncSessionLocal
 from app.models import CozeOAuthToken
 
 logger = logging.getLogger(__name__)
@@ -263,10 +265,11 @@ async def get_valid_token() -> str:
     Raises:
         Exception: 无可用 Token 或刷新失败时抛出
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         # 1. 从数据库获取最新的 Token 记录
-        token_record = db.query(CozeOAuthToken).order_by(CozeOAuthToken.id.desc()).first()
+        token_record = (await db.execute(
+            select(CozeOAuthToken).order_by(CozeOAuthToken.id.desc()).limit(1)
+        )).scalar_one_or_none()
         
         if not token_record:
             raise Exception(
@@ -302,13 +305,11 @@ async def get_valid_token() -> str:
                 )
         
         # 4. 刷新成功，保存新 Token（Token Rotation）
-        save_token_to_db(
+        await run_in_threadpool(
+            save_token_to_db,
             access_token=new_tokens["access_token"],
             refresh_token=new_tokens["refresh_token"],
             expires_in=new_tokens["expires_in"],
         )
         
         return new_tokens["access_token"]
-    
-    finally:
-        db.close()
@@ -0,0 +1,271 @@
+"""
+疑似重复客户检测服务 - 姓名归一化与分块索引 customer_name_keys
+
+按姓名精确比较会漏掉繁简体（張小明 / 张小明）、拼音录入（zhang xiaoming）、
+多余空格或间隔号等写法不同的同一客户。每个客户按姓名生成若干分块键：
+
+- n:<归一化姓名>    NFKC 规范化、小写，去除空白与标点
+- p:<完整拼音>      繁简体与拼音录入的同一姓名得到相同的键
+- b:<相邻两个音节>  召回一字之差的近似姓名
+
+只在共享分块键的客户之间打分：单个姓名的检测是一次索引查询；
+全库聚类时 n: / p: 分块直接合并，b: 分块内两两比较，超过 MAX_BLOCK_SIZE 的
+b: 分块（常见姓 + 常见字）跳过，比较次数不会随客户数平方增长。
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from itertools import combinations, groupby
+from typing import Dict, List, Optional, Tuple
+
+from pypinyin import lazy_pinyin
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import Customer, CustomerNameKey
+
+# 判定为疑似重复的最低相似度
+DUPLICATE_THRESHOLD = 0.7
+
+# 单个姓名检测时最多打分的候选数（按共享分块键数量优先）
+MAX_CANDIDATES = 200
+
+# 全库聚类时参与两两比较的 b: 分块大小上限
+MAX_BLOCK_SIZE = 50
+
+# 姓名相近（拼音编辑相似度）的权重，其余由 KYC 城市 / 年龄段补足
+_NAME_WEIGHT = 0.8
+_CITY_BONUS = 0.1
+_AGE_GROUP_BONUS = 0.05
+
+_KEY_LENGTH = 100
+_SYLLABLE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """归一化姓名：NFKC 规范化（全角转半角）、小写，只保留文字与数字"""
+    value = unicodedata.normalize("NFKC", name or "").lower()
+    return "".join(ch for ch in value if ch.isalnum())
+
+
+def name_syllables(name: Optional[str]) -> List[str]:
+    """姓名的拼音音节（汉字转拼音，繁简体结果相同；拉丁字母按空白与标点拆分）"""
+    value = unicodedata.normalize("NFKC", name or "").lower()
+    syllables = []
+    for token in lazy_pinyin(value):
+        syllables.extend(_SYLLABLE.findall(token))
+    return syllables
+
+
+def name_keys(name: Optional[str]) -> List[str]:
+    """姓名的全部分块键"""
+    normalized = normalize_name(name)
+    syllables = name_syllables(name)
+    keys = set()
+    if normalized:
+        keys.add(f"n:{normalized}")
+    if syllables:
+        keys.add(f"p:{''.join(syllables)}")
+    for first, second in zip(syllables, syllables[1:]):
+        keys.add(f"b:{first} {second}")
+    return sorted(key[:_KEY_LENGTH] for key in keys)
+
+
+def sync_customer_name_keys(db: Session, customer: Customer):
+    """
+    按客户当前姓名重建其分块键（不提交，由调用方统一 commit）
+
+    Args:
+        db: 数据库会话
+        customer: 客户对象（需已有 id，新建客户请先 flush）
+    """
+    db.execute(delete(CustomerNameKey).where(CustomerNameKey.customer_id == customer.id))
+    rows = [{"customer_id": customer.id, "key": key} for key in name_keys(customer.name)]
+    if rows:
+        db.execute(insert(CustomerNameKey), rows)
+
+
+def rebuild_name_keys(conn: Connection, batch_size: int = 1000) -> None:
+    """按 customers 当前数据重建全部分块键（在调用方的事务中执行）"""
+    conn.execute(CustomerNameKey.__table__.delete())
+    result = conn.execute(
+        text("SELECT id, name FROM customers"), execution_options={"yield_per": batch_size}
+    )
+    for partition in result.partitions():
+        rows = [
+            {"customer_id": customer_id, "key": key}
+            for customer_id, name in partition
+            for key in name_keys(name)
+        ]
+        if rows:
+            conn.execute(CustomerNameKey.__table__.insert(), rows)
+
+
+# ============ 相似度 ============
+
+def _profile(customer_id, name, status, city, age_group) -> dict:
+    syllables = name_syllables(name)
+    return {
+        "id": customer_id,
+        "name": name,
+        "status": status,
+        "city": city,
+        "age_group": age_group,
+        "normalized": normalize_name(name),
+        "pinyin": " ".join(syllables),
+    }
+
+
+def score_pair(a: dict, b: dict) -> Tuple[float, List[str]]:
+    """
+    两个客户的相似度
+
+    姓名归一化后相同为 1.0，拼音相同（繁简体、拼音录入）为 0.9，
+    否则按拼音的编辑相似度计分；KYC 城市、年龄段一致时额外加分。
+
+    Returns:
+        (0~1 的相似度, 判定原因)
+    """
+    if a["normalized"] and a["normalized"] == b["normalized"]:
+        return 1.0, ["姓名相同"]
+    if a["pinyin"] and a["pinyin"].replace(" ", "") == b["pinyin"].replace(" ", ""):
+        score, reasons = 0.9, ["姓名拼音相同"]
+    else:
+        ratio = SequenceMatcher(None, a["pinyin"], b["pinyin"]).ratio()
+        score, reasons = ratio * _NAME_WEIGHT, ["姓名相近"]
+    if a["city"] and a["city"] == b["city"]:
+        score += _CITY_BONUS
+        reasons.append("城市相同")
+    if a["age_group"] and a["age_group"] == b["age_group"]:
+        score += _AGE_GROUP_BONUS
+        reasons.append("年龄段相同")
+    return round(min(score, 1.0), 2), reasons
+
+
+def find_candidates(
+    db: Session,
+    name: str,
+    exclude_id: Optional[int] = None,
+    city: Optional[str] = None,
+    age_group: Optional[str] = None,
+    threshold: float = DUPLICATE_THRESHOLD,
+    limit: int = 10
+) -> List[dict]:
+    """
+    查找与给定姓名疑似重复的客户（不含已删除），按相似度降序
+
+    Args:
+        name: 待检测的姓名
+        exclude_id: 排除的客户ID（编辑时用）
+        city / age_group: 待检测客户的 KYC 城市、年龄段（可选，一致时加分）
+    """
+    keys = name_keys(name)
+    if not keys:
+        return []
+
+    shared = func.count(CustomerNameKey.key)
+    query = (
+        select(Customer.id, Customer.name, Customer.status, Customer.kyc_city, Customer.kyc_age_group)
+        .join(CustomerNameKey, CustomerNameKey.customer_id == Customer.id)
+        .where(CustomerNameKey.key.in_(keys), Customer.is_deleted == 0)
+        .group_by(Customer.id, Customer.name, Customer.status, Customer.kyc_city, Customer.kyc_age_group)
+        .order_by(shared.desc(), Customer.id)
+        .limit(MAX_CANDIDATES)
+    )
+    if exclude_id:
+        query = query.where(Customer.id != exclude_id)
+
+    target = _profile(None, name, None, city, age_group)
+    duplicates = []
+    for row in db.execute(query):
+        candidate = _profile(*row)
+        score, reasons = score_pair(target, candidate)
+        if score >= threshold:
+            duplicates.append({
+                "id": candidate["id"], "name": candidate["name"], "status": candidate["status"],
+                "score": score, "reasons": reasons,
+            })
+    duplicates.sort(key=lambda item: (-item["score"], item["id"]))
+    return duplicates[:limit]
+
+
+# ============ 全库聚类 ============
+
+def find_duplicate_clusters(
+    db: Session,
+    threshold: float = DUPLICATE_THRESHOLD,
+    max_block_size: int = MAX_BLOCK_SIZE
+) -> List[dict]:
+    """
+    扫描全部客户（不含已删除），返回疑似重复的客户簇
+
+    按分块键顺序读取 customer_name_keys，同一分块内的客户互为候选，
+    相似度达到阈值的两两合并（并查集），簇的 score 为簇内最高相似度。
+
+    Returns:
+        [{"score": 0.9, "customers": [{"id", "name", "status"}, ...]}, ...]，
+        按簇大小、相似度降序
+    """
+    profiles = {
+        row[0]: _profile(*row)
+        for row in db.execute(
+            select(Customer.id, Customer.name, Customer.status, Customer.kyc_city, Customer.kyc_age_group)
+            .where(Customer.is_deleted == 0)
+        )
+    }
+    parent: Dict[int, int] = {}
+    best: Dict[int, float] = {}
+
+    def find(item: int) -> int:
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(a: int, b: int, score: float) -> None:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+        best[root_a] = max(best.get(root_a, 0.0), best.pop(root_b, 0.0), score)
+
+    keys = db.execute(
+        select(CustomerNameKey.key, CustomerNameKey.customer_id).order_by(CustomerNameKey.key)
+    )
+    for key, block in groupby(keys, key=lambda row: row[0]):
+        ids = [customer_id for _, customer_id in block if customer_id in profiles]
+        if len(ids) < 2:
+            continue
+        if not key.startswith("b:"):
+            # 归一化姓名 / 完整拼音相同：打分不涉及编辑距离，两两比较且不限分块大小，
+            # 同样只合并达到阈值的（拼音相同为 0.9，阈值更高时需 KYC 加分）
+            for a, b in combinations(ids, 2):
+                score, _ = score_pair(profiles[a], profiles[b])
+                if score >= threshold:
+                    union(a, b, score)
+            continue
+        if len(ids) > max_block_size:
+            continue
+        for a, b in combinations(ids, 2):
+            if find(a) == find(b):
+                continue
+            score, _ = score_pair(profiles[a], profiles[b])
+            if score >= threshold:
+                union(a, b, score)
+
+    members: Dict[int, List[int]] = {}
+    for item in parent:
+        members.setdefault(find(item), []).append(item)
+    clusters = [
+        {
+            "score": best.get(root, 0.0),
+            "customers": [
+                {key: profiles[customer_id][key] for key in ("id", "name", "status")}
+                for customer_id in sorted(ids)
+            ],
+        }
+        for root, ids in members.items() if len(ids) > 1
+    ]
+    clusters.sort(key=lambda cluster: (-len(cluster["customers"]), -cluster["score"], cluster["customers"][0]["id"]))
+    return clusters
@@ -0,0 +1,95 @@
+"""
+KYC 多选字段展开服务 - 维护 customer_kyc_facets 并构造按选项筛选的条件
+"""
+from typing import Any, List, Tuple
+
+from sqlalchemy import delete, insert, intersect, select, union
+from sqlalchemy.orm import Session
+
+from app.models import Customer, CustomerKycFacet, KYC_FACET_FIELDS
+
+
+def extract_facets(kyc_data: dict | None) -> List[Tuple[str, str]]:
+    """
+    从 KYC 数据中提取多选字段的 (字段名, 选项值) 列表
+
+    Args:
+        kyc_data: 客户 KYC 数据
+
+    Returns:
+        去重后的 (field, value) 列表
+    """
+    facets = []
+    for field in KYC_FACET_FIELDS:
+        raw: Any = (kyc_data or {}).get(field)
+        values = raw if isinstance(raw, list) else [raw]
+        for value in values:
+            if value is None or value == "":
+                continue
+            pair = (field, str(value))
+            if pair not in facets:
+                facets.append(pair)
+    return facets
+
+
+def sync_customer_facets(db: Session, customer: Customer):
+    """
+    按客户当前的 kyc_data 重建其展开行（不提交，由调用方统一 commit）
+
+    Args:
+        db: 数据库会话
+        customer: 客户对象（需已有 id，新建客户请先 flush）
+    """
+    db.execute(delete(CustomerKycFacet).where(CustomerKycFacet.customer_id == customer.id))
+    rows = [
+        {"customer_id": customer.id, "field": field, "value": value}
+        for field, value in extract_facets(customer.kyc_data)
+    ]
+    if rows:
+        db.execute(insert(CustomerKycFacet), rows)
+
+
+def parse_facets(raw: str) -> List[Tuple[str, str]]:
+    """
+    解析筛选参数，格式为 "字段:值,字段:值"
+
+    Raises:
+        ValueError: 格式错误或字段不支持筛选
+    """
+    facets = []
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        field, sep, value = item.partition(":")
+        field, value = field.strip(), value.strip()
+        if not sep or not value:
+            raise ValueError(f"筛选条件格式应为 字段:值，实际为 {item}")
+        if field not in KYC_FACET_FIELDS:
+            raise ValueError(f"字段 {field} 不支持筛选，可选: {', '.join(KYC_FACET_FIELDS)}")
+        facets.append((field, value))
+    return facets
+
+
+def facet_filter(facets: List[Tuple[str, str]], mode: str = "and"):
+    """
+    构造按多选选项筛选客户的条件
+
+    每个选项对应一次 (field, value) 索引查找，and 取交集、or 取并集，
+    结果作为 Customer.id IN (...) 条件，无需逐行解析 kyc_data。
+
+    Args:
+        facets: (field, value) 列表（非空）
+        mode: "and" 需同时满足全部选项，"or" 满足任一选项
+    """
+    selects = [
+        select(CustomerKycFacet.customer_id).where(
+            CustomerKycFacet.field == field,
+            CustomerKycFacet.value == value
+        )
+        for field, value in facets
+    ]
+    if len(selects) == 1:
+        return Customer.id.in_(selects[0])
+    combined = union(*selects) if mode == "or" else intersect(*selects)
+    return Customer.id.in_(combined)
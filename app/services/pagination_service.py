@@ -0,0 +1,97 @@
+"""
+游标分页服务 - 基于 (排序时间, id) 的 keyset 分页
+
+游标为不透明令牌（base64url 编码的 [排序值, id]），下一页条件为
+(sort, id) < (v, i)，配合 ORDER BY sort DESC, id DESC
+沿索引定位，页码再深也不需要 OFFSET 跳过前面的行。
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import orjson
+from sqlalchemy import String, and_, bindparam, func, or_, select, type_coerce
+
+from app.database import IS_SQLITE
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """生成游标令牌"""
+    raw = orjson.dumps([sort_value.isoformat(sep=" ", timespec="microseconds"), row_id])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    解析游标令牌
+
+    Raises:
+        ValueError: 令牌无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = orjson.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError, orjson.JSONDecodeError):
+        raise ValueError("无效的分页游标")
+
+
+def _stored_sort_value(sort_column, id_column, cursor_value: datetime, row_id: int):
+    """
+    SQLite 中游标所在行实际保存的排序值
+
+    SQLite 以文本保存时间并按字符串比较（ORDER BY 也按文本）：server_default 写入
+    "YYYY-MM-DD HH:MM:SS"，Python 写入的总带 6 位微秒（微秒为 0 时为 .000000），
+    同一时刻的两种写法文本不同，由解析后的 datetime 无法还原。
+    因此直接按 id 取游标行保存的原值作比较，与 ORDER BY 的文本顺序完全一致；
+    游标行已不存在（被删除或移入归档库）时退回带 6 位微秒的游标值。
+    """
+    sort_column, id_column = sort_column.expression, id_column.expression
+    # 用别名避免与外层查询的同一张表自动关联
+    table = sort_column.table.alias()
+    stored = (
+        select(table.c[sort_column.name])
+        .where(table.c[id_column.name] == row_id)
+        .scalar_subquery()
+    )
+    fallback = bindparam(None, cursor_value.isoformat(sep=" ", timespec="microseconds"), type_=String)
+    return func.coalesce(type_coerce(stored, String), fallback)
+
+
+def keyset_after(sort_column, id_column, cursor: str):
+    """
+    游标之后（按 sort DESC, id DESC 排序）的行的过滤条件
+
+    Raises:
+        ValueError: 游标无效
+    """
+    sort_value, row_id = decode_cursor(cursor)
+    if IS_SQLITE:
+        sort_value = _stored_sort_value(sort_column, id_column, sort_value, row_id)
+    # 额外的 sort <= v 给索引提供范围条件，直接定位到游标处而不是从头扫描
+    return and_(
+        sort_column <= sort_value,
+        or_(sort_column < sort_value, id_column < row_id)
+    )
+
+
+def next_cursor_for(rows: List, limit: int, sort_attr: str) -> Tuple[List, Optional[str]]:
+    """
+    根据多取一行的查询结果生成下一页游标
+
+    Args:
+        rows: 按 LIMIT limit + 1 查询到的行
+        limit: 每页条数
+        sort_attr: 排序时间字段名
+
+    Returns:
+        (本页行, 下一页游标；没有更多数据时为 None)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    sort_value = getattr(last, sort_attr)
+    if sort_value is None:
+        return rows, None
+    return rows, encode_cursor(sort_value, last.id)
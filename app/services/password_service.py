@@ -0,0 +1,159 @@
+"""
+密码哈希服务 - 加盐的慢哈希（scrypt / PBKDF2），在专用线程池中计算
+
+存储格式（users.password_hash）：
+
+- scrypt$<N>$<r>$<p>$<盐>$<哈希>
+- pbkdf2_sha256$<迭代次数>$<盐>$<哈希>
+- 旧格式：64 位十六进制的 SHA-256（固定盐值），仍可验证
+
+哈希计算耗时数十毫秒，统一提交到 PASSWORD_HASH_WORKERS 个线程的专用线程池，
+不占用事件循环，也不挤占同步路由所在的线程池；排队数超过 PASSWORD_HASH_MAX_PENDING
+时直接拒绝（PasswordHasherBusy），避免登录洪峰拖慢其他请求。
+登录成功时若哈希为旧格式或参数与当前配置不同，按当前配置重新计算并保存（见 needs_rehash）。
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from app.config import settings
+
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_SALT_BYTES = 16
+_LEGACY_SALT = "kyc_crm_salt_2024"
+
+
+class PasswordHasherBusy(Exception):
+    """待计算的哈希过多（登录洪峰），调用方应返回 503"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem 需覆盖 128 * r * (N + p + 2) 字节，OpenSSL 默认上限只有 32MB
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=32
+    )
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def legacy_hash(password: str) -> str:
+    """旧格式哈希（SHA-256 + 固定盐值），仅用于验证旧密码与基准对比"""
+    return hashlib.sha256(f"{_LEGACY_SALT}{password}".encode()).hexdigest()
+
+
+class PasswordHasher:
+    """按配置的算法与参数计算 / 验证密码哈希（专用有界线程池）"""
+
+    def __init__(
+        self,
+        algorithm: str = SCRYPT,
+        scrypt_n: int = 16384,
+        pbkdf2_iterations: int = 600000,
+        workers: int = 2,
+        max_pending: int = 32,
+    ):
+        if algorithm not in (SCRYPT, PBKDF2):
+            raise ValueError(f"不支持的密码哈希算法: {algorithm}")
+        if algorithm == SCRYPT and (scrypt_n < 2 or scrypt_n & (scrypt_n - 1)):
+            raise ValueError("scrypt 的 N 必须是大于 1 的 2 的幂")
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self._dummy: Optional[str] = None
+
+    # ---------- 纯计算（在工作线程中执行） ----------
+
+    def _hash(self, password: str) -> str:
+        salt = os.urandom(_SALT_BYTES)
+        if self.algorithm == SCRYPT:
+            digest = _scrypt(password, salt, self.scrypt_n, _SCRYPT_R, _SCRYPT_P)
+            return f"{SCRYPT}${self.scrypt_n}${_SCRYPT_R}${_SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+        digest = _pbkdf2(password, salt, self.pbkdf2_iterations)
+        return f"{PBKDF2}${self.pbkdf2_iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def _verify(self, password: str, stored: Optional[str]) -> bool:
+        if stored is None:
+            # 用户不存在时按当前参数空算一次，响应时间与密码错误一致，不暴露用户名是否存在
+            if self._dummy is None:
+                self._dummy = self._hash("")
+            self._verify(password, self._dummy)
+            return False
+        parts = stored.split("$")
+        try:
+            if parts[0] == SCRYPT and len(parts) == 6:
+                n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+                expected = _b64decode(parts[5])
+                digest = _scrypt(password, _b64decode(parts[4]), n, r, p)
+            elif parts[0] == PBKDF2 and len(parts) == 4:
+                expected = _b64decode(parts[3])
+                digest = _pbkdf2(password, _b64decode(parts[2]), int(parts[1]))
+            elif len(parts) == 1:
+                return hmac.compare_digest(stored, legacy_hash(password))
+            else:
+                return False
+        except ValueError:
+            return False
+        return hmac.compare_digest(digest, expected)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """哈希是否为旧格式或参数与当前配置不同（登录成功后应重新计算）"""
+        parts = stored.split("$")
+        if self.algorithm == SCRYPT:
+            return parts[:4] != [SCRYPT, str(self.scrypt_n), str(_SCRYPT_R), str(_SCRYPT_P)]
+        return parts[:2] != [PBKDF2, str(self.pbkdf2_iterations)]
+
+    # ---------- 线程池调度 ----------
+
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("密码校验请求过多，请稍后再试")
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str) -> str:
+        """计算密码哈希（同步调用方在当前线程等待结果）"""
+        return self._submit(self._hash, password).result()
+
+    def verify(self, password: str, stored: Optional[str]) -> bool:
+        """验证密码；stored 为 None（用户不存在）时同样耗时并返回 False"""
+        return self._submit(self._verify, password, stored).result()
+
+    async def hash_async(self, password: str) -> str:
+        """计算密码哈希（异步版本，不阻塞事件循环）"""
+        return await asyncio.wrap_future(self._submit(self._hash, password))
+
+    async def verify_async(self, password: str, stored: Optional[str]) -> bool:
+        """验证密码（异步版本，不阻塞事件循环）"""
+        return await asyncio.wrap_future(self._submit(self._verify, password, stored))
+
+
+password_hasher = PasswordHasher(
+    algorithm=settings.PASSWORD_HASH_ALGORITHM,
+    scrypt_n=settings.PASSWORD_SCRYPT_N,
+    pbkdf2_iterations=settings.PASSWORD_PBKDF2_ITERATIONS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
@@ -0,0 +1,179 @@
+"""
+回收站清理服务 - 永久删除客户及其全部关联数据
+
+永久删除级联到邀请记录、活动日志及其日汇总、KYC 展开行、姓名分块键、AI 报告与历史版本
+（全文索引与计数表由触发器维护），已移入归档库的客户连同归档的关联数据一并删除。
+被删除客户的时间线随之删除，删除动作本身以 customer_id 为空的活动日志留痕。
+
+定时清理（scripts/purge_recycle_bin.py）按保留期限 RECYCLE_BIN_RETENTION_DAYS
+选出 deleted_at 已过期的客户，每批一个短事务，批次之间释放写锁，
+前台请求最多等待一个批次。
+"""
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, delete, exists, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.models import (
+    ActivityLog, Customer, CustomerKycFacet, CustomerNameKey, CustomerReport, CustomerReportVersion, FormInvite
+)
+from app.services.archive_service import (
+    ARCHIVE_ENABLED, archived_activity_logs, archived_customers, archived_invites, delete_archived_customers
+)
+from app.services.rollup_service import delete_customer_rollups
+
+# 定时清理每个事务删除的客户数
+PURGE_BATCH_SIZE = 100
+
+# 随客户一起删除的关联表
+_CUSTOMER_CHILDREN = (
+    FormInvite, ActivityLog, CustomerKycFacet, CustomerNameKey, CustomerReport, CustomerReportVersion
+)
+
+
+def delete_customers(conn, customer_ids: List[int]) -> Dict[str, int]:
+    """
+    永久删除客户及全部关联数据，热库与归档库中的都删除
+    （在调用方的事务中执行，Session / Connection 均可）
+
+    Returns:
+        各表删除的行数（两库合计，customers / archived_customers 分别为热库 / 归档库的客户数）
+    """
+    counts = {}
+    for model in _CUSTOMER_CHILDREN:
+        counts[model.__tablename__] = conn.execute(
+            delete(model).where(model.customer_id.in_(customer_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    counts["customers"] = conn.execute(
+        delete(Customer).where(Customer.id.in_(customer_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+    if ARCHIVE_ENABLED:
+        for key, count in delete_archived_customers(conn, customer_ids).items():
+            counts[key] = counts.get(key, 0) + count
+    counts["activity_rollups"] = delete_customer_rollups(conn, customer_ids)
+    return counts
+
+
+def _expired_customers(cutoff: datetime):
+    return select(Customer.id).where(Customer.is_deleted == 1, Customer.deleted_at < cutoff)
+
+
+def _expired_archived_customers(cutoff: datetime):
+    return select(archived_customers.c.id).where(archived_customers.c.deleted_at < cutoff)
+
+
+def _orphan_activity_logs():
+    """customer_id 指向已不存在（热库与归档库均没有）的客户的活动日志"""
+    conditions = [
+        ActivityLog.customer_id.isnot(None),
+        ~exists().where(Customer.id == ActivityLog.customer_id),
+    ]
+    if ARCHIVE_ENABLED:
+        conditions.append(~exists().where(archived_customers.c.id == ActivityLog.customer_id))
+    return select(ActivityLog.id).where(and_(*conditions))
+
+
+def _count(conn: Connection, query) -> int:
+    return conn.execute(select(func.count()).select_from(query.subquery())).scalar()
+
+
+def purge_report(conn: Connection, cutoff: datetime) -> dict:
+    """
+    清理预览（dry-run）：到期的客户及将被级联删除的邀请、活动日志数量（两库合计）
+
+    Args:
+        cutoff: deleted_at 早于该时间的客户到期
+    """
+    expired = [_expired_customers(cutoff)]
+    invites = [FormInvite.__table__]
+    logs = [ActivityLog.__table__]
+    if ARCHIVE_ENABLED:
+        expired.append(_expired_archived_customers(cutoff))
+        invites.append(archived_invites)
+        logs.append(archived_activity_logs)
+
+    def count_children(tables) -> int:
+        # 归档客户的近期活动日志仍在热库，两库的日志都要按两库的到期客户统计
+        return sum(
+            _count(conn, select(table.c.id).where(table.c.customer_id.in_(ids)))
+            for table in tables for ids in expired
+        )
+
+    report = {
+        "cutoff": cutoff,
+        "customers": _count(conn, expired[0]),
+        "archived_customers": _count(conn, expired[1]) if ARCHIVE_ENABLED else 0,
+        "form_invites": count_children(invites),
+        "activity_logs": count_children(logs),
+        "orphan_activity_logs": _count(conn, _orphan_activity_logs()),
+        "oldest_deleted_at": conn.execute(
+            select(func.min(Customer.deleted_at)).where(Customer.is_deleted == 1)
+        ).scalar(),
+    }
+    if ARCHIVE_ENABLED:
+        archived_oldest = conn.execute(select(func.min(archived_customers.c.deleted_at))).scalar()
+        if archived_oldest and (report["oldest_deleted_at"] is None or archived_oldest < report["oldest_deleted_at"]):
+            report["oldest_deleted_at"] = archived_oldest
+    return report
+
+
+def purge_recycle_bin(
+    engine: Engine,
+    cutoff: datetime,
+    batch_size: int = PURGE_BATCH_SIZE,
+    user_id: Optional[int] = None
+) -> dict:
+    """
+    分批永久删除 deleted_at 早于 cutoff 的回收站客户（含归档库），并清理孤立的活动日志
+
+    每批一个事务；结束后写入一条 recycle_bin_purged 活动日志记录本次指标。
+
+    Returns:
+        清理指标：各表删除行数、批次数、耗时与单批最长耗时（毫秒，即最长持锁时间）
+    """
+    metrics = {"customers": 0, "archived_customers": 0, "batches": 0, "max_batch_ms": 0.0}
+    started = time.perf_counter()
+
+    def run_batches(select_ids, purge):
+        while True:
+            batch_started = time.perf_counter()
+            with engine.begin() as conn:
+                ids = conn.execute(select_ids.limit(batch_size)).scalars().all()
+                if not ids:
+                    return
+                for key, count in purge(conn, ids).items():
+                    metrics[key] = metrics.get(key, 0) + count
+            metrics["batches"] += 1
+            metrics["max_batch_ms"] = max(metrics["max_batch_ms"], (time.perf_counter() - batch_started) * 1000)
+
+    run_batches(_expired_customers(cutoff), delete_customers)
+    if ARCHIVE_ENABLED:
+        run_batches(_expired_archived_customers(cutoff), delete_customers)
+    run_batches(_orphan_activity_logs(), lambda conn, ids: {
+        "orphan_activity_logs": conn.execute(delete(ActivityLog).where(ActivityLog.id.in_(ids))).rowcount
+    })
+
+    metrics["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    metrics["max_batch_ms"] = round(metrics["max_batch_ms"], 1)
+    with engine.begin() as conn:
+        conn.execute(insert(ActivityLog).values(
+            customer_id=None, user_id=user_id, action_type="recycle_bin_purged",
+            action_detail={"cutoff": cutoff.isoformat(sep=" ", timespec="seconds"), **metrics},
+        ))
+    return metrics
+
+
+def last_purge(conn) -> Optional[dict]:
+    """最近一次定时清理的时间与指标"""
+    row = conn.execute(
+        select(ActivityLog.created_at, ActivityLog.action_detail)
+        .where(ActivityLog.action_type == "recycle_bin_purged")
+        .order_by(ActivityLog.id.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return None
+    return {"finished_at": row.created_at, **(row.action_detail or {})}
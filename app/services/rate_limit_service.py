@@ -0,0 +1,228 @@
+"""
+频率限制服务 - 滑动窗口计数器（登录失败限流）
+
+每个键（如客户端 IP）只保存当前固定窗口与上一窗口的计数，按当前窗口已过去的比例
+对上一窗口计数加权，估算最近 window 秒内的次数：
+
+    估算值 = 上一窗口计数 × (1 - 当前窗口已过比例) + 当前窗口计数
+
+检查与记录都是 O(1)，每个键占用固定大小。计数保存在可替换的存储后端中：
+
+- memory：进程内字典，最多 max_keys 个键（超出时淘汰最久未访问的键），仅单进程有效
+- database：主库中的 login_rate_limits 表（每个键一行，原子 upsert），多个 worker 共享
+- redis：Redis 或兼容服务（每个窗口一个带过期时间的计数键），多个 worker / 多台机器共享，
+  需安装 redis 包
+
+过期键由限流器每个窗口周期清理一次（redis 由键过期自动清理）。
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.engine import Engine
+
+from app.models import LoginRateLimit
+
+
+def _rolled(stored_window: int, count: int, previous: int, window_start: int, window: int) -> Tuple[int, int]:
+    """已保存的 (窗口起点, 计数, 上一窗口计数) 在 window_start 所在窗口下的 (当前, 上一) 计数"""
+    if stored_window == window_start:
+        return count, previous
+    if stored_window == window_start - window:
+        return 0, count
+    return 0, 0
+
+
+class MemoryBackend:
+    """进程内存储（单进程部署）"""
+
+    name = "memory"
+
+    def __init__(self, window: int, max_keys: int = 10000):
+        self.window = window
+        self.max_keys = max(max_keys, 1)
+        # {键: [窗口起点, 当前窗口计数, 上一窗口计数]}，按最近访问排序
+        self._items: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def counts(self, key: str, window_start: int) -> Tuple[int, int]:
+        with self._lock:
+            item = self._items.get(key)
+            return _rolled(*item, window_start, self.window) if item else (0, 0)
+
+    def hit(self, key: str, window_start: int) -> None:
+        with self._lock:
+            item = self._items.get(key)
+            count, previous = _rolled(*item, window_start, self.window) if item else (0, 0)
+            self._items[key] = [window_start, count + 1, previous]
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_keys:
+                self._items.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def evict(self, window_start: int) -> int:
+        """删除在当前与上一窗口都没有计数的键"""
+        with self._lock:
+            stale = [key for key, item in self._items.items() if item[0] < window_start - self.window]
+            for key in stale:
+                del self._items[key]
+            return len(stale)
+
+
+class DatabaseBackend:
+    """主库表存储（多 worker 共享，SQLite / PostgreSQL 均可）"""
+
+    name = "database"
+
+    # 同一键的并发记录由 upsert 的行锁串行化；SET 中的表达式均取更新前的值
+    _HIT = text(
+        "INSERT INTO login_rate_limits (client_key, window_start, count, previous) "
+        "VALUES (:key, :window_start, 1, 0) "
+        "ON CONFLICT (client_key) DO UPDATE SET "
+        "previous = CASE "
+        "WHEN login_rate_limits.window_start = excluded.window_start THEN login_rate_limits.previous "
+        "WHEN login_rate_limits.window_start = excluded.window_start - :window THEN login_rate_limits.count "
+        "ELSE 0 END, "
+        "count = CASE WHEN login_rate_limits.window_start = excluded.window_start "
+        "THEN login_rate_limits.count + 1 ELSE 1 END, "
+        "window_start = excluded.window_start "
+        # 各 worker 时钟略有偏差时，不让较早的窗口覆盖已前进的窗口
+        "WHERE login_rate_limits.window_start <= excluded.window_start"
+    )
+
+    def __init__(self, engine: Engine, window: int):
+        self.engine = engine
+        self.window = window
+
+    def counts(self, key: str, window_start: int) -> Tuple[int, int]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(LoginRateLimit.window_start, LoginRateLimit.count, LoginRateLimit.previous)
+                .where(LoginRateLimit.client_key == key)
+            ).first()
+        return _rolled(*row, window_start, self.window) if row else (0, 0)
+
+    def hit(self, key: str, window_start: int) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(self._HIT, {"key": key, "window_start": window_start, "window": self.window})
+
+    def reset(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(LoginRateLimit).where(LoginRateLimit.client_key == key))
+
+    def evict(self, window_start: int) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(
+                delete(LoginRateLimit).where(LoginRateLimit.window_start < window_start - self.window)
+            ).rowcount
+
+
+class RedisBackend:
+    """Redis（或兼容服务）存储：每个窗口一个计数键，2 个窗口后自动过期"""
+
+    name = "redis"
+
+    def __init__(self, url: str, window: int, prefix: str = "kyc:ratelimit"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("LOGIN_RATE_LIMIT_BACKEND=redis 需要安装 redis 包：pip install redis") from e
+        self.client = redis.Redis.from_url(url)
+        self.window = window
+        self.prefix = prefix
+
+    def _key(self, key: str, window_start: int) -> str:
+        return f"{self.prefix}:{key}:{window_start}"
+
+    def counts(self, key: str, window_start: int) -> Tuple[int, int]:
+        current, previous = self.client.mget(
+            self._key(key, window_start), self._key(key, window_start - self.window)
+        )
+        return int(current or 0), int(previous or 0)
+
+    def hit(self, key: str, window_start: int) -> None:
+        name = self._key(key, window_start)
+        pipe = self.client.pipeline()
+        pipe.incr(name)
+        pipe.expire(name, self.window * 2)
+        pipe.execute()
+
+    def reset(self, key: str) -> None:
+        # 只需删除可能仍在计数的两个窗口
+        window_start = int(time.time()) // self.window * self.window
+        self.client.delete(self._key(key, window_start), self._key(key, window_start - self.window))
+
+    def evict(self, window_start: int) -> int:
+        return 0
+
+
+def create_backend(name: str, window: int, engine: Optional[Engine] = None,
+                   max_keys: int = 10000, redis_url: str = ""):
+    """按名称（memory / database / redis）创建存储后端"""
+    if name == "memory":
+        return MemoryBackend(window, max_keys=max_keys)
+    if name == "database":
+        return DatabaseBackend(engine, window)
+    if name == "redis":
+        return RedisBackend(redis_url, window)
+    raise ValueError(f"不支持的频率限制存储: {name}")
+
+
+class SlidingWindowRateLimiter:
+    """
+    滑动窗口频率限制器
+
+    规则：同一键在最近 window 秒内最多 max_attempts 次（按滑动窗口估算）。
+    超出后返回冷却剩余秒数，需等待后才能继续。
+    """
+
+    def __init__(self, backend, max_attempts: int = 5, window: int = 300):
+        self.backend = backend
+        self.max_attempts = max_attempts  # 允许的最大尝试次数
+        self.window = window              # 时间窗口（秒）
+        self._next_evict = 0.0
+
+    def _window_start(self, now: float) -> int:
+        return int(now) // self.window * self.window
+
+    def _maybe_evict(self, now: float) -> None:
+        """每个窗口周期清理一次过期键"""
+        if now >= self._next_evict:
+            self._next_evict = now + self.window
+            self.backend.evict(self._window_start(now))
+
+    def check(self, key: str) -> int:
+        """
+        检查是否允许尝试
+
+        Returns:
+            0 — 允许
+            >0 — 需等待的秒数
+        """
+        now = time.time()
+        self._maybe_evict(now)
+        window_start = self._window_start(now)
+        current, previous = self.backend.counts(key, window_start)
+        elapsed = (now - window_start) / self.window
+        if previous * (1 - elapsed) + current < self.max_attempts:
+            return 0
+        # 不再有新尝试时，估算值降到上限以下的时刻
+        if current < self.max_attempts:
+            allowed_at = window_start + self.window * (1 - (self.max_attempts - current) / previous)
+        else:
+            allowed_at = window_start + self.window * (2 - self.max_attempts / current)
+        return max(math.ceil(allowed_at - now), 1)
+
+    def record_failure(self, key: str) -> None:
+        """记录一次失败尝试"""
+        self.backend.hit(key, self._window_start(time.time()))
+
+    def reset(self, key: str) -> None:
+        """成功后清除该键的失败记录"""
+        self.backend.reset(key)
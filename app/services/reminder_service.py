@@ -4,10 +4,11 @@
 from datetime import date, datetime, timedelta
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_
 
 from app.models import Customer, CustomerStatus, User
 from app.schemas import DashboardReminders, ReminderItem
+from app.services.auth_service import customer_access_filter
 
 
 def _apply_owner_filter(query, current_user: Optional[User]):
@@ -19,12 +20,7 @@ def _apply_owner_filter(query, current_user: Optional[User]):
     """
     if current_user is None or current_user.is_admin:
         return query
-    return query.filter(
-        or_(
-            Customer.owner_user_id == current_user.id,
-            Customer.owner_user_id.is_(None)
-        )
-    )
+    return query.filter(customer_access_filter(current_user))
 
 
 def get_all_reminders(db: Session, current_user: Optional[User] = None) -> DashboardReminders:
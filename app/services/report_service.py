@@ -0,0 +1,215 @@
+"""
+AI 分析结果服务 - 读写 customer_reports 与历史版本 customer_report_versions
+
+最新报告以明文保存在 customer_reports（单行读取）；每次分析同时追加一个
+历史版本，正文用 zlib + 预置字典压缩。报告大量复用固定的标题与措辞，
+预置字典让即使只有几 KB 的单篇报告也能获得较高压缩率。
+"""
+import difflib
+import zlib
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import IS_SQLITE
+from app.models import Customer, CustomerReport, CustomerReportVersion
+
+# 预置字典：取自报告模板中反复出现的片段，越常见的内容越靠后。
+# 已写入的数据依赖字典内容解压，修改字典时必须新增 codec，不能改动已有字典。
+_REPORT_DICTIONARY_V1 = """
+适合高净值人士，税务优化效果显著，子女可享受优质国际教育资源。
+适合有一定学历或专业背景的申请人，审批周期相对较快。
+客户可满足严格的居住要求（如西班牙、葡萄牙黄金签证的居住要求）
+客户可满足中等居住要求（如香港优才续签、新加坡PR维持）
+客户居住时间有限，建议优先考虑无居住要求或低居住要求的项目
+居住意愿待确认，需进一步沟通
+无外汇管制 税率低（个人所得税最高22%） 教育资源丰富 无需投资 保留内地身份
+子女可参加华侨生联考 美国 加拿大 澳大利亚 新西兰 英国 日本 新加坡 香港 欧洲 马耳他 希腊
+身份规划 税务优化 子女教育 资产配置 养老医疗 海外置业 家族传承 创业投资
+1. 建议尽早准备相关文件
+2. 资产证明需提前3个月整理
+3. 子女教育规划需同步进行
+
+---
+*本报告由 AI 智能分析生成，仅供参考。具体方案请咨询专业顾问。*
+ 移民方案分析报告
+
+## 一、客户画像
+
+- **意向国家**:
+- **核心诉求**:
+- **资产规模**:
+- **所属行业**:
+- **最高学历**: （第一学历：
+- **学历认证**:
+- **办理周期**:
+- **家庭情况**:  位子女
+- **居住意愿**:
+
+### 居住要求分析
+
+## 二、方案建议
+
+### 推荐方案一：
+### 推荐方案二：
+**优势**：
+-
+**周期**: 个月
+
+## 三、注意事项
+""".encode("utf-8")
+
+_DICTIONARIES = {
+    "zlib-d1": _REPORT_DICTIONARY_V1,
+}
+
+# 新写入版本使用的压缩方式
+REPORT_CODEC = "zlib-d1"
+
+
+def compress_report(report: str, codec: str = REPORT_CODEC) -> bytes:
+    """按指定压缩方式压缩报告正文"""
+    compressor = zlib.compressobj(level=9, zdict=_DICTIONARIES[codec])
+    return compressor.compress(report.encode("utf-8")) + compressor.flush()
+
+
+def decompress_report(codec: str, data: bytes) -> str:
+    """解压报告正文"""
+    decompressor = zlib.decompressobj(zdict=_DICTIONARIES[codec])
+    return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+
+
+def new_report_version(
+    customer_id: int,
+    version: int,
+    report: str,
+    opportunities: Optional[List[dict]] = None,
+    user_id: Optional[int] = None
+) -> CustomerReportVersion:
+    """构造一个压缩后的历史版本记录"""
+    return CustomerReportVersion(
+        customer_id=customer_id,
+        version=version,
+        codec=REPORT_CODEC,
+        report_data=compress_report(report or ""),
+        report_size=len((report or "").encode("utf-8")),
+        ai_opportunities=opportunities,
+        created_by=user_id,
+    )
+
+
+async def _lock_customer_reports(db: AsyncSession, customer_id: int) -> None:
+    """
+    串行化同一客户的报告写入，直到调用方提交
+
+    PostgreSQL 对客户行加 FOR UPDATE 锁。SQLite 驱动在第一条写语句前才开启事务，
+    这里以一条不改变数据的 UPDATE 作为事务的第一次写入，取得库级写锁（其他连接
+    按 busy_timeout 等待），之后读到的最大版本号在提交前不会被其他连接改变。
+    """
+    if IS_SQLITE:
+        await db.execute(text("UPDATE customers SET id = id WHERE id = :id"), {"id": customer_id})
+    else:
+        await db.execute(select(Customer.id).where(Customer.id == customer_id).with_for_update())
+
+
+async def save_customer_report(
+    db: AsyncSession,
+    customer_id: int,
+    report: str,
+    opportunities: Optional[List[dict]] = None,
+    user_id: Optional[int] = None
+) -> CustomerReport:
+    """
+    保存客户最新的 AI 分析结果并追加历史版本（不提交，由调用方统一 commit）
+
+    超出 REPORT_HISTORY_KEEP 的旧版本会被清理。版本号在客户级的锁内分配
+    （见 _lock_customer_reports），并发分析同一客户时依次取得递增的版本号。
+
+    Args:
+        db: 数据库会话
+        customer_id: 客户ID
+        report: 分析报告（Markdown）
+        opportunities: 商机挖掘结果
+        user_id: 触发分析的用户ID
+    """
+    await _lock_customer_reports(db, customer_id)
+    record = await db.get(CustomerReport, customer_id)
+    if record is None:
+        record = CustomerReport(customer_id=customer_id)
+        db.add(record)
+    record.ai_report = report
+    record.ai_opportunities = opportunities
+
+    latest = (await db.execute(
+        select(func.max(CustomerReportVersion.version))
+        .where(CustomerReportVersion.customer_id == customer_id)
+    )).scalar() or 0
+    version = latest + 1
+    db.add(new_report_version(customer_id, version, report, opportunities, user_id))
+
+    # 保留策略：只保留最近 N 个版本
+    if settings.REPORT_HISTORY_KEEP > 0 and version > settings.REPORT_HISTORY_KEEP:
+        await db.execute(
+            delete(CustomerReportVersion).where(
+                CustomerReportVersion.customer_id == customer_id,
+                CustomerReportVersion.version <= version - settings.REPORT_HISTORY_KEEP
+            )
+        )
+    return record
+
+
+async def list_report_versions(db: AsyncSession, customer_id: int) -> List[dict]:
+    """列出客户的历史版本（不解压正文）"""
+    result = await db.execute(
+        select(
+            CustomerReportVersion.version,
+            CustomerReportVersion.report_size,
+            func.length(CustomerReportVersion.report_data).label("stored_size"),
+            CustomerReportVersion.created_by,
+            CustomerReportVersion.created_at,
+        )
+        .where(CustomerReportVersion.customer_id == customer_id)
+        .order_by(CustomerReportVersion.version.desc())
+    )
+    return [dict(row._mapping) for row in result]
+
+
+async def get_report_version(
+    db: AsyncSession,
+    customer_id: int,
+    version: Optional[int] = None
+) -> Optional[CustomerReportVersion]:
+    """获取指定版本（默认最新版本）"""
+    query = select(CustomerReportVersion).where(CustomerReportVersion.customer_id == customer_id)
+    if version is not None:
+        query = query.where(CustomerReportVersion.version == version)
+    else:
+        query = query.order_by(CustomerReportVersion.version.desc()).limit(1)
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+async def get_previous_report_version(
+    db: AsyncSession,
+    customer_id: int,
+    before: int
+) -> Optional[CustomerReportVersion]:
+    """获取 before 之前最近的一个版本（旧版本可能已按保留策略清理），没有时返回 None"""
+    query = (
+        select(CustomerReportVersion)
+        .where(CustomerReportVersion.customer_id == customer_id, CustomerReportVersion.version < before)
+        .order_by(CustomerReportVersion.version.desc())
+        .limit(1)
+    )
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+def diff_reports(old: str, new: str, from_version: int, to_version: int) -> str:
+    """生成两个报告版本的 unified diff"""
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True),
+        new.splitlines(keepends=True),
+        fromfile=f"v{from_version}",
+        tofile=f"v{to_version}",
+    ))
@@ -0,0 +1,208 @@
+"""
+活动日志汇总服务 - 维护 activity_rollups 并压缩旧的原始日志
+
+activity_logs 上的插入触发器为每条新日志在 activity_rollups 中按
+(日期, 客户, 操作人, 操作类型) 累加计数，与日志写入处于同一事务，
+事务性写入、批量写入与缓冲写入线程都会自动维护。删除日志不回减计数：
+
+- 近期：热库原始日志，客户时间线逐条展示
+- 超过 ARCHIVE_ACTIVITY_DAYS：原始日志移入归档库（见 archive_service），时间线仍可查看
+- 超过 ACTIVITY_RAW_RETENTION_DAYS：原始日志由压缩任务（scripts/compact_activity_logs.py）
+  删除，只保留汇总计数，客户活动概览与仪表盘统计读取汇总表
+
+客户被永久删除时其汇总行一并删除；删除用户时其汇总行并入“无操作人”。
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, delete, func, inspect, select, text, union_all
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import ARCHIVE_SCHEMA
+from app.models import ActivityLog, ActivityRollup, User
+from app.services.archive_service import ARCHIVE_ENABLED, archived_activity_logs
+
+_KEY = "day, customer_key, user_key, action_type"
+
+_UPSERT = (
+    f"INSERT INTO activity_rollups ({_KEY}, count) "
+    "VALUES ({day}, COALESCE(NEW.customer_id, 0), COALESCE(NEW.user_id, 0), NEW.action_type, 1) "
+    f"ON CONFLICT ({_KEY}) DO UPDATE SET count = activity_rollups.count + 1"
+)
+
+_SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS trg_activity_logs_rollup",
+    f"""CREATE TRIGGER trg_activity_logs_rollup AFTER INSERT ON activity_logs
+    BEGIN {_UPSERT.format(day="date(NEW.created_at)")}; END""",
+]
+
+_POSTGRESQL_TRIGGERS = [
+    f"""CREATE OR REPLACE FUNCTION activity_rollups_maintain() RETURNS trigger AS $$
+    BEGIN
+        {_UPSERT.format(day="CAST(NEW.created_at AS DATE)")};
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS trg_activity_logs_rollup ON activity_logs",
+    """CREATE TRIGGER trg_activity_logs_rollup AFTER INSERT ON activity_logs
+    FOR EACH ROW EXECUTE FUNCTION activity_rollups_maintain()""",
+]
+
+
+def install_rollup_triggers(conn: Connection) -> None:
+    """创建（或重建）activity_logs 上维护汇总表的触发器"""
+    statements = _POSTGRESQL_TRIGGERS if conn.dialect.name == "postgresql" else _SQLITE_TRIGGERS
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _day(conn: Connection, column):
+    # SQLite 的 CAST(... AS DATE) 按数值处理，需用 date()
+    return func.date(column) if conn.dialect.name == "sqlite" else cast(column, Date)
+
+
+def _log_tables(conn: Connection) -> list:
+    """原始日志所在的表：热库 + 已创建的归档表"""
+    tables = [ActivityLog.__table__]
+    if ARCHIVE_ENABLED and conn.dialect.name == "sqlite" \
+            and inspect(conn).has_table(archived_activity_logs.name, schema=ARCHIVE_SCHEMA):
+        tables.append(archived_activity_logs)
+    return tables
+
+
+def rebuild_activity_rollups(conn: Connection) -> None:
+    """
+    按现存的原始日志（热库 + 归档库）重建汇总表（在调用方的事务中执行）
+
+    仅用于初次建表回填：已压缩删除的日志无法从原始日志恢复，重建会丢失其计数。
+    """
+    rows = union_all(*[
+        select(
+            _day(conn, table.c.created_at).label("day"),
+            func.coalesce(table.c.customer_id, 0).label("customer_key"),
+            func.coalesce(table.c.user_id, 0).label("user_key"),
+            table.c.action_type,
+        )
+        for table in _log_tables(conn)
+    ]).subquery()
+    key = [rows.c.day, rows.c.customer_key, rows.c.user_key, rows.c.action_type]
+    conn.execute(ActivityRollup.__table__.delete())
+    conn.execute(
+        ActivityRollup.__table__.insert().from_select(
+            ["day", "customer_key", "user_key", "action_type", "count"],
+            select(*key, func.count()).group_by(*key)
+        )
+    )
+
+
+def delete_customer_rollups(conn, customer_ids: List[int]) -> int:
+    """删除客户的汇总行（永久删除客户时，在调用方的事务中执行）"""
+    return conn.execute(
+        delete(ActivityRollup).where(ActivityRollup.customer_key.in_(customer_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def anonymize_user_rollups(conn, user_id: int) -> None:
+    """将用户的汇总行并入“无操作人”（删除用户时，与 activity_logs.user_id 置空保持一致）"""
+    conn.execute(
+        text(
+            f"INSERT INTO activity_rollups ({_KEY}, count) "
+            "SELECT day, customer_key, 0, action_type, count FROM activity_rollups WHERE user_key = :user_id "
+            f"ON CONFLICT ({_KEY}) DO UPDATE SET count = activity_rollups.count + excluded.count"
+        ),
+        {"user_id": user_id},
+    )
+    conn.execute(
+        delete(ActivityRollup).where(ActivityRollup.user_key == user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ============ 压缩 ============
+
+def count_compactable(conn: Connection, cutoff: datetime) -> int:
+    """统计 created_at 早于 cutoff 的原始日志条数（热库 + 归档库）"""
+    return sum(
+        conn.execute(select(func.count()).select_from(table).where(table.c.created_at < cutoff)).scalar()
+        for table in _log_tables(conn)
+    )
+
+
+def compact_activity_logs(engine: Engine, cutoff: datetime, batch_size: int = 1000) -> int:
+    """
+    删除 created_at 早于 cutoff 的原始日志（计数已在汇总表中），每批一个短事务
+
+    Returns:
+        删除的日志条数
+    """
+    with engine.connect() as conn:
+        tables = _log_tables(conn)
+    compacted = 0
+    for table in tables:
+        # 按 id 续扫（日志 id 随时间递增），每批沿主键前进，不重复扫描已检查过的行
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                ids = conn.execute(
+                    select(table.c.id)
+                    .where(table.c.id > last_id, table.c.created_at < cutoff)
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                conn.execute(table.delete().where(table.c.id.in_(ids)))
+            compacted += len(ids)
+            last_id = ids[-1]
+    return compacted
+
+
+# ============ 统计查询 ============
+
+def customer_activity_summary(db, customer_id: int) -> dict:
+    """
+    客户的全部历史活动概览（含已归档、已压缩的日志）
+
+    Returns:
+        {"total", "first_day", "last_day", "by_action": {操作类型: 次数}, "by_month": [{"month", "count"}]}
+    """
+    rows = db.execute(
+        select(ActivityRollup.day, ActivityRollup.action_type, ActivityRollup.count)
+        .where(ActivityRollup.customer_key == customer_id)
+    ).all()
+    by_action = defaultdict(int)
+    by_month = defaultdict(int)
+    for day, action_type, count in rows:
+        by_action[action_type] += count
+        by_month[day.strftime("%Y-%m")] += count
+    days = [row.day for row in rows]
+    return {
+        "total": sum(by_action.values()),
+        "first_day": min(days) if days else None,
+        "last_day": max(days) if days else None,
+        "by_action": dict(sorted(by_action.items(), key=lambda item: -item[1])),
+        "by_month": [{"month": month, "count": count} for month, count in sorted(by_month.items())],
+    }
+
+
+def activity_stats_query(since: date, current_user: User, action_type: Optional[str] = None):
+    """
+    按日、操作类型汇总活动次数的查询（仪表盘统计）
+
+    Args:
+        since: 起始日期（含）
+        current_user: 非管理员只统计本人的操作
+        action_type: 只统计该操作类型
+    """
+    conditions = [ActivityRollup.day >= since]
+    if not current_user.is_admin:
+        conditions.append(ActivityRollup.user_key == current_user.id)
+    if action_type:
+        conditions.append(ActivityRollup.action_type == action_type)
+    return (
+        select(ActivityRollup.day, ActivityRollup.action_type, func.sum(ActivityRollup.count))
+        .where(*conditions)
+        .group_by(ActivityRollup.day, ActivityRollup.action_type)
+    )
@@ -0,0 +1,190 @@
+"""
+客户全文搜索服务 - SQLite FTS5 索引 customer_search
+
+索引覆盖姓名、KYC 中的城市 / 职位 / 备注、关联人姓名以及最新 AI 报告，
+rowid 即客户 ID，由 customers 与 customer_reports 上的触发器同步维护。
+使用 trigram 分词器，中文无需分词即可按任意连续 3 个字及以上的片段检索，
+按 bm25 相关度排序并生成高亮摘要。
+
+trigram 无法用 MATCH 检索少于 3 个字的片段（如两个字的姓名、城市、关联人），这类关键词
+对索引覆盖的全部字段做 LIKE 匹配：SQLite 直接 LIKE 索引表的各列，非 SQLite 数据库
+匹配对应的原始列。
+"""
+import html
+from typing import List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, Integer, MetaData, Table, Text, and_, bindparam, cast, func, literal_column, or_, select, text
+)
+from sqlalchemy.engine import Connection
+
+from app.database import IS_SQLITE, json_text
+from app.models import Customer, CustomerReport
+
+# trigram 分词器的最短可检索长度
+MIN_TERM_LENGTH = 3
+
+# 各列的 bm25 权重：姓名 > 城市 / 职位 / 关联人 > 备注 / 报告
+_COLUMN_WEIGHTS = (10.0, 3.0, 3.0, 1.0, 3.0, 1.0)
+
+# 摘要中命中片段的起止标记（控制字符，转义 HTML 后再替换为 <mark>）
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+_search_metadata = MetaData()
+
+customer_search_table = Table(
+    "customer_search",
+    _search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("name", Text),
+    Column("city", Text),
+    Column("job_title", Text),
+    Column("notes", Text),
+    Column("contacts", Text),
+    Column("report", Text),
+)
+
+
+def _document(row: str) -> str:
+    """由 customers 行生成索引列（SQL 表达式，row 为 NEW / customers 等行别名）"""
+    contacts = (
+        f"CASE WHEN json_valid({row}.related_contacts) AND json_type({row}.related_contacts) = 'array' "
+        f"THEN (SELECT group_concat(json_extract({row}.related_contacts, '$[' || key || '].name'), ' ') "
+        f"FROM json_each({row}.related_contacts)) END"
+    )
+    return ", ".join([
+        f"{row}.id",
+        f"{row}.name",
+        f"json_extract({row}.kyc_data, '$.city')",
+        f"json_extract({row}.kyc_data, '$.job_title')",
+        f"json_extract({row}.kyc_data, '$.notes')",
+        contacts,
+        f"(SELECT ai_report FROM customer_reports WHERE customer_id = {row}.id)",
+    ])
+
+
+_COLUMNS = "rowid, name, city, job_title, notes, contacts, report"
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customer_search USING fts5("
+    "name, city, job_title, notes, contacts, report, tokenize = 'trigram')",
+    "DROP TRIGGER IF EXISTS trg_customers_search_insert",
+    "DROP TRIGGER IF EXISTS trg_customers_search_update",
+    "DROP TRIGGER IF EXISTS trg_customers_search_delete",
+    "DROP TRIGGER IF EXISTS trg_customer_reports_search_insert",
+    "DROP TRIGGER IF EXISTS trg_customer_reports_search_update",
+    "DROP TRIGGER IF EXISTS trg_customer_reports_search_delete",
+    f"""CREATE TRIGGER trg_customers_search_insert AFTER INSERT ON customers
+    BEGIN
+        INSERT INTO customer_search ({_COLUMNS}) VALUES ({_document('NEW')});
+    END""",
+    f"""CREATE TRIGGER trg_customers_search_update AFTER UPDATE OF name, kyc_data, related_contacts ON customers
+    BEGIN
+        DELETE FROM customer_search WHERE rowid = OLD.id;
+        INSERT INTO customer_search ({_COLUMNS}) VALUES ({_document('NEW')});
+    END""",
+    """CREATE TRIGGER trg_customers_search_delete AFTER DELETE ON customers
+    BEGIN
+        DELETE FROM customer_search WHERE rowid = OLD.id;
+    END""",
+    """CREATE TRIGGER trg_customer_reports_search_insert AFTER INSERT ON customer_reports
+    BEGIN
+        UPDATE customer_search SET report = NEW.ai_report WHERE rowid = NEW.customer_id;
+    END""",
+    """CREATE TRIGGER trg_customer_reports_search_update AFTER UPDATE OF ai_report ON customer_reports
+    BEGIN
+        UPDATE customer_search SET report = NEW.ai_report WHERE rowid = NEW.customer_id;
+    END""",
+    """CREATE TRIGGER trg_customer_reports_search_delete AFTER DELETE ON customer_reports
+    BEGIN
+        UPDATE customer_search SET report = NULL WHERE rowid = OLD.customer_id;
+    END""",
+]
+
+
+def install_search_index(conn: Connection) -> None:
+    """创建 FTS5 索引表与同步触发器（仅 SQLite）"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in _SQLITE_DDL:
+        conn.execute(text(statement))
+
+
+def rebuild_search_index(conn: Connection) -> None:
+    """按 customers / customer_reports 当前数据重建全文索引（仅 SQLite）"""
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text("DELETE FROM customer_search"))
+    conn.execute(text(f"INSERT INTO customer_search ({_COLUMNS}) SELECT {_document('customers')} FROM customers"))
+
+
+def parse_search(search: str) -> Tuple[Optional[str], List[str]]:
+    """
+    拆分搜索关键词
+
+    按空白拆分，多个词需同时命中。不少于 MIN_TERM_LENGTH 个字的词组成
+    FTS5 MATCH 表达式（每个词作为一个短语），其余短词（以及非 SQLite 时的全部词）
+    交给 like_search_filter。
+
+    Returns:
+        (MATCH 表达式或 None, 短词列表)
+    """
+    terms = search.split()
+    if not IS_SQLITE:
+        return None, terms
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    match = " ".join('"' + term.replace('"', '""') + '"' for term in long_terms) or None
+    return match, short_terms
+
+
+def search_hits(match: str):
+    """
+    全文检索命中的子查询：customer_id / rank（越小越相关）/ snippet
+
+    Args:
+        match: parse_search 生成的 MATCH 表达式
+    """
+    fts = literal_column("customer_search")
+    return (
+        select(
+            customer_search_table.c.rowid.label("customer_id"),
+            func.bm25(fts, *_COLUMN_WEIGHTS).label("rank"),
+            func.snippet(fts, -1, _MARK_START, _MARK_END, "…", 16).label("snippet"),
+        )
+        .select_from(customer_search_table)
+        .where(fts.op("MATCH")(bindparam("search_match", match)))
+        .subquery("search_hits")
+    )
+
+
+def _like_any_field(pattern: str):
+    """关键词出现在全文索引覆盖的任一字段中（姓名、城市、职位、备注、关联人、最新报告）"""
+    if IS_SQLITE:
+        # trigram 索引表支持 LIKE；少于 3 个字时扫描的是索引表而非 customers
+        columns = [column for column in customer_search_table.c if column.name != "rowid"]
+        return Customer.id.in_(
+            select(customer_search_table.c.rowid).where(or_(*[column.like(pattern) for column in columns]))
+        )
+    return or_(
+        Customer.name.ilike(pattern),
+        Customer.kyc_city.ilike(pattern),
+        json_text(Customer.kyc_data, "job_title").ilike(pattern),
+        json_text(Customer.kyc_data, "notes").ilike(pattern),
+        # 关联人按整段 JSON 文本匹配
+        cast(Customer.related_contacts, Text).ilike(pattern),
+        Customer.id.in_(select(CustomerReport.customer_id).where(CustomerReport.ai_report.ilike(pattern))),
+    )
+
+
+def like_search_filter(terms: List[str]):
+    """短关键词 / 非 SQLite 时的条件：每个词都出现在全文索引覆盖的任一字段中"""
+    return and_(*[_like_any_field(f"%{term}%") for term in terms])
+
+
+def highlight_snippet(snippet: Optional[str]) -> Optional[str]:
+    """将摘要转为 HTML：正文转义，命中片段包裹 <mark>"""
+    if not snippet:
+        return None
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
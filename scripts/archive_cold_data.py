@@ -0,0 +1,78 @@
+"""
+冷数据归档任务：将回收站中的旧客户与旧活动日志移入归档库
+
+归档库为与主库同目录的 <主库名>_archive.db（ARCHIVE_DATABASE_PATH 可指定），
+应用的每个连接都会附加该库，归档后的客户仍可在回收站中查看、恢复与永久删除，
+活动日志仍可在客户时间线中查看。每批一个短事务，可在服务运行时执行，
+建议与备份一样配置为每日定时任务（见 kyc-archive.service / kyc-archive.timer）。
+
+用法:
+    python scripts/archive_cold_data.py --dry-run
+    python scripts/archive_cold_data.py
+    python scripts/archive_cold_data.py --customer-days 30 --activity-days 180 --vacuum
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import ARCHIVE_PATH, engine  # noqa: E402
+from app.migrations import get_current_version, latest_version  # noqa: E402
+from app.services.archive_service import (  # noqa: E402
+    archive_activity_logs, archive_customers, count_archivable, create_archive_tables
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷数据归档任务")
+    parser.add_argument("--customer-days", type=int, default=settings.ARCHIVE_CUSTOMER_DAYS,
+                        help="归档回收站中删除超过该天数的客户")
+    parser.add_argument("--activity-days", type=int, default=settings.ARCHIVE_ACTIVITY_DAYS,
+                        help="归档超过该天数的活动日志")
+    parser.add_argument("--batch-size", type=int, default=200, help="每个事务处理的客户数（日志为其 5 倍）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待归档数量，不移动数据")
+    parser.add_argument("--vacuum", action="store_true", help="归档后执行 VACUUM，回收主库文件空间")
+    args = parser.parse_args()
+
+    if ARCHIVE_PATH is None:
+        sys.exit("❌ 未启用归档（仅支持文件型 SQLite 主库，且 ARCHIVE_ENABLED 为 true）")
+
+    with engine.connect() as conn:
+        current = get_current_version(conn)
+    if current != latest_version():
+        # 主库缺表时，未加库名的表名会解析到归档库中的同名表
+        sys.exit(f"❌ 主库结构版本为 v{current}，最新为 v{latest_version()}，请先执行 python -m app.migrations upgrade")
+
+    now = datetime.now()
+    customer_cutoff = now - timedelta(days=args.customer_days)
+    activity_cutoff = now - timedelta(days=args.activity_days)
+
+    with engine.begin() as conn:
+        create_archive_tables(conn)
+        pending = count_archivable(conn, customer_cutoff, activity_cutoff)
+    print(f"归档库: {ARCHIVE_PATH}")
+    print(f"待归档客户（删除于 {customer_cutoff:%Y-%m-%d} 之前）: {pending['customers']}")
+    print(f"待归档活动日志（产生于 {activity_cutoff:%Y-%m-%d} 之前）: {pending['activity_logs']}")
+    if args.dry_run:
+        return
+
+    started = time.perf_counter()
+    customers = archive_customers(engine, customer_cutoff, batch_size=args.batch_size)
+    logs = archive_activity_logs(engine, activity_cutoff, batch_size=args.batch_size * 5)
+    elapsed = time.perf_counter() - started
+    print(f"✅ 已归档客户 {customers} 个、活动日志 {logs} 条（{elapsed:.1f} 秒）")
+
+    if args.vacuum and (customers or logs):
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM main"))
+        print("✅ 已回收主库文件空间")
+
+
+if __name__ == "__main__":
+    main()
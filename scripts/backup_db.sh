@@ -9,6 +9,7 @@ set -euo pipefail
 # --------------- 可配置参数 ---------------
 APP_DIR="${APP_DIR:-/srv/kyc/KYC}"
 DB_FILE="${APP_DIR}/data/crm.db"
+ARCHIVE_FILE="${APP_DIR}/data/crm_archive.db"   # 冷数据归档库（存在时一并备份）
 BACKUP_DIR="${APP_DIR}/backups"
 BACKUP_LOG="${BACKUP_DIR}/backup.log"
 
@@ -61,6 +62,16 @@ COMPRESSED="${BACKUP_DIR}/${BACKUP_GZ}"
 FILESIZE=$(du -h "$COMPRESSED" | cut -f1)
 log "压缩完成: ${COMPRESSED} (${FILESIZE})"
 
+# --------------- 3.1 归档库备份（启用冷数据归档时）---------------
+ARCHIVE_COMPRESSED=""
+if [ -f "$ARCHIVE_FILE" ]; then
+    ARCHIVE_BACKUP="${BACKUP_DIR}/archive_${TIMESTAMP}.db"
+    sqlite3 "$ARCHIVE_FILE" ".backup '${ARCHIVE_BACKUP}'" || die "归档库 .backup 失败"
+    gzip -f "$ARCHIVE_BACKUP" || die "归档库 gzip 压缩失败"
+    ARCHIVE_COMPRESSED="${ARCHIVE_BACKUP}.gz"
+    log "归档库备份完成: ${ARCHIVE_COMPRESSED}"
+fi
+
 # --------------- 4. 滚动保留（删除最老的，保留最新 RETAIN_COUNT 份）---------------
 TOTAL=$(ls -1 "${BACKUP_DIR}"/crm_*.db.gz 2>/dev/null | wc -l | tr -d ' ')
 if [ "$TOTAL" -gt "$RETAIN_COUNT" ]; then
@@ -70,11 +81,15 @@ if [ "$TOTAL" -gt "$RETAIN_COUNT" ]; then
 else
     log "当前共 ${TOTAL} 份备份，保留阈值 ${RETAIN_COUNT}，无需清理"
 fi
+ARCHIVE_TOTAL=$(ls -1 "${BACKUP_DIR}"/archive_*.db.gz 2>/dev/null | wc -l | tr -d ' ')
+if [ "$ARCHIVE_TOTAL" -gt "$RETAIN_COUNT" ]; then
+    ls -1t "${BACKUP_DIR}"/archive_*.db.gz | tail -n "$((ARCHIVE_TOTAL - RETAIN_COUNT))" | xargs rm -f
+fi
 
 # --------------- 5. 异地推送（可选）---------------
 if [ "$OFFSITE_ENABLED" = "1" ] && [ -n "$OFFSITE_TARGET" ]; then
     log "推送到异地: ${OFFSITE_TARGET}"
-    if rsync -az "$COMPRESSED" "$OFFSITE_TARGET"; then
+    if rsync -az "$COMPRESSED" ${ARCHIVE_COMPRESSED:+"$ARCHIVE_COMPRESSED"} "$OFFSITE_TARGET"; then
         log "异地推送成功"
     else
         log "WARNING: 异地推送失败（备份本身已完成）"
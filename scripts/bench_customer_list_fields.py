@@ -0,0 +1,112 @@
+"""
+客户列表字段投影基准测试：各 view / fields 下的响应体积与接口耗时
+
+在临时 SQLite 库上预置带完整 KYC 数据与关联人的客户，以管理员身份经完整的
+FastAPI 应用（含认证、查询、序列化）请求 GET /api/customers?page_size=999，对比：
+- view=full（默认，完整客户对象）
+- view=list / view=kanban
+- fields=id,name,status（最小投影）
+
+用法:
+    python scripts/bench_customer_list_fields.py
+    python scripts/bench_customer_list_fields.py --customers 5000 --page-size 999 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 使用临时库，须在导入 app 之前设置
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='kyc_fields_bench_'), 'bench.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Customer, CustomerStatus  # noqa: E402
+
+VARIANTS = ["view=full", "view=list", "view=kanban", "fields=id,name,status"]
+
+
+def sample_kyc(i: int) -> dict:
+    """按默认表单结构生成一份完整的 KYC 数据"""
+    return {
+        "name": f"客户{i}",
+        "source": random.choice(["朋友推荐", "网络搜索", "线下活动"]),
+        "city": random.choice(["上海", "北京", "深圳", "杭州"]),
+        "age_group": random.choice(["36-45", "46-55", "56-65"]),
+        "education": random.choice(["本科", "硕士", "博士"]),
+        "asset_level": random.choice(["100-500万", "500-2000万", "2000万-1亿"]),
+        "industry_category": random.choice(["互联网", "制造业", "金融"]),
+        "job_type": random.choice(["企业主", "高管", "专业人士"]),
+        "children_education": random.sample(["小学", "初中", "高中", "本科"], 2),
+        "core_needs": random.sample(["身份规划", "税务优化", "子女教育", "资产配置"], 2),
+        "target_countries": random.sample(["新加坡", "美国", "加拿大", "日本"], 2),
+        "timeline": "6个月内",
+        "notes": "客户关注子女教育与资产隔离，计划明年带家人考察。" * 4,
+    }
+
+
+def seed(customers: int) -> None:
+    now = datetime.now()
+    rows = [
+        {
+            "name": f"客户{i}",
+            "kyc_data": sample_kyc(i),
+            "status": random.choice([s.value for s in CustomerStatus]),
+            "related_contacts": [{"name": f"家属{i}", "relation": "配偶", "phone": "13800000000"}],
+            "birthday": date(1980, 1, 1) + timedelta(days=i % 3000),
+            "is_deleted": 0,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(customers)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Customer.__table__.insert(), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="客户列表字段投影基准测试")
+    parser.add_argument("--customers", type=int, default=3000, help="预置客户数")
+    parser.add_argument("--page-size", type=int, default=999, help="每页条数（最大 999）")
+    parser.add_argument("--repeat", type=int, default=10, help="每种请求的重复次数")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # 静态文件与模板目录为相对路径
+    with TestClient(app) as client:
+        seed(args.customers)
+        client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+
+        results = []
+        for name in VARIANTS:
+            url = f"/api/customers?page_size={args.page_size}&{name}"
+            client.get(url)  # 预热
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+            timings.sort()
+            results.append((
+                name, len(response.json()["items"]), len(response.content),
+                statistics.median(timings), timings[max(int(len(timings) * 0.95) - 1, 0)],
+            ))
+
+    print(f"客户数={args.customers} 每页={args.page_size} 重复={args.repeat}")
+    print(f"{'请求':<22}{'条数':>6}{'响应(KB)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'体积':>8}{'耗时':>8}")
+    full_bytes, full_ms = results[0][2], results[0][3]
+    for name, count, size, p50, p95 in results:
+        print(f"{name:<24}{count:>8}{size / 1024:>12.1f}{p50:>10.1f}{p95:>10.1f}"
+              f"{size / full_bytes * 100:>9.0f}%{p50 / full_ms * 100:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+JSON 序列化基准测试：标准库 json 与 orjson
+
+在临时 SQLite 库上预置带完整 KYC 数据的客户，分别对比：
+- 导出路径：读取全部客户并解码 kyc_data / related_contacts（引擎 json_deserializer）
+- 写入路径：编码 kyc_data 等 JSON 列（引擎 json_serializer）
+- 列表接口：渲染一页客户列表响应（JSONResponse 与 ORJSONResponse）
+
+用法:
+    python scripts/bench_json_serialization.py
+    python scripts/bench_json_serialization.py --customers 20000 --page-size 100 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+
+from app.database import Base, json_deserializer, json_serializer  # noqa: E402
+from app.models import Customer, CustomerStatus  # noqa: E402
+from app.schemas import CustomerListResponse, CustomerResponse  # noqa: E402
+
+
+def sample_kyc(i: int) -> dict:
+    """按默认表单结构生成一份完整的 KYC 数据"""
+    return {
+        "name": f"客户{i}",
+        "source": random.choice(["老客户推荐", "线上咨询", "线下活动"]),
+        "age_group": random.choice(["30-40岁", "40-50岁", "50岁以上"]),
+        "city": random.choice(["上海", "北京", "深圳", "杭州"]),
+        "education": random.choice(["本科", "硕士", "博士"]),
+        "first_education": "本科",
+        "education_certifications": random.sample(["学信网认证", "WES认证", "留服认证"], 2),
+        "asset_level": random.choice(["100-500万", "500-2000万", "2000万-1亿"]),
+        "industry_category": random.choice(["互联网", "制造业", "金融"]),
+        "job_type": random.choice(["企业主", "高管", "专业人士"]),
+        "job_title": "总经理",
+        "children_education": random.sample(["幼儿园", "小学", "初中", "高中", "本科"], 2),
+        "core_needs": random.sample(["身份规划", "税务优化", "子女教育", "资产配置"], 2),
+        "target_countries": random.sample(["新加坡", "美国", "加拿大", "香港", "日本"], 2),
+        "residency_requirement": "每年≥180天",
+        "timeline": "6个月内",
+        "notes": "客户关注子女教育与资产隔离，计划明年带家人考察。" * 4,
+    }
+
+
+def seed(engine, customers: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now()
+    rows = [
+        {
+            "name": f"客户{i}",
+            "kyc_data": sample_kyc(i),
+            "status": random.choice([s.value for s in CustomerStatus]),
+            "related_contacts": [{"name": f"家属{i}", "relation": "配偶", "phone": "13800000000"}],
+            "birthday": date(1980, 1, 1) + timedelta(days=i % 3000),
+            "is_deleted": 0,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(customers)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Customer.__table__.insert(), rows)
+
+
+def best_of(repeat: int, func) -> float:
+    """多次运行取最短耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 序列化基准测试（json vs orjson）")
+    parser.add_argument("--customers", type=int, default=5000, help="预置客户数")
+    parser.add_argument("--page-size", type=int, default=100, help="列表接口每页条数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="kyc_json_bench_"), "bench.db")
+    url = f"sqlite:///{db_path}"
+    seed(create_engine(url), args.customers)
+
+    engines = {
+        "json": create_engine(url),
+        "orjson": create_engine(url, json_serializer=json_serializer, json_deserializer=json_deserializer),
+    }
+    columns = [Customer.__table__.c[name] for name in (
+        "id", "name", "kyc_data", "status", "birthday", "related_contacts",
+        "next_follow_up", "owner_user_id", "is_deleted", "deleted_at", "created_at", "updated_at",
+    )]
+
+    def load_all(engine):
+        with engine.connect() as conn:
+            return conn.execute(select(*columns).order_by(Customer.created_at.desc())).all()
+
+    rows = load_all(engines["json"])
+    payloads = [row.kyc_data for row in rows]
+    page = CustomerListResponse(
+        total=len(rows),
+        items=[CustomerResponse.model_validate(dict(row._mapping)) for row in rows[:args.page_size]],
+        page=1,
+        page_size=args.page_size,
+    )
+    content = jsonable_encoder(page)
+
+    results = [
+        (
+            f"导出路径：读取并解码 {len(rows)} 行",
+            best_of(args.repeat, lambda: load_all(engines["json"])),
+            best_of(args.repeat, lambda: load_all(engines["orjson"])),
+        ),
+        (
+            f"写入路径：编码 {len(payloads)} 份 kyc_data",
+            best_of(args.repeat, lambda: [json.dumps(p) for p in payloads]),
+            best_of(args.repeat, lambda: [json_serializer(p) for p in payloads]),
+        ),
+        (
+            f"列表接口：渲染 {args.page_size} 条响应 ×100",
+            best_of(args.repeat, lambda: [JSONResponse(content) for _ in range(100)]),
+            best_of(args.repeat, lambda: [ORJSONResponse(content) for _ in range(100)]),
+        ),
+    ]
+
+    print(f"客户数={args.customers} 每页={args.page_size} 重复={args.repeat}（取最短耗时）")
+    print(f"{'路径':<32}{'json(ms)':>10}{'orjson(ms)':>12}{'节省':>8}")
+    for name, baseline, optimized in results:
+        saved = (1 - optimized / baseline) * 100 if baseline else 0.0
+        print(f"{name:<32}{baseline:>10.1f}{optimized:>12.1f}{saved:>7.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+密码哈希基准测试：各代价参数下的单次耗时与登录吞吐
+
+对每组参数（scrypt 的 N、PBKDF2 的迭代次数）：
+- 单次哈希耗时（串行计算若干次取中位数）
+- 登录吞吐：--concurrency 个并发客户端经专用线程池（--workers 个线程）校验密码，
+  统计每秒登录数与 p50 / p95 延迟（含线程池排队时间），与 /api/auth/login 的计算路径一致
+首行为旧的 SHA-256 哈希作对照。据此选择 PASSWORD_SCRYPT_N / PASSWORD_PBKDF2_ITERATIONS
+与 PASSWORD_HASH_WORKERS：单次耗时建议在 50-250 毫秒，吞吐需覆盖登录高峰。
+
+用法:
+    python scripts/bench_password_hashing.py
+    python scripts/bench_password_hashing.py --workers 4 --concurrency 32 --logins 200
+    python scripts/bench_password_hashing.py --scrypt-n 16384 32768 --pbkdf2 600000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.password_service import PBKDF2, SCRYPT, PasswordHasher, legacy_hash  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def single_hash_ms(hasher: PasswordHasher, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hasher._hash(PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def login_throughput(hasher: PasswordHasher, stored: str, logins: int, concurrency: int):
+    """并发校验 logins 次，返回 (每秒登录数, p50 毫秒, p95 毫秒)"""
+    latencies = []
+    remaining = logins
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            assert await hasher.verify_async(PASSWORD, stored)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return logins / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="密码哈希基准测试")
+    parser.add_argument("--scrypt-n", type=int, nargs="*", default=[4096, 8192, 16384, 32768, 65536],
+                        help="测试的 scrypt N 值（2 的幂）")
+    parser.add_argument("--pbkdf2", type=int, nargs="*", default=[100000, 300000, 600000],
+                        help="测试的 PBKDF2 迭代次数")
+    parser.add_argument("--workers", type=int, default=2, help="哈希线程数（PASSWORD_HASH_WORKERS）")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发登录的客户端数")
+    parser.add_argument("--logins", type=int, default=100, help="每组参数的登录次数")
+    parser.add_argument("--repeat", type=int, default=5, help="单次耗时的测量次数")
+    args = parser.parse_args()
+
+    settings = [(SCRYPT, n) for n in args.scrypt_n] + [(PBKDF2, i) for i in args.pbkdf2]
+    print(f"CPU 核数: {os.cpu_count()}  哈希线程: {args.workers}  并发客户端: {args.concurrency}  "
+          f"每组登录: {args.logins}")
+    print(f"{'算法':<13}{'参数':>8}{'内存':>7}{'单次':>9}{'登录/秒':>7}{'p50':>11}{'p95':>11}")
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        legacy_hash(PASSWORD)
+    legacy_ms = (time.perf_counter() - started) / 10000 * 1000
+    print(f"{'sha256（旧）':<12}{'-':>10}{'-':>9}{legacy_ms:>9.3f}ms{'-':>10}{'-':>11}{'-':>11}")
+
+    for algorithm, cost in settings:
+        hasher = PasswordHasher(
+            algorithm=algorithm,
+            scrypt_n=cost if algorithm == SCRYPT else 16384,
+            pbkdf2_iterations=cost if algorithm == PBKDF2 else 600000,
+            workers=args.workers,
+            max_pending=args.concurrency,
+        )
+        stored = hasher._hash(PASSWORD)
+        hash_ms = single_hash_ms(hasher, args.repeat)
+        rate, p50, p95 = asyncio.run(login_throughput(hasher, stored, args.logins, args.concurrency))
+        memory = f"{128 * 8 * cost // 1024 // 1024}MB" if algorithm == SCRYPT else "-"
+        print(f"{algorithm:<15}{cost:>10}{memory:>9}{hash_ms:>9.1f}ms{rate:>10.1f}{p50:>9.1f}ms{p95:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
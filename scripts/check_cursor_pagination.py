@@ -0,0 +1,98 @@
+"""
+游标分页回归检查
+
+SQLite 以文本保存时间：server_default 写入 "YYYY-MM-DD HH:MM:SS"，Python 写入的带
+6 位微秒（微秒为 0 时为 .000000）。在临时数据库上预置同一秒内写入的多行
+（数据库默认值与 Python 写入两种格式），按 next_cursor 逐页读取各游标分页接口，
+与一次取全部的结果比对，不得遗漏或重复。
+
+用法:
+    python scripts/check_cursor_pagination.py   # 失败时退出码为 1
+"""
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='kyc_cursor_'), 'cursor.db')}"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from datetime import datetime  # noqa: E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import ActivityLog, Customer  # noqa: E402
+
+ROWS = 7
+
+
+def seed() -> tuple[int, int]:
+    """预置同一秒内写入的客户、回收站客户与活动日志，返回 (默认值格式客户 id, Python 格式客户 id)"""
+    same_second = datetime.now().replace(microsecond=0)
+    with engine.begin() as conn:
+        conn.execute(insert(Customer), [{"name": f"同秒客户{i}", "is_deleted": 0} for i in range(ROWS)])
+        conn.execute(insert(Customer), [
+            {"name": f"同秒客户P{i}", "is_deleted": 0, "created_at": same_second} for i in range(ROWS)
+        ])
+        conn.execute(insert(Customer), [
+            {"name": f"回收站客户{i}", "is_deleted": 1, "deleted_at": same_second} for i in range(ROWS)
+        ])
+        default_id, python_id = conn.execute(
+            insert(Customer).returning(Customer.id),
+            [{"name": "默认时间客户", "is_deleted": 0}, {"name": "Python 时间客户", "is_deleted": 0}],
+        ).scalars().all()
+        conn.execute(insert(ActivityLog), [
+            {"customer_id": default_id, "action_type": "customer_updated"} for _ in range(ROWS)
+        ])
+        conn.execute(insert(ActivityLog), [
+            {"customer_id": python_id, "action_type": "customer_updated", "created_at": same_second}
+            for _ in range(ROWS)
+        ])
+    return default_id, python_id
+
+
+def walk(client: TestClient, route: str, page_param: str) -> list[int]:
+    """按 next_cursor 逐页读取（每页 2 条）"""
+    ids, cursor = [], None
+    while True:
+        url = f"{route}{'&' if '?' in route else '?'}{page_param}=2" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url).json()
+        ids += [item["id"] for item in data["items"]]
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return ids
+
+
+def main():
+    failures = []
+    with TestClient(app) as client:
+        default_id, python_id = seed()
+        client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+        checks = [
+            ("/api/customers", "page_size", "page_size=100"),
+            ("/api/customers?view=kanban", "page_size", "page_size=100"),
+            ("/api/customers/recycle-bin", "page_size", "page_size=100"),
+            (f"/api/activity/{default_id}", "limit", "limit=100"),
+            (f"/api/activity/{python_id}", "limit", "limit=100"),
+            ("/api/activity", "limit", "limit=100"),
+        ]
+        for route, page_param, full_param in checks:
+            paged = walk(client, route, page_param)
+            full = [item["id"] for item in
+                    client.get(f"{route}{'&' if '?' in route else '?'}{full_param}").json()["items"]]
+            ok = paged == full
+            print(f"{'✅' if ok else '❌'} {route}: 逐页 {len(paged)} 条，一次取出 {len(full)} 条")
+            if not ok:
+                failures.append(route)
+
+    print(f"\n共检查 {len(checks)} 个接口，失败 {len(failures)} 个")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
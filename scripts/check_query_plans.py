@@ -0,0 +1,216 @@
+"""
+查询计划回归检查
+
+在临时数据库上预置数据，以管理员和普通顾问身份依次调用各 API / 页面路由，
+捕获路由实际发出的每条 SELECT，对其执行 EXPLAIN QUERY PLAN。
+若热点表（customers / activity_logs / customer_kyc_facets）出现全表扫描或临时 B 树排序，
+则判定失败（先按索引求出客户 id 集合、再按主键取行后排序的除外）。
+
+用法:
+    python scripts/check_query_plans.py            # 失败时退出码为 1
+    python scripts/check_query_plans.py --verbose  # 打印每条查询的执行计划
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="kyc_plan_")
+DB_PATH = os.path.join(_tmp_dir, "plan.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from datetime import date, datetime, timedelta  # noqa: E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.database import ARCHIVE_PATH, ARCHIVE_SCHEMA, SessionLocal, engine, async_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import ActivityLog, Customer, CustomerStatus, User  # noqa: E402
+from app.services.facet_service import sync_customer_facets  # noqa: E402
+from app.services.report_service import new_report_version  # noqa: E402
+
+# 需要保证走索引的热点表
+HOT_TABLES = ("customers", "activity_logs", "customer_kyc_facets")
+
+FULL_SCAN = re.compile(r"^SCAN (%s)\b(?!.*\bUSING\b)" % "|".join(HOT_TABLES))
+TEMP_BTREE = re.compile(r"USE TEMP B-TREE")
+# 先由索引求出客户 id 集合（如 KYC 多选筛选）再按主键取行时，对该结果集排序是预期行为
+KEYED_LOOKUP = re.compile(r"^SEARCH customers USING INTEGER PRIMARY KEY")
+
+captured: list[tuple[str, str, tuple]] = []
+_current_route = {"name": ""}
+
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith("SELECT") and not executemany:
+        captured.append((_current_route["name"], statement, tuple(parameters or ())))
+
+
+def seed(customers: int = 300) -> None:
+    """预置客户与活动日志"""
+    statuses = [s.value for s in CustomerStatus]
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        demo = db.query(User).filter(User.username == "demo").first()
+        for i in range(customers):
+            c = Customer(
+                name=f"客户{i}",
+                kyc_data={
+                    "city": ["上海", "北京", "深圳"][i % 3],
+                    "asset_level": ["100-500万", "500-2000万", "1亿以上"][i % 3],
+                    "target_countries": [["新加坡"], ["新加坡", "美国"], ["加拿大"]][i % 3],
+                    "core_needs": [["税务优化"], ["子女教育", "税务优化"]][i % 2],
+                },
+                status=statuses[i % len(statuses)],
+                owner_user_id=[None, demo.id, 1][i % 3],
+                is_deleted=1 if i % 10 == 0 else 0,
+                deleted_at=now - timedelta(days=i) if i % 10 == 0 else None,
+                birthday=date(1981, 1, 1) + timedelta(days=i),
+                next_follow_up=date.today() - timedelta(days=i % 5),
+                created_at=now - timedelta(hours=i),
+            )
+            db.add(c)
+            db.flush()
+            sync_customer_facets(db, c)
+            if i < 5:
+                for version in (1, 2):
+                    db.add(new_report_version(c.id, version, f"# 报告 v{version}", []))
+            for j in range(3):
+                db.add(ActivityLog(
+                    customer_id=c.id, user_id=1, action_type="customer_updated",
+                    action_detail={}, created_at=now - timedelta(hours=i, minutes=j)
+                ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def exercise_routes(client: TestClient, customer_id: int) -> None:
+    """依次调用各路由（以当前登录身份）"""
+    routes = [
+        "/api/customers",
+        "/api/customers?status=已出方案",
+        "/api/customers?statuses=待录入,跟进中",
+        "/api/customers?owner_id=0",
+        "/api/customers?owner_id=1",
+        "/api/customers?search=客户1",
+        "/api/customers?search=上海",
+        "/api/customers?search=客户1 上海&status=跟进中",
+        "/api/customers?date_from=2020-01-01&date_to=2099-01-01",
+        "/api/customers?city=上海",
+        "/api/customers?asset_level=1亿以上&status=跟进中",
+        "/api/customers?facets=target_countries:新加坡",
+        "/api/customers?facets=target_countries:新加坡,core_needs:税务优化",
+        "/api/customers?facets=target_countries:美国,target_countries:加拿大&facet_mode=or",
+        "/api/customers?view=list",
+        "/api/customers?view=kanban&statuses=待录入,跟进中",
+        "/api/customers?fields=name,status&search=客户1",
+        "/api/customers/recycle-bin",
+        f"/api/customers/{customer_id}",
+        "/api/customers/check-duplicate?name=客户1",
+        "/api/customers/check-duplicate?name=ke hu 1&city=上海",
+        f"/api/activity/{customer_id}",
+        f"/api/activity/{customer_id}/summary",
+        "/api/activity",
+        "/api/activity?user_id=1",
+        "/api/activity?action_type=status_changed",
+        "/api/activity?owner_id=1",
+        "/api/activity?date_from=2020-01-01&date_to=2099-01-01",
+        f"/api/analyze/{customer_id}/reports",
+        f"/api/analyze/{customer_id}/reports/1",
+        f"/api/analyze/{customer_id}/reports/diff",
+        "/api/dashboard/stats",
+        "/api/dashboard/reminders",
+        "/api/dashboard/activity-stats",
+        "/api/export/customers?fields=basic,kyc",
+        "/api/export/customers?fields=basic&status=跟进中",
+        "/",
+        "/customers",
+        "/customers?status=跟进中",
+        "/customers?owner_id=1",
+        "/customers?asset_level=500-2000万",
+        "/customers?search=客户1",
+        f"/customers/{customer_id}",
+        "/recycle-bin",
+    ]
+    for route in routes:
+        _current_route["name"] = route
+        response = client.get(route)
+        if response.status_code != 200:
+            raise RuntimeError(f"{route} 返回 {response.status_code}: {response.text[:200]}")
+
+    # 游标分页：取各列表第一页返回的 next_cursor 再请求下一页
+    cursor_routes = [
+        ("/api/customers?page_size=5", ["/api/customers?page_size=5", "/customers?page=2&page_size=5"]),
+        ("/api/customers?status=跟进中&page_size=5", ["/api/customers?status=跟进中&page_size=5"]),
+        ("/api/customers/recycle-bin?page_size=5", ["/api/customers/recycle-bin?page_size=5", "/recycle-bin?page=2&page_size=5"]),
+        (f"/api/activity/{customer_id}?limit=1", [f"/api/activity/{customer_id}?limit=1"]),
+    ]
+    for first_page, next_pages in cursor_routes:
+        next_cursor = client.get(first_page).json()["next_cursor"]
+        if not next_cursor:
+            continue
+        for route in next_pages:
+            route = f"{route}&cursor={next_cursor}"
+            _current_route["name"] = route
+            response = client.get(route)
+            if response.status_code != 200:
+                raise RuntimeError(f"{route} 返回 {response.status_code}: {response.text[:200]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询计划回归检查")
+    parser.add_argument("--verbose", action="store_true", help="打印每条查询的执行计划")
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        seed()
+        event.listen(engine, "before_cursor_execute", _capture)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _capture)
+
+        for username, password in (("admin", "admin123"), ("demo", "demo123")):
+            client.post("/api/auth/login", json={"username": username, "password": password})
+            _current_route["name"] = f"[{username}]"
+            exercise_routes(client, customer_id=2)
+            client.post("/api/auth/logout")
+
+    conn = sqlite3.connect(DB_PATH)
+    if ARCHIVE_PATH:
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (ARCHIVE_PATH,))
+    failures = []
+    seen = set()
+    for route, statement, params in captured:
+        key = (statement, params)
+        if key in seen:
+            continue
+        seen.add(key)
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", params)]
+        touches_hot = any(re.search(r"\b(%s)\b" % "|".join(HOT_TABLES), line) for line in plan)
+        keyed = any(KEYED_LOOKUP.search(line) for line in plan)
+        bad = [
+            line for line in plan
+            if FULL_SCAN.search(line) or (touches_hot and not keyed and TEMP_BTREE.search(line))
+        ]
+        if args.verbose or bad:
+            print(f"{'❌' if bad else '✅'} {route}")
+            print("   " + " ".join(statement.split())[:200])
+            for line in plan:
+                print(f"     {line}")
+        if bad:
+            failures.append((route, statement, bad))
+    conn.close()
+
+    print(f"\n共检查 {len(seen)} 条查询，失败 {len(failures)} 条")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+活动日志压缩任务：删除超过保留期限的原始活动日志，只保留日汇总计数
+
+activity_rollups 由 activity_logs 上的触发器在写入时累加，删除原始日志不影响计数：
+客户活动概览（GET /api/activity/{id}/summary）与仪表盘活动统计
+（GET /api/dashboard/activity-stats）仍包含被压缩的日志。
+热库与归档库中的旧日志都会删除，每批一个短事务，可在服务运行时执行，
+与回收站清理一起每日定时执行（见 kyc-purge.service / kyc-purge.timer）。
+
+用法:
+    python scripts/compact_activity_logs.py --dry-run
+    python scripts/compact_activity_logs.py
+    python scripts/compact_activity_logs.py --days 1095 --vacuum
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import ARCHIVE_PATH, ARCHIVE_SCHEMA, engine  # noqa: E402
+from app.migrations import get_current_version, latest_version  # noqa: E402
+from app.services.rollup_service import compact_activity_logs, count_compactable  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="活动日志压缩任务")
+    parser.add_argument("--days", type=int, default=settings.ACTIVITY_RAW_RETENTION_DAYS,
+                        help="删除超过该天数的原始日志（0 为不压缩）")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每个事务删除的日志条数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待压缩数量，不删除")
+    parser.add_argument("--vacuum", action="store_true", help="压缩后执行 VACUUM，回收 SQLite 文件空间")
+    args = parser.parse_args()
+
+    if args.days <= 0:
+        print("ℹ️ 保留期限为 0，不压缩活动日志")
+        return
+    with engine.connect() as conn:
+        current = get_current_version(conn)
+    if current != latest_version():
+        sys.exit(f"❌ 数据库结构版本为 v{current}，最新为 v{latest_version()}，请先执行 python -m app.migrations upgrade")
+
+    cutoff = datetime.now() - timedelta(days=args.days)
+    with engine.connect() as conn:
+        pending = count_compactable(conn, cutoff)
+    print(f"待压缩活动日志（产生于 {cutoff:%Y-%m-%d} 之前）: {pending}")
+    if args.dry_run or not pending:
+        return
+
+    started = time.perf_counter()
+    compacted = compact_activity_logs(engine, cutoff, batch_size=args.batch_size)
+    print(f"✅ 已压缩活动日志 {compacted} 条（{time.perf_counter() - started:.1f} 秒）")
+
+    if args.vacuum and engine.dialect.name == "sqlite":
+        # 超过归档天数的日志多在归档库中，两个库都回收
+        schemas = ["main"] + ([ARCHIVE_SCHEMA] if ARCHIVE_PATH else [])
+        with engine.connect() as conn:
+            for schema in schemas:
+                conn.execution_options(isolation_level="AUTOCOMMIT").execute(text(f"VACUUM {schema}"))
+        print("✅ 已回收文件空间")
+
+
+if __name__ == "__main__":
+    main()
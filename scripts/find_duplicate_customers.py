@@ -0,0 +1,52 @@
+"""
+全库疑似重复客户扫描
+
+按 customer_name_keys 分块，只在共享分块键的客户之间比较，
+输出相似度达到阈值的客户簇（同 GET /api/customers/duplicates）。
+若曾绕过应用直接导入客户，可加 --rebuild-keys 先按当前姓名重建分块键。
+
+用法:
+    python scripts/find_duplicate_customers.py
+    python scripts/find_duplicate_customers.py --threshold 0.8 --rebuild-keys
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.services.duplicate_service import (  # noqa: E402
+    DUPLICATE_THRESHOLD, MAX_BLOCK_SIZE, find_duplicate_clusters, rebuild_name_keys
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全库疑似重复客户扫描")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="最低相似度")
+    parser.add_argument("--max-block-size", type=int, default=MAX_BLOCK_SIZE, help="参与两两比较的分块大小上限")
+    parser.add_argument("--rebuild-keys", action="store_true", help="扫描前重建姓名分块键")
+    args = parser.parse_args()
+
+    if args.rebuild_keys:
+        with engine.begin() as conn:
+            rebuild_name_keys(conn)
+        print("✅ 已按 customers 重建姓名分块键")
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        clusters = find_duplicate_clusters(db, threshold=args.threshold, max_block_size=args.max_block_size)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if not clusters:
+        print(f"✅ 未发现疑似重复客户（{elapsed:.0f} ms）")
+        return
+    print(f"⚠️ 发现 {len(clusters)} 组疑似重复客户（{elapsed:.0f} ms）：")
+    for cluster in clusters:
+        names = "、".join(f"#{c['id']} {c['name']}（{c['status']}）" for c in cluster["customers"])
+        print(f"   [{cluster['score']:.2f}] {names}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+回收站定时清理：永久删除超过保留期限的回收站客户
+
+按 RECYCLE_BIN_RETENTION_DAYS（或 --days）选出 deleted_at 已过期的客户（含已归档的客户），
+级联删除邀请记录、活动日志、AI 报告等关联数据，并清理指向已不存在客户的孤立活动日志。
+每批一个短事务，可在服务运行时执行，建议配置为每日定时任务
+（见 kyc-purge.service / kyc-purge.timer）。本次指标写入一条 recycle_bin_purged 活动日志，
+管理员可通过 GET /api/customers/recycle-bin/purge-report 查看预览与最近一次清理结果。
+
+用法:
+    python scripts/purge_recycle_bin.py --dry-run
+    python scripts/purge_recycle_bin.py
+    python scripts/purge_recycle_bin.py --days 30 --batch-size 50 --json
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.migrations import get_current_version, latest_version  # noqa: E402
+from app.services.purge_service import PURGE_BATCH_SIZE, purge_recycle_bin, purge_report  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回收站定时清理")
+    parser.add_argument("--days", type=int, default=settings.RECYCLE_BIN_RETENTION_DAYS,
+                        help="永久删除回收站中删除超过该天数的客户（0 为不清理）")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE, help="每个事务删除的客户数")
+    parser.add_argument("--dry-run", action="store_true", help="只输出待清理的数据量，不删除")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出报告 / 指标（供监控采集）")
+    args = parser.parse_args()
+
+    if args.days <= 0:
+        print("ℹ️ 保留期限为 0，不自动清理回收站")
+        return
+    with engine.connect() as conn:
+        current = get_current_version(conn)
+    if current != latest_version():
+        sys.exit(f"❌ 数据库结构版本为 v{current}，最新为 v{latest_version()}，请先执行 python -m app.migrations upgrade")
+
+    cutoff = datetime.now() - timedelta(days=args.days)
+    if args.dry_run:
+        with engine.connect() as conn:
+            result = purge_report(conn, cutoff)
+        title = f"待清理（删除于 {cutoff:%Y-%m-%d %H:%M} 之前）"
+    else:
+        result = purge_recycle_bin(engine, cutoff, batch_size=args.batch_size)
+        title = "✅ 清理完成"
+
+    if args.json:
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+        return
+    print(title)
+    for key, value in result.items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
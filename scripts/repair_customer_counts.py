@@ -0,0 +1,48 @@
+"""
+客户计数表一致性检查与修复
+
+customer_counts 由 customers 上的触发器维护。若曾绕过触发器写入
+（如手工导入、恢复旧备份后再升级），可用本命令对比真实统计并重建。
+
+用法:
+    python scripts/repair_customer_counts.py            # 检查并修复
+    python scripts/repair_customer_counts.py --check    # 只检查，不一致时以非零状态退出
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine  # noqa: E402
+from app.services.count_service import (  # noqa: E402
+    find_count_drift, install_count_triggers, rebuild_customer_counts
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="客户计数表一致性检查与修复")
+    parser.add_argument("--check", action="store_true", help="只检查，不修复")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        drift = find_count_drift(conn)
+        if not drift:
+            print("✅ 计数表与 customers 一致")
+            return
+        print(f"⚠️ 发现 {len(drift)} 处不一致：")
+        for item in drift:
+            print(
+                f"   owner={item['owner_key']} status={item['status'] or '-'} "
+                f"is_deleted={item['is_deleted']}: 计数表 {item['cached']}，实际 {item['actual']}"
+            )
+        if args.check:
+            sys.exit(1)
+        # 同时重建触发器，防止触发器被误删导致再次漂移
+        install_count_triggers(conn)
+        rebuild_customer_counts(conn)
+    print("✅ 已按 customers 重建计数表")
+
+
+if __name__ == "__main__":
+    main()
@@ -109,7 +109,8 @@ fi
 # --------------- 备份当前数据库（恢复前保护）---------------
 if [ -f "$DB_FILE" ]; then
     PRE_RESTORE_BACKUP="${BACKUP_DIR}/crm_pre_restore_$(date +%Y%m%d_%H%M%S).db"
-    cp "$DB_FILE" "$PRE_RESTORE_BACKUP"
+    # 数据库运行于 WAL 模式，使用 .backup 以包含尚未回写的 -wal 内容
+    sqlite3 "$DB_FILE" ".backup '${PRE_RESTORE_BACKUP}'" || die "恢复前快照失败"
     log "已保存恢复前快照: ${PRE_RESTORE_BACKUP}"
 fi
 
@@ -122,6 +123,8 @@ else
     RESTART_SERVICE=0
 fi
 
+# 清理旧库残留的 WAL/共享内存文件，避免与恢复后的库文件混用
+rm -f "${DB_FILE}-wal" "${DB_FILE}-shm"
 cp "$TEMP_DB" "$DB_FILE" || die "复制数据库文件失败"
 log "数据库已恢复"
 
@@ -35,6 +35,9 @@ ssh ${SERVER} << 'EOF'
   source venv/bin/activate
   pip install -r requirements.txt -q
 
+  echo "🗄️ 执行数据库迁移..."
+  python -m app.migrations upgrade
+
   if systemctl is-enabled kyc &>/dev/null; then
     systemctl restart kyc
   else